@@ -8,14 +8,46 @@ import numpy as np
 import time
 import json
 import random
-from typing import List, Dict, Tuple, Optional
+import functools
+import logging
+from typing import List, Dict, Tuple, Optional, Iterable
 from dataclasses import dataclass
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import tkinter as tk
+from tkinter import ttk, messagebox, simpledialog
 
-from core.game_engine import EinsteinGame
-from core.pmcts import PMCTS
+try:
+    import orjson  # 可选依赖：更快的JSON序列化
+except ImportError:
+    orjson = None
+
+from core.game_engine import EinsteinGame, GameState
+from core.pmcts import PMCTS, seed_thread
 from core.config import Config
+from core.logger import log, quiet
+
+# 默认初始棋盘模板(红方剩余棋子在生成棋盘时随机放置)
+_DEFAULT_BOARD_TEMPLATE = np.array([
+    [0, 0, 0, 0, 12],
+    [0, 0, 0, 11, 0],
+    [0, 0, 10, 9, 8],
+    [0, 7, 0, 0, 0],
+    [1, 0, 0, 0, 0]
+], dtype=np.int8)  # 棋子编号0-12，int8足够存放
+_REMAINING_PIECES = np.array([2, 3, 4, 5, 6], dtype=np.int8)         # 红方待放置的棋子
+_DEFAULT_EMPTY_CELLS = np.flatnonzero(_DEFAULT_BOARD_TEMPLATE == 0)  # 模板中空格的扁平索引
+
+# 对局结果表的记录格式(每场对局一行，用于统计；完整的移动历史保存在GameResult中)
+RESULT_DTYPE = np.dtype([
+    ('winner', 'i1'),          # 1=蓝方获胜, -1=红方获胜, 0=平局
+    ('moves', 'i4'),           # 总移动数
+    ('blue_ai', 'u2'),         # 蓝方AI编号(见AIBattleSystem.ai_names)
+    ('red_ai', 'u2'),          # 红方AI编号
+    ('duration_ms', 'f4'),     # 游戏时长(毫秒)
+    ('thinking_time', 'f4'),   # 双方总思考时间(秒)
+])
+_INITIAL_RESULT_CAPACITY = 1024  # 结果表初始容量，写满时按2倍扩容
 
 @dataclass
 class GameResult:
@@ -26,33 +58,78 @@ class GameResult:
     blue_thinking_time: float  # 蓝方总思考时间
     red_thinking_time: float  # 红方总思考时间
     final_board: np.ndarray  # 最终棋盘状态
-    move_history: List[Tuple[int, int, int, int, int, int]]  # 移动历史 (move, player, die)
-    board_states: List[np.ndarray]  # 所有棋盘状态(用于训练数据)
+    move_history: np.ndarray  # 移动历史 (总移动数, 6) int8，每行为(move, player, die)
+    board_states: Optional[np.ndarray]  # 所有棋盘状态 (总移动数+1, 5, 5) int8(用于训练数据，未记录时为None)
 
-@dataclass
+@dataclass(frozen=True)
 class AIPlayer:
-    """AI玩家配置"""
+    """AI玩家配置(不可变，可以安全地缓存和共享)"""
     name: str
     player_id: int  # 1=蓝方, -1=红方
     simulation_count: int
     exploration_constant: float
     time_limit: Optional[float] = None  # 思考时间限制(秒)
 
+@functools.lru_cache(maxsize=128)
+def _make_ai_player(name: str, player_id: int, difficulty: int,
+                    custom_simulations: Optional[int],
+                    custom_exploration: Optional[float]) -> AIPlayer:
+    """创建AI玩家配置，相同参数直接返回缓存的对象"""
+    simulations = custom_simulations or Config.MCTS_SIMULATIONS.get(difficulty, 2000)
+    exploration = custom_exploration or Config.UCB_CONSTANT
+    
+    return AIPlayer(
+        name=name,
+        player_id=player_id,
+        simulation_count=simulations,
+        exploration_constant=exploration
+    )
+
+# 工作进程(线程)内的对战系统(每个进程/线程一个，跨对局复用游戏引擎和PMCTS实例)
+# 游戏引擎的走法缓冲区和PMCTS的置换表都不能被同时进行的对局共用，线程池中每个线程各自创建
+_worker_local = threading.local()
+
+def _init_worker() -> None:
+    """
+    进程池初始化函数 - 每个子进程启动时执行一次(线程池中每个线程第一次对局时执行)
+    创建本进程(线程)的对战系统，重新生成模拟用的随机数种子(不与父进程和其他子进程相同)，
+    并预先加载numba编译缓存(cache=True，只读取缓存不重新编译)，使第一场对局不承担编译开销
+    """
+    from core import rollout_numba  # 只在需要模拟的子进程中加载numba
+    
+    _worker_local.battle_system = AIBattleSystem()
+    log.setLevel(logging.WARNING)  # 子进程中不需要搜索过程的调试日志
+    rollout_numba.seed_thread()
+    if rollout_numba.NUMBA_AVAILABLE:
+        rollout_numba.rollout(_DEFAULT_BOARD_TEMPLATE.ravel(), 1, 1,
+                              rollout_numba.thread_rng_state(), 0)
+
+def _run_single_battle(blue_ai: AIPlayer, red_ai: AIPlayer, max_moves: int = 200,
+                       record_states: bool = True, seed: Optional[int] = None) -> GameResult:
+    """
+    进程池工作函数 - 在子进程中执行单场对战
+    在子进程内创建游戏引擎和PMCTS，避免序列化主进程中的对象
+    """
+    battle_system = getattr(_worker_local, 'battle_system', None)
+    if battle_system is None:
+        _init_worker()  # 未通过进程池初始化函数启动(如线程池)时在此初始化
+        battle_system = _worker_local.battle_system
+    return battle_system.single_battle(blue_ai, red_ai, initial_board=None,
+                                       max_moves=max_moves, verbose=False,
+                                       seed=seed, record_states=record_states)
+
 class AIBattleSystem:
     """AI对战系统"""
     
     def __init__(self):
         """初始化对战系统"""
         self.game = EinsteinGame()
+        self._pmcts_cache: Dict[Tuple[int, float], PMCTS] = {}  # 按(玩家, 探索常数)缓存的PMCTS实例
         self.battle_results: List[GameResult] = []
-        self.statistics = {
-            'total_games': 0,
-            'blue_wins': 0,
-            'red_wins': 0,
-            'draws': 0,
-            'average_game_length': 0.0,
-            'average_thinking_time': 0.0
-        }
+        # 预分配的对局结果表，按行写入，统计信息直接在表上用NumPy计算
+        self._results = np.zeros(_INITIAL_RESULT_CAPACITY, dtype=RESULT_DTYPE)
+        self._num_results = 0
+        self._ai_ids: Dict[str, int] = {}  # AI名称 -> 结果表中的AI编号
     
     def create_ai_player(self, name: str, player_id: int, difficulty: int, 
                         custom_simulations: Optional[int] = None,
@@ -70,20 +147,16 @@ class AIBattleSystem:
         返回:
             AI玩家对象
         """
-        simulations = custom_simulations or Config.MCTS_SIMULATIONS.get(difficulty, 2000)
-        exploration = custom_exploration or Config.UCB_CONSTANT
-        
-        return AIPlayer(
-            name=name,
-            player_id=player_id,
-            simulation_count=simulations,
-            exploration_constant=exploration
-        )
+        return _make_ai_player(name, player_id, difficulty, custom_simulations, custom_exploration)
     
     def single_battle(self, blue_ai: AIPlayer, red_ai: AIPlayer, 
                      initial_board: Optional[np.ndarray] = None,
                      max_moves: int = 200,
-                     verbose: bool = False) -> GameResult:
+                     verbose: bool = False,
+                     seed: Optional[int] = None,
+                     rng: Optional[np.random.Generator] = None,
+                     record_states: bool = True,
+                     _trust_input: bool = False) -> GameResult:
         """
         执行单场AI对战
         
@@ -93,6 +166,10 @@ class AIBattleSystem:
             initial_board: 初始棋盘(None则使用默认布局)
             max_moves: 最大移动数
             verbose: 是否输出详细信息
+            seed: 随机数种子(用于复现对局)：未提供rng时决定初始棋盘和骰子，同时决定搜索的随机数
+            rng: 本局使用的随机数生成器(None则新建一个，每个线程/进程各自独立，互不加锁)
+            record_states: 是否记录每一步的棋盘状态(只需要胜负结果时可关闭)
+            _trust_input: 内部调用使用，表示initial_board是调用方新建且不再使用的数组，可直接接管
             
         返回:
             游戏结果
@@ -100,32 +177,61 @@ class AIBattleSystem:
         if verbose:
             print(f"开始对战: {blue_ai.name} vs {red_ai.name}")
         
+        if rng is None:
+            rng = np.random.default_rng(seed)
+        if seed is not None:
+            seed_thread(seed)  # 概率节点选择和随机模拟也由种子确定，同一种子得到相同的对局
+        
         # 初始化游戏状态
-        if initial_board is not None:
-            board = initial_board.copy()
+        if initial_board is None:
+            board = self._generate_default_board(rng)  # 新生成的棋盘，无需复制
         else:
-            board = self._generate_default_board()
+            # 统一为int8；除非调用方声明已转移所有权，否则复制以保护调用方的数组
+            board = initial_board.astype(np.int8, copy=not _trust_input)
+        
+        # 增量维护棋子位置和数量，每步判断胜负时无需扫描棋盘(移动会原地修改board)
+        state = GameState.from_board(board)
         
         current_player = 1  # 蓝方先手
         move_count = 0
         start_time = time.time()
         
         # 记录数据
-        move_history = []
-        board_states = [board.copy()]
-        blue_thinking_time = 0.0
-        red_thinking_time = 0.0
-        
-        # 创建AI实例
-        blue_pmcts = PMCTS(self.game, blue_ai.exploration_constant)
-        red_pmcts = PMCTS(self.game, red_ai.exploration_constant)
-        
-        while not self.game.is_game_over(board) and move_count < max_moves:
-            # 生成随机骰子
-            die = random.randint(1, 6)
+        move_history = np.empty((max_moves, 6), dtype=np.int8)  # 预分配的移动历史
+        board_states = None
+        if record_states:
+            # 预分配的int8棋盘数组，每步只复制25字节，避免逐步追加
+            board_states = np.empty((max_moves + 1, 5, 5), dtype=np.int8)
+            board_states[0] = board
+        
+        # 预先生成整局的骰子序列(转为Python整数列表)，避免每步调用random
+        dice_rolls = rng.integers(1, 7, size=max_moves, dtype=np.int8).tolist()
+        roll_idx = 0
+        
+        # 获取AI实例(跨对局复用)
+        blue_pmcts = self._get_pmcts(1, blue_ai.exploration_constant)
+        red_pmcts = self._get_pmcts(-1, red_ai.exploration_constant)
+        
+        # 循环中使用的方法和每方的AI设置提前绑定为局部变量，减少每步的属性查找和分支
+        is_game_over = state.is_game_over
+        get_legal_moves = state.get_legal_moves
+        make_move = state.make_move
+        ai_settings = {
+            1: (blue_pmcts.search, blue_ai.simulation_count, blue_ai.name),
+            -1: (red_pmcts.search, red_ai.simulation_count, red_ai.name)
+        }
+        thinking_times = {1: 0.0, -1: 0.0}
+        
+        while not is_game_over() and move_count < max_moves:
+            # 取出预先生成的骰子(跳过的回合不计步数，用完时补充)
+            if roll_idx == len(dice_rolls):
+                dice_rolls = rng.integers(1, 7, size=max_moves, dtype=np.int8).tolist()
+                roll_idx = 0
+            die = dice_rolls[roll_idx]
+            roll_idx += 1
             
             # 检查是否有合法移动
-            legal_moves = self.game.get_legal_moves(board, die, current_player)
+            legal_moves = get_legal_moves(die, current_player)
             if not legal_moves:
                 if verbose:
                     player_name = "蓝方" if current_player == 1 else "红方"
@@ -133,17 +239,15 @@ class AIBattleSystem:
                 current_player = -current_player
                 continue
             
-            # AI思考
-            think_start = time.time()
+            search, simulation_count, ai_name = ai_settings[current_player]
             
-            if current_player == 1:  # 蓝方回合
-                best_move = blue_pmcts.search(board, die, current_player, blue_ai.simulation_count)
-                blue_thinking_time += time.time() - think_start
-                ai_name = blue_ai.name
-            else:  # 红方回合
-                best_move = red_pmcts.search(board, die, current_player, red_ai.simulation_count)
-                red_thinking_time += time.time() - think_start
-                ai_name = red_ai.name
+            # AI思考(只有一个合法移动时无需搜索)
+            think_start = time.time()
+            if len(legal_moves) == 1:
+                best_move = legal_moves[0]
+            else:
+                best_move = search(board, die, current_player, simulation_count)
+            thinking_times[current_player] += time.time() - think_start
             
             if best_move is None:
                 if verbose:
@@ -151,13 +255,14 @@ class AIBattleSystem:
                 current_player = -current_player
                 continue
             
-            # 执行移动
-            board = self.game.make_move(board, best_move)
+            # 执行移动(原地更新棋盘和统计信息)
+            make_move(best_move)
             move_count += 1
             
             # 记录移动
-            move_history.append((*best_move, current_player, die))
-            board_states.append(board.copy())
+            move_history[move_count - 1] = (*best_move, current_player, die)
+            if record_states:
+                board_states[move_count] = board
             
             if verbose:
                 print(f"第{move_count}回合: {ai_name} 骰子{die} 移动 {best_move}")
@@ -167,7 +272,7 @@ class AIBattleSystem:
         
         # 计算结果
         game_duration = time.time() - start_time
-        winner = self.game.get_winner(board)
+        winner = state.get_winner()
         
         if verbose:
             if winner == 1:
@@ -182,18 +287,22 @@ class AIBattleSystem:
             winner=winner,
             total_moves=move_count,
             game_duration=game_duration,
-            blue_thinking_time=blue_thinking_time,
-            red_thinking_time=red_thinking_time,
+            blue_thinking_time=thinking_times[1],
+            red_thinking_time=thinking_times[-1],
             final_board=board,
-            move_history=move_history,
-            board_states=board_states
+            move_history=move_history[:move_count],
+            board_states=board_states[:move_count + 1] if record_states else None
         )
     
+    @quiet
     def batch_battle(self, blue_ai: AIPlayer, red_ai: AIPlayer,
                     num_games: int = 100,
-                    parallel: bool = True,
+                    parallel = True,
                     max_workers: int = 4,
-                    progress_callback = None) -> List[GameResult]:
+                    max_moves: int = 200,
+                    record_states: bool = False,
+                    progress_callback = None,
+                    seed: Optional[int] = None) -> List[GameResult]:
         """
         批量对战
         
@@ -201,9 +310,13 @@ class AIBattleSystem:
             blue_ai: 蓝方AI配置
             red_ai: 红方AI配置
             num_games: 对战场数
-            parallel: 是否并行执行
-            max_workers: 最大工作线程数
-            progress_callback: 进度回调函数
+            parallel: 是否并行执行 (True/"process"=多进程, "thread"=多线程(调试用), False=串行)
+            max_workers: 最大工作进程(线程)数
+            max_moves: 每场最大移动数
+            record_states: 是否记录棋盘状态(收集训练数据时需要)
+            progress_callback: 进度回调函数(始终在主进程中调用)
+            seed: 随机数种子，第i场对局使用seed+i(初始棋盘、骰子和搜索的随机数都由它确定，
+                  None则每场随机)，便于复现整批对局
             
         返回:
             所有游戏结果列表
@@ -211,67 +324,185 @@ class AIBattleSystem:
         print(f"开始批量对战: {num_games} 场")
         print(f"{blue_ai.name} vs {red_ai.name}")
         
-        results = []
+        # 按对局编号预分配结果槽位，出错的对局保持为None
+        slots: List[Optional[GameResult]] = [None] * num_games
+        completed = 0
+        game_seeds = [None if seed is None else seed + game_idx for game_idx in range(num_games)]
         
         if parallel and num_games > 1:
-            # 并行执行
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = []
-                
-                for game_idx in range(num_games):
-                    future = executor.submit(
-                        self.single_battle,
-                        blue_ai, red_ai,
-                        initial_board=None,
-                        verbose=False
-                    )
-                    futures.append(future)
+            # 并行执行: PMCTS是纯Python计算，多线程受GIL限制，默认使用多进程
+            # 进程池通过_init_worker为每个进程创建一次对战系统并预热numba缓存
+            if parallel == "thread":
+                executor = ThreadPoolExecutor(max_workers=max_workers)
+            else:
+                executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+            
+            with executor:
+                future_to_idx = {
+                    executor.submit(_run_single_battle, blue_ai, red_ai, max_moves, record_states,
+                                    game_seeds[game_idx]): game_idx
+                    for game_idx in range(num_games)
+                }
                 
                 # 收集结果
-                for i, future in enumerate(as_completed(futures)):
+                for future in as_completed(future_to_idx):
+                    game_idx = future_to_idx[future]
                     try:
-                        result = future.result()
-                        results.append(result)
-                        
-                        if progress_callback:
-                            progress_callback(len(results), num_games)
-                        
-                        if (len(results)) % 10 == 0:
-                            print(f"已完成 {len(results)}/{num_games} 场对战")
-                            
+                        slots[game_idx] = future.result()
                     except Exception as e:
-                        print(f"游戏 {i+1} 执行出错: {e}")
+                        print(f"游戏 {game_idx + 1} 执行出错: {e}")
+                    
+                    completed += 1
+                    if progress_callback:
+                        progress_callback(completed, num_games)
+                    
+                    if completed % 10 == 0:
+                        print(f"已完成 {completed}/{num_games} 场对战")
         else:
             # 串行执行
             for game_idx in range(num_games):
                 try:
-                    result = self.single_battle(blue_ai, red_ai, verbose=False)
-                    results.append(result)
-                    
-                    if progress_callback:
-                        progress_callback(game_idx + 1, num_games)
-                    
-                    if (game_idx + 1) % 10 == 0:
-                        print(f"已完成 {game_idx + 1}/{num_games} 场对战")
-                        
+                    slots[game_idx] = self.single_battle(blue_ai, red_ai, max_moves=max_moves, verbose=False,
+                                                         seed=game_seeds[game_idx],
+                                                         record_states=record_states)
                 except Exception as e:
                     print(f"游戏 {game_idx + 1} 执行出错: {e}")
+                
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, num_games)
+                
+                if completed % 10 == 0:
+                    print(f"已完成 {completed}/{num_games} 场对战")
+        
+        results = [result for result in slots if result is not None]
         
         # 保存结果
         self.battle_results.extend(results)
-        self._update_statistics(results)
+        self._record_results(results, blue_ai, red_ai)
         
         print(f"批量对战完成，共 {len(results)} 场有效对战")
         return results
     
+    def batch_battle_vectorized(self, blue_ai: AIPlayer, red_ai: AIPlayer,
+                                num_games: int = 100,
+                                E: int = 32,
+                                max_moves: int = 200,
+                                record_states: bool = False,
+                                progress_callback = None) -> List[GameResult]:
+        """
+        同步批量对战 - 每次让E场对局一起前进一步
+        同一方的所有对局通过PMCTS.search_batch一起搜索，叶子节点批量模拟
+        
+        参数:
+            blue_ai: 蓝方AI配置
+            red_ai: 红方AI配置
+            num_games: 对战场数
+            E: 同时进行的对局数
+            max_moves: 每场最大移动数
+            record_states: 是否记录棋盘状态(收集训练数据时需要)
+            progress_callback: 进度回调函数
+            
+        返回:
+            所有游戏结果列表
+        """
+        print(f"开始同步批量对战: {num_games} 场, 每批 {E} 场")
+        print(f"{blue_ai.name} vs {red_ai.name}")
+        
+        blue_pmcts = self._get_pmcts(1, blue_ai.exploration_constant)
+        red_pmcts = self._get_pmcts(-1, red_ai.exploration_constant)
+        ai_settings = {
+            1: (blue_pmcts, blue_ai.simulation_count),
+            -1: (red_pmcts, red_ai.simulation_count)
+        }
+        
+        results = []
+        rng = np.random.default_rng()
+        
+        for batch_start in range(0, num_games, E):
+            batch_size = min(E, num_games - batch_start)
+            start_time = time.time()
+            
+            # 初始化这一批对局的状态
+            boards = np.stack([self._generate_default_board(rng) for _ in range(batch_size)])
+            players = np.ones(batch_size, dtype=int)  # 蓝方先手
+            move_counts = np.zeros(batch_size, dtype=int)
+            done = self.game.is_game_over_batch(boards)
+            thinking_times = {1: np.zeros(batch_size), -1: np.zeros(batch_size)}
+            move_histories = np.empty((batch_size, max_moves, 6), dtype=np.int8)
+            if record_states:
+                board_states = np.empty((batch_size, max_moves + 1, 5, 5), dtype=np.int8)
+                board_states[:, 0] = boards
+            
+            while not done.all():
+                dice = rng.integers(1, 7, size=batch_size)
+                
+                # 按当前玩家分组，同一方的对局一起搜索
+                for player in (1, -1):
+                    group = np.flatnonzero(~done & (players == player))
+                    if len(group) == 0:
+                        continue
+                    
+                    pmcts, simulation_count = ai_settings[player]
+                    think_start = time.time()
+                    best_moves = pmcts.search_batch(boards[group], dice[group],
+                                                    players[group], simulation_count)
+                    thinking_times[player][group] += (time.time() - think_start) / len(group)
+                    
+                    moved = [(i, move) for i, move in zip(group, best_moves) if move is not None]
+                    if moved:
+                        moved_indices = np.array([i for i, _ in moved])
+                        boards[moved_indices] = self.game.make_move_batch(
+                            boards[moved_indices], np.array([move for _, move in moved])
+                        )
+                        for i, move in moved:
+                            move_histories[i, move_counts[i]] = (*move, player, dice[i])
+                            move_counts[i] += 1
+                            if record_states:
+                                board_states[i, move_counts[i]] = boards[i]
+                    
+                # 没有合法移动的对局同样跳过回合
+                players[~done] = -players[~done]
+                done = self.game.is_game_over_batch(boards) | (move_counts >= max_moves)
+            
+            game_duration = time.time() - start_time
+            winners = self.game.get_winner_batch(boards)
+            
+            for i in range(batch_size):
+                results.append(GameResult(
+                    winner=int(winners[i]),
+                    total_moves=int(move_counts[i]),
+                    game_duration=game_duration,
+                    blue_thinking_time=float(thinking_times[1][i]),
+                    red_thinking_time=float(thinking_times[-1][i]),
+                    final_board=boards[i].copy(),
+                    move_history=move_histories[i, :move_counts[i]].copy(),
+                    board_states=board_states[i, :move_counts[i] + 1].copy() if record_states else None
+                ))
+            
+            if progress_callback:
+                progress_callback(len(results), num_games)
+            
+            print(f"已完成 {len(results)}/{num_games} 场对战")
+        
+        # 保存结果
+        self.battle_results.extend(results)
+        self._record_results(results, blue_ai, red_ai)
+        
+        print(f"同步批量对战完成，共 {len(results)} 场有效对战")
+        return results
+    
     def tournament(self, ai_configs: List[Dict], 
-                  games_per_match: int = 50) -> Dict:
+                  games_per_match: int = 50,
+                  max_workers: int = 4) -> Dict:
         """
         锦标赛模式 - 多个AI互相对战
+        所有对阵的所有对局统一提交到同一个进程池，不同对阵之间也并行执行
         
         参数:
             ai_configs: AI配置列表，每个包含name, difficulty, simulations等
             games_per_match: 每对AI之间的对战场数
+            max_workers: 最大工作进程数
             
         返回:
             锦标赛结果统计
@@ -292,36 +523,71 @@ class AIBattleSystem:
                 custom_exploration=config.get('exploration')
             ))
         
-        # 两两对战
+        # 两两对阵: AI1作为蓝方，AI2作为红方
+        matches = []
         for i, ai1 in enumerate(ai_players):
             for j, ai2 in enumerate(ai_players):
                 if i >= j:  # 避免重复对战和自己对战自己
                     continue
-                
-                print(f"对战: {ai1.name} vs {ai2.name}")
-                
-                # AI1作为蓝方，AI2作为红方
                 blue_ai = AIPlayer(ai1.name + "(蓝)", 1, ai1.simulation_count, ai1.exploration_constant)
                 red_ai = AIPlayer(ai2.name + "(红)", -1, ai2.simulation_count, ai2.exploration_constant)
+                matches.append((ai1, ai2, blue_ai, red_ai))
+        
+        total_games = len(matches) * games_per_match
+        print(f"共 {len(matches)} 组对阵, {total_games} 场对局")
+        
+        # 所有对局提交到同一个进程池，结果按对局编号写入预分配的结果表
+        game_results: List[Optional[GameResult]] = [None] * total_games
+        table = np.zeros(total_games, dtype=RESULT_DTYPE)
+        valid = np.zeros(total_games, dtype=bool)
+        match_of_game = np.repeat(np.arange(len(matches)), games_per_match)  # 对局编号 -> 对阵编号
+        completed = 0
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            future_to_game = {}
+            for match_idx, (_, _, blue_ai, red_ai) in enumerate(matches):
+                for game in range(games_per_match):
+                    future = executor.submit(_run_single_battle, blue_ai, red_ai, 200, False)
+                    future_to_game[future] = match_idx * games_per_match + game
+            
+            for future in as_completed(future_to_game):
+                game_idx = future_to_game[future]
+                _, _, blue_ai, red_ai = matches[match_of_game[game_idx]]
+                try:
+                    result = future.result()
+                    game_results[game_idx] = result
+                    table[game_idx] = self._result_row(result, blue_ai, red_ai)
+                    valid[game_idx] = True
+                except Exception as e:
+                    print(f"对阵 {blue_ai.name} vs {red_ai.name} 的对局执行出错: {e}")
                 
-                results = self.batch_battle(blue_ai, red_ai, games_per_match, parallel=True)
-                
-                # 统计这场比赛的结果
-                blue_wins = sum(1 for r in results if r.winner == 1)
-                red_wins = sum(1 for r in results if r.winner == -1)
-                draws = sum(1 for r in results if r.winner == 0)
-                
-                match_result = {
-                    'ai1': ai1.name,
-                    'ai2': ai2.name,
-                    'ai1_wins': blue_wins,
-                    'ai2_wins': red_wins,
-                    'draws': draws,
-                    'total_games': len(results)
-                }
-                match_results.append(match_result)
-                
-                print(f"结果: {ai1.name} {blue_wins}胜 vs {ai2.name} {red_wins}胜, 平局 {draws}")
+                completed += 1
+                if completed % 10 == 0:
+                    print(f"已完成 {completed}/{total_games} 场对战")
+        
+        # 按对阵统计胜负(对所有对局一次性计数)
+        winners = table['winner']
+        num_matches = len(matches)
+        blue_wins = np.bincount(match_of_game[valid & (winners == 1)], minlength=num_matches)
+        red_wins = np.bincount(match_of_game[valid & (winners == -1)], minlength=num_matches)
+        draws = np.bincount(match_of_game[valid & (winners == 0)], minlength=num_matches)
+        totals = np.bincount(match_of_game[valid], minlength=num_matches)
+        
+        for match_idx, (ai1, ai2, _, _) in enumerate(matches):
+            match_result = {
+                'ai1': ai1.name,
+                'ai2': ai2.name,
+                'ai1_wins': int(blue_wins[match_idx]),
+                'ai2_wins': int(red_wins[match_idx]),
+                'draws': int(draws[match_idx]),
+                'total_games': int(totals[match_idx])
+            }
+            match_results.append(match_result)
+            
+            print(f"结果: {ai1.name} {match_result['ai1_wins']}胜 vs {ai2.name} "
+                  f"{match_result['ai2_wins']}胜, 平局 {match_result['draws']}")
+        
+        self.battle_results.extend(result for result in game_results if result is not None)
+        self._append_rows(table[valid])
         
         # 计算总排名
         ai_scores = {ai.name: 0 for ai in ai_players}
@@ -352,13 +618,13 @@ class AIBattleSystem:
         return tournament_results
     
     def collect_training_data(self, num_games: int = 1000,
-                             save_path: str = "training_data.json") -> List[Dict]:
+                             save_path: str = "training_data.jsonl") -> List[Dict]:
         """
         收集训练数据用于价值网络训练
         
         参数:
             num_games: 收集的游戏数量
-            save_path: 保存路径
+            save_path: 保存路径(.npz保存为按列存储的NumPy文件，其他扩展名每行一个JSON样本)
             
         返回:
             训练数据列表
@@ -381,7 +647,8 @@ class AIBattleSystem:
             blue_ai = self.create_ai_player(f"Blue_{config['name']}", 1, config['difficulty'])
             red_ai = self.create_ai_player(f"Red_{config['name']}", -1, config['difficulty'])
             
-            results = self.batch_battle(blue_ai, red_ai, games_per_config, parallel=True)
+            results = self.batch_battle(blue_ai, red_ai, games_per_config, parallel=True,
+                                        record_states=True)
             
             # 处理每场游戏的数据
             for result in results:
@@ -390,7 +657,10 @@ class AIBattleSystem:
         
         # 保存数据
         if save_path:
-            self._save_training_data(training_data, save_path)
+            if save_path.endswith('.npz'):
+                self._save_training_data_npz(training_data, save_path)
+            else:
+                self._save_training_data(training_data, save_path)
             print(f"训练数据已保存到: {save_path}")
         
         print(f"共收集到 {len(training_data)} 个训练样本")
@@ -401,84 +671,140 @@ class AIBattleSystem:
         从游戏结果中提取训练数据
         每个样本包含：棋盘状态、当前玩家、最终结果
         """
-        training_samples = []
+        assert result.board_states is not None, "提取训练数据需要以record_states=True进行对战"
         
-        # 为每个棋盘状态创建训练样本
-        for i, board_state in enumerate(result.board_states[:-1]):  # 排除最终状态
-            # 确定当前玩家（根据移动历史）
-            if i < len(result.move_history):
-                current_player = result.move_history[i][4]  # move_history中的player
-            else:
-                current_player = 1  # 默认蓝方开始
-            
-            # 计算价值标签（从当前玩家视角）
-            if result.winner == current_player:
-                value = 1.0  # 胜利
-            elif result.winner == -current_player:
-                value = -1.0  # 失败
-            else:
-                value = 0.0  # 平局
-            
-            sample = {
-                'board_state': board_state.tolist(),
+        # 一次性转换为Python列表(排除最终状态)
+        boards = result.board_states[:-1].tolist()
+        num_samples = len(boards)
+        
+        # 确定每个状态的当前玩家（根据移动历史，默认蓝方开始）
+        players = np.ones(num_samples, dtype=np.int8)
+        history_players = result.move_history[:num_samples, 4]
+        players[:len(history_players)] = history_players
+        
+        # 计算价值标签（从当前玩家视角）: 胜利1.0, 失败-1.0, 平局0.0
+        values = np.where(result.winner == players, 1.0,
+                          np.where(result.winner == -players, -1.0, 0.0))
+        
+        training_samples = [
+            {
+                'board_state': board_state,
                 'current_player': current_player,
                 'value': value,
                 'game_length': result.total_moves,
                 'move_index': i
             }
-            training_samples.append(sample)
+            for i, (board_state, current_player, value)
+            in enumerate(zip(boards, players.tolist(), values.tolist()))
+        ]
         
         return training_samples
     
-    def _save_training_data(self, training_data: List[Dict], filepath: str):
-        """保存训练数据到文件"""
+    def _save_training_data(self, training_data: Iterable[Dict], filepath: str):
+        """
+        保存训练数据到文件
+        按行写入JSON(JSON Lines)，逐个样本序列化，不需要一次性生成整个JSON字符串
+        安装了orjson时使用orjson，否则使用标准库json
+        """
         import os
         os.makedirs(os.path.dirname(filepath) if os.path.dirname(filepath) else '.', exist_ok=True)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(training_data, f, indent=2, ensure_ascii=False)
-    
-    def _generate_default_board(self) -> np.ndarray:
-        """生成默认初始棋盘布局"""
-        board = np.array([
-            [0, 0, 0, 0, 12],
-            [0, 0, 0, 11, 0],
-            [0, 0, 10, 9, 8],
-            [0, 7, 0, 0, 0],
-            [1, 0, 0, 0, 0]
-        ])
-        
-        # 随机放置剩余棋子
-        empty_positions = [(i, j) for i in range(5) for j in range(5) if board[i, j] == 0]
-        remaining_pieces = [2, 3, 4, 5, 6]  # 红方剩余棋子
-        
-        random.shuffle(empty_positions)
-        for i, piece in enumerate(remaining_pieces):
-            if i < len(empty_positions):
-                row, col = empty_positions[i]
-                board[row, col] = piece
+        with open(filepath, 'wb') as f:
+            for sample in training_data:
+                if orjson is not None:
+                    f.write(orjson.dumps(sample, option=orjson.OPT_SERIALIZE_NUMPY))
+                else:
+                    f.write(json.dumps(sample, ensure_ascii=False).encode('utf-8'))
+                f.write(b'\n')
+    
+    def _save_training_data_npz(self, training_data: List[Dict], filepath: str):
+        """
+        以NumPy压缩文件(.npz)保存训练数据
+        每个字段存为一列数组，训练时可直接np.load读取
+        """
+        import os
+        os.makedirs(os.path.dirname(filepath) if os.path.dirname(filepath) else '.', exist_ok=True)
         
-        return board
+        boards = np.array([s['board_state'] for s in training_data], dtype=np.int8).reshape(-1, 5, 5)
+        np.savez_compressed(
+            filepath,
+            boards=boards,
+            players=np.array([s['current_player'] for s in training_data], dtype=np.int8),
+            values=np.array([s['value'] for s in training_data], dtype=np.float32),
+            game_lengths=np.array([s['game_length'] for s in training_data], dtype=np.int16),
+            move_indices=np.array([s['move_index'] for s in training_data], dtype=np.int16)
+        )
     
-    def _update_statistics(self, results: List[GameResult]):
-        """更新统计信息"""
-        self.statistics['total_games'] += len(results)
+    def _get_pmcts(self, player: int, exploration_constant: float) -> PMCTS:
+        """
+        获取指定玩家和探索常数的PMCTS实例
+        实例按(玩家, 探索常数)缓存并在对局之间复用，每局开始前重置搜索状态；
+        置换表在一局内跨搜索保留，双方各用一个实例，搜索统计不会在双方之间共享
+        """
+        key = (player, exploration_constant)
+        pmcts = self._pmcts_cache.get(key)
+        if pmcts is None:
+            pmcts = PMCTS(self.game, exploration_constant)
+            self._pmcts_cache[key] = pmcts
+        else:
+            pmcts.reset()
+        return pmcts
+    
+    def _generate_default_board(self, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """生成默认初始棋盘布局(rng为None时新建随机数生成器)"""
+        if rng is None:
+            rng = np.random.default_rng()
+        board = _DEFAULT_BOARD_TEMPLATE.copy()
         
-        for result in results:
-            if result.winner == 1:
-                self.statistics['blue_wins'] += 1
-            elif result.winner == -1:
-                self.statistics['red_wins'] += 1
-            else:
-                self.statistics['draws'] += 1
+        # 随机放置剩余棋子: 在空格的扁平索引中不重复地抽取位置
+        chosen = rng.choice(_DEFAULT_EMPTY_CELLS, size=len(_REMAINING_PIECES), replace=False)
+        board.flat[chosen] = _REMAINING_PIECES
         
-        # 计算平均值
-        if self.statistics['total_games'] > 0:
-            total_moves = sum(r.total_moves for r in results)
-            total_time = sum(r.blue_thinking_time + r.red_thinking_time for r in results)
-            
-            self.statistics['average_game_length'] = total_moves / len(results)
-            self.statistics['average_thinking_time'] = total_time / len(results)
+        return board
+    
+    @property
+    def ai_names(self) -> List[str]:
+        """结果表中AI编号对应的名称(下标即编号)"""
+        return list(self._ai_ids)
+    
+    @property
+    def results_table(self) -> np.ndarray:
+        """已记录的对局结果表(RESULT_DTYPE结构化数组的视图，不复制)"""
+        return self._results[:self._num_results]
+    
+    def _ai_id(self, ai: AIPlayer) -> int:
+        """获取AI在结果表中的编号，第一次出现时分配新编号"""
+        return self._ai_ids.setdefault(ai.name, len(self._ai_ids))
+    
+    def _result_row(self, result: GameResult, blue_ai: AIPlayer, red_ai: AIPlayer) -> tuple:
+        """把一场对局结果转换为结果表中的一行"""
+        return (result.winner, result.total_moves, self._ai_id(blue_ai), self._ai_id(red_ai),
+                result.game_duration * 1000.0,
+                result.blue_thinking_time + result.red_thinking_time)
+    
+    def _record_results(self, results: List[GameResult], blue_ai: AIPlayer, red_ai: AIPlayer):
+        """把同一组对阵的对局结果写入结果表"""
+        count = len(results)
+        rows = np.empty(count, dtype=RESULT_DTYPE)
+        rows['winner'] = np.fromiter((r.winner for r in results), dtype=np.int8, count=count)
+        rows['moves'] = np.fromiter((r.total_moves for r in results), dtype=np.int32, count=count)
+        rows['blue_ai'] = self._ai_id(blue_ai)
+        rows['red_ai'] = self._ai_id(red_ai)
+        rows['duration_ms'] = np.fromiter((r.game_duration * 1000.0 for r in results),
+                                          dtype=np.float32, count=count)
+        rows['thinking_time'] = np.fromiter((r.blue_thinking_time + r.red_thinking_time
+                                             for r in results), dtype=np.float32, count=count)
+        self._append_rows(rows)
+    
+    def _append_rows(self, rows: np.ndarray):
+        """把若干行追加到结果表，容量不足时按2倍扩容"""
+        end = self._num_results + len(rows)
+        if end > len(self._results):
+            grown = np.zeros(max(end, 2 * len(self._results)), dtype=RESULT_DTYPE)
+            grown[:self._num_results] = self.results_table
+            self._results = grown
+        self._results[self._num_results:end] = rows
+        self._num_results = end
     
     def _print_tournament_results(self, results: Dict):
         """打印锦标赛结果"""
@@ -496,13 +822,24 @@ class AIBattleSystem:
                   f"{match['ai1_wins']:2d}胜 {match['ai2_wins']:2d}负 {match['draws']:2d}平")
     
     def get_statistics(self) -> Dict:
-        """获取统计信息"""
-        stats = self.statistics.copy()
+        """获取统计信息(在结果表上计算，包含所有已记录的对局)"""
+        table = self.results_table
+        total = len(table)
+        winners = table['winner']
+        
+        stats = {
+            'total_games': total,
+            'blue_wins': int((winners == 1).sum()),
+            'red_wins': int((winners == -1).sum()),
+            'draws': int((winners == 0).sum()),
+            'average_game_length': float(table['moves'].mean()) if total else 0.0,
+            'average_thinking_time': float(table['thinking_time'].mean()) if total else 0.0
+        }
         
-        if stats['total_games'] > 0:
-            stats['blue_win_rate'] = stats['blue_wins'] / stats['total_games']
-            stats['red_win_rate'] = stats['red_wins'] / stats['total_games']
-            stats['draw_rate'] = stats['draws'] / stats['total_games']
+        if total > 0:
+            stats['blue_win_rate'] = stats['blue_wins'] / total
+            stats['red_win_rate'] = stats['red_wins'] / total
+            stats['draw_rate'] = stats['draws'] / total
         else:
             stats['blue_win_rate'] = 0.0
             stats['red_win_rate'] = 0.0
@@ -526,7 +863,7 @@ class AIBattleSystem:
                 'blue_thinking_time': result.blue_thinking_time,
                 'red_thinking_time': result.red_thinking_time,
                 'final_board': result.final_board.tolist(),
-                'move_history': result.move_history
+                'move_history': result.move_history.tolist()
             }
             results_data['battle_results'].append(result_dict)
         
@@ -541,9 +878,6 @@ class BattleGUI:
     
     def __init__(self, battle_system: AIBattleSystem):
         """初始化对弈界面"""
-        import tkinter as tk
-        from tkinter import ttk
-        
         self.battle_system = battle_system
         self.root = tk.Tk()
         self.root.title("AI对战系统")
@@ -553,9 +887,6 @@ class BattleGUI:
     
     def setup_ui(self):
         """设置用户界面"""
-        import tkinter as tk
-        from tkinter import ttk
-        
         # 主框架
         main_frame = tk.Frame(self.root)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -609,7 +940,7 @@ class BattleGUI:
         self.num_games.insert(0, "100")
         self.num_games.pack(side=tk.LEFT, padx=(5, 20))
         
-        tk.Label(games_frame, text="并行线程:").pack(side=tk.LEFT)
+        tk.Label(games_frame, text="并行进程:").pack(side=tk.LEFT)
         self.max_workers = tk.Entry(games_frame, width=10)
         self.max_workers.insert(0, "4")
         self.max_workers.pack(side=tk.LEFT, padx=5)
@@ -665,7 +996,6 @@ class BattleGUI:
     
     def start_battle(self):
         """开始对战"""
-        import tkinter as tk
         try:
             # 获取配置
             blue_ai = self.battle_system.create_ai_player(
@@ -685,9 +1015,10 @@ class BattleGUI:
             self.progress['maximum'] = num_games
             
             def progress_callback(completed, total):
-                _ = total  # Mark parameter as used
-                self.progress['value'] = completed
-                self.root.update()
+                # 回调在后台线程中执行，通过after交给Tk主循环更新进度条；
+                # 每10场才更新一次，减少主循环被唤醒的次数
+                if completed % 10 == 0 or completed == total:
+                    self.root.after(0, lambda c=completed: self.progress.configure(value=c))
             
             def battle_thread():
                 results = self.battle_system.batch_battle(
@@ -703,7 +1034,6 @@ class BattleGUI:
             threading.Thread(target=battle_thread, daemon=True).start()
             
         except ValueError as e:
-            import tkinter.messagebox as messagebox
             messagebox.showerror("参数错误", f"请检查输入参数: {e}")
     
     def start_tournament(self):
@@ -713,8 +1043,6 @@ class BattleGUI:
     
     def collect_training_data(self):
         """收集训练数据"""
-        from tkinter import simpledialog, messagebox
-        
         num_games = simpledialog.askinteger("训练数据", "收集多少场游戏数据？", initialvalue=1000)
         if num_games:
             def collect_thread():
@@ -729,7 +1057,6 @@ class BattleGUI:
     def update_results(self, results: List[GameResult]):
         """更新结果显示"""
         # 清空之前的结果
-        import tkinter as tk
         self.stats_text.delete(1.0, tk.END)
         self.details_text.delete(1.0, tk.END)
         
@@ -761,9 +1088,6 @@ class TournamentDialog:
     """锦标赛配置对话框"""
     
     def __init__(self, parent, battle_system, result_callback):
-        import tkinter as tk
-        from tkinter import ttk
-        
         self.parent = parent
         self.battle_system = battle_system
         self.result_callback = result_callback
@@ -778,9 +1102,6 @@ class TournamentDialog:
     
     def setup_dialog(self):
         """设置对话框"""
-        import tkinter as tk
-        from tkinter import ttk
-        
         # AI列表
         list_frame = tk.LabelFrame(self.dialog, text="参赛AI")
         list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -825,7 +1146,6 @@ class TournamentDialog:
     
     def add_ai_callback(self, ai_config):
         """添加AI回调"""
-        import tkinter as tk
         self.ai_configs.append(ai_config)
         self.ai_listbox.insert(tk.END, f"{ai_config['name']} (难度{ai_config['difficulty']}, {ai_config['simulations']}次模拟)")
     
@@ -841,7 +1161,6 @@ class TournamentDialog:
         """开始锦标赛"""
         
         if len(self.ai_configs) < 2:
-            import tkinter.messagebox as messagebox
             messagebox.showerror("错误", "至少需要2个AI参加锦标赛")
             return
         
@@ -851,7 +1170,6 @@ class TournamentDialog:
             results = self.battle_system.tournament(self.ai_configs, games_per_match)
             # 这里可以调用结果回调来显示锦标赛结果
         
-        import threading
         threading.Thread(target=tournament_thread, daemon=True).start()
         self.dialog.destroy()
 
@@ -860,8 +1178,6 @@ class AddAIDialog:
     """添加AI对话框"""
     
     def __init__(self, parent, callback):
-        import tkinter as tk
-        
         self.callback = callback
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("添加AI")
@@ -872,8 +1188,6 @@ class AddAIDialog:
     
     def setup_dialog(self):
         """设置对话框"""
-        import tkinter as tk
-        
         tk.Label(self.dialog, text="AI名称:").pack(anchor=tk.W, padx=10, pady=5)
         self.name_entry = tk.Entry(self.dialog)
         self.name_entry.pack(fill=tk.X, padx=10, pady=2)
@@ -4,11 +4,15 @@
 这个程序会被Java调用，读取JavaOut.txt，输出JavaIn.txt
 """
 
+import multiprocessing
+import sys
+
 # 导入我们自己编写的模块
 from core.game_engine import EinsteinGame
 from core.pmcts import PMCTS  # 使用PMCTS算法替代原来的MCTS
 from core.file_handler import FileHandler
 from core.config import Config
+from core.logger import log
 
 
 class BlueAI:
@@ -16,19 +20,19 @@ class BlueAI:
     
     def __init__(self):
         """初始化蓝方PMCTS AI"""
-        print("初始化蓝方PMCTS AI...")
+        log.debug("初始化蓝方PMCTS AI...")
         
         # 创建游戏引擎实例
         self.game = EinsteinGame()
-        print("✓ 游戏引擎初始化完成")
+        log.debug("✓ 游戏引擎初始化完成")
         
         # 创建PMCTS搜索算法实例，使用论文中的参数设置
         self.pmcts = PMCTS(self.game, exploration_constant=Config.UCB_CONSTANT)
-        print("✓ PMCTS算法初始化完成")
+        log.debug("✓ PMCTS算法初始化完成")
         
         # 蓝方玩家编号固定为1
         self.player = 1
-        print("✓ 蓝方PMCTS AI初始化完成")
+        log.debug("✓ 蓝方PMCTS AI初始化完成")
     
     def get_best_move(self, board, die, difficulty):
         """
@@ -42,30 +46,36 @@ class BlueAI:
         返回:
             新的棋盘状态 (执行移动后的棋盘)
         """
-        print(f"蓝方PMCTS AI开始分析局面...")
-        print(f"当前棋盘状态:")
-        print(board)
+        log.debug(f"蓝方PMCTS AI开始分析局面...")
+        log.debug(f"当前棋盘状态:")
+        log.debug('%s', board)
         
         # 根据难度等级确定PMCTS模拟次数
         num_simulations = Config.MCTS_SIMULATIONS.get(difficulty, 2000)
-        print(f"难度等级: {difficulty}, PMCTS模拟次数: {num_simulations}")
-        print(f"骰子点数: {die}")
+        log.debug(f"难度等级: {difficulty}, PMCTS模拟次数: {num_simulations}")
+        log.debug(f"骰子点数: {die}")
         
         # 使用PMCTS算法搜索最佳移动
         # 与传统MCTS不同，PMCTS会考虑骰子的概率分布
-        best_move = self.pmcts.search(board, die, self.player, num_simulations)
+        if Config.ROOT_PARALLEL_WORKERS > 1:
+            # 根并行：多个进程各自建树，汇总访问次数
+            best_move = self.pmcts.search_root_parallel(board, die, self.player, num_simulations,
+                                                        Config.ROOT_PARALLEL_WORKERS)
+        else:
+            best_move = self.pmcts.search(board, die, self.player, num_simulations,
+                                          num_threads=Config.SEARCH_THREADS)
         
         if best_move is None:
             # 没有找到合法移动，返回原棋盘
-            print("警告: 没有找到合法移动，返回原棋盘")
+            log.warning("警告: 没有找到合法移动，返回原棋盘")
             return board
         
         # 执行最佳移动
-        print(f"执行PMCTS选择的移动: ({best_move[0]},{best_move[1]}) -> ({best_move[2]},{best_move[3]})")
+        log.debug(f"执行PMCTS选择的移动: ({best_move[0]},{best_move[1]}) -> ({best_move[2]},{best_move[3]})")
         new_board = self.game.make_move(board, best_move)
         
-        print("移动后棋盘:")
-        print(new_board)
+        log.debug("移动后棋盘:")
+        log.debug('%s', new_board)
         
         return new_board
 
@@ -76,47 +86,84 @@ def main():
     这个函数被Java程序调用时执行
     """
     try:
-        print("="*50)
-        print("蓝方PMCTS AI程序启动")
-        print("="*50)
+        log.debug("="*50)
+        log.debug("蓝方PMCTS AI程序启动")
+        log.debug("="*50)
         
         # 第1步: 读取Java程序传来的输入文件
-        print("第1步: 读取输入文件...")
+        log.debug("第1步: 读取输入文件...")
         difficulty, die, board = FileHandler.parse_input_file(Config.BLUE_INPUT_FILE)
         
         # 记录当前状况
         FileHandler.log_move_info("Blue PMCTS", difficulty, die)
         
         # 第2步: 创建蓝方PMCTS AI并计算最佳移动
-        print("第2步: PMCTS AI开始思考...")
+        log.debug("第2步: PMCTS AI开始思考...")
         blue_ai = BlueAI()
         new_board = blue_ai.get_best_move(board, die, difficulty)
         
         # 第3步: 将结果写入输出文件供Java程序读取
-        print("第3步: 写入输出文件...")
+        log.debug("第3步: 写入输出文件...")
         success = FileHandler.write_output_file(Config.BLUE_OUTPUT_FILE, new_board)
         
         if success:
-            print("✓ 蓝方PMCTS AI移动完成")
+            log.debug("✓ 蓝方PMCTS AI移动完成")
         else:
-            print("✗ 输出文件写入失败")
+            log.error("✗ 输出文件写入失败")
         
-        print("="*50)
+        log.debug("="*50)
         
     except Exception as error:
         # 如果出现任何错误，输出错误信息
-        print(f"蓝方PMCTS AI出现错误: {error}")
+        log.error(f"蓝方PMCTS AI出现错误: {error}")
         
         # 尝试进行错误恢复：输出原始棋盘
         try:
-            print("尝试错误恢复...")
+            log.warning("尝试错误恢复...")
             _, _, original_board = FileHandler.parse_input_file(Config.BLUE_INPUT_FILE)
             FileHandler.write_output_file(Config.BLUE_OUTPUT_FILE, original_board)
-            print("✓ 错误恢复完成，输出原始棋盘")
+            log.warning("✓ 错误恢复完成，输出原始棋盘")
         except:
-            print("✗ 错误恢复失败")
+            log.error("✗ 错误恢复失败")
+
+
+def serve():
+    """
+    常驻进程模式(python ai_blue.py --serve) - GUI在整局游戏中复用同一个AI进程
+    循环从标准输入读取请求(格式见FileHandler.read_request)，每个请求输出一行结果棋盘，
+    省去每一步启动解释器、导入模块和读写文件的开销；标准输入关闭时退出
+    同一局的各步之间保留PMCTS置换表(对手走一步后大部分局面已经搜索过)，收到新对局命令时清空
+    日志改为输出到标准错误，标准输出只用于传递结果
+    """
+    out = sys.stdout
+    sys.stdout = sys.stderr
+    blue_ai = BlueAI()
+    
+    while True:
+        request = FileHandler.read_request(sys.stdin)
+        if request is None:
+            break
+        if request == FileHandler.RESET_REQUEST:
+            blue_ai.pmcts.reset()
+            continue
+        difficulty, die, board = request
+        FileHandler.log_move_info("Blue PMCTS", difficulty, die)
+        
+        try:
+            new_board = blue_ai.get_best_move(board, die, difficulty)
+        except Exception as error:
+            # 与main相同的错误恢复：输出原始棋盘
+            log.error(f"蓝方PMCTS AI出现错误: {error}")
+            new_board = board
+        
+        out.write(FileHandler.format_board_line(new_board) + '\n')
+        out.flush()
 
 
 # 当这个文件被直接运行时（不是被导入时），执行main函数
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    multiprocessing.freeze_support()  # 打包成exe后根并行搜索的子进程需要
+    if '--serve' in sys.argv[1:]:
+        serve()
+    else:
+        main()
\ No newline at end of file
@@ -16,6 +16,17 @@ if exist "*.spec" (
     del *.spec
 )
 
+rem 编译可选的Cython加速模块(未安装Cython时跳过，程序自动使用纯Python实现)
+where cythonize >nul 2>nul
+if %errorlevel%==0 (
+    echo 编译Cython模块...
+    cythonize -i -3 core/_uct.pyx
+    cythonize -i -3 core/_moves.pyx
+)
+
+rem 预先编译numba模拟函数并写入缓存(直接用python运行AI脚本时第一步不再等待JIT编译)
+python -m core.warmup
+
 echo.
 echo 打包蓝方AI...
 pyinstaller --onefile --noconsole --name="EinsteinAI_Blue" ai_blue.py
@@ -4,8 +4,10 @@ Core模块初始化文件
 """
 
 # 导入主要的类，方便其他模块使用
-from .game_engine import EinsteinGame
-from .pmcts import ProbabilityNode, MCTSNode, PMCTS
+from .game_engine import EinsteinGame, GameState
+from .pmcts import MCTSNode, PMCTS
+from .bitboard import BitBoard
+from .zobrist import TranspositionTable
 from .file_handler import FileHandler
 from .config import Config
 
@@ -16,8 +18,11 @@ __author__ = "Einstein Chess AI Team"
 # 定义当使用 from core import * 时导入的内容
 __all__ = [
     'EinsteinGame',   # 游戏引擎
+    'GameState',      # 带增量统计的游戏状态
     'PMCTS',          # 概率蒙特卡洛树搜索算法
     'MCTSNode',      # MCTS节点
+    'BitBoard',      # 位棋盘
+    'TranspositionTable',  # Zobrist置换表
     'FileHandler',   # 文件处理
     'Config'         # 配置
 ]
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+棋盘常量模块 - 爱因斯坦棋固定的棋盘尺寸和棋子编号范围
+规则相关的模块都引用这里的常量，而不是各自写死数字或读取实例属性；
+numba编译时把模块级整数常量直接折叠进机器码，循环次数和比较都成为立即数
+"""
+
+from typing import Final
+
+BOARD_SIZE: Final[int] = 5                   # 棋盘边长
+N_CELLS: Final[int] = BOARD_SIZE * BOARD_SIZE  # 格子总数，格子编号为 x*5+y
+
+PIECES_PER_SIDE: Final[int] = 6              # 每方棋子数
+RED_MIN: Final[int] = 1                      # 红方棋子编号1-6
+RED_MAX: Final[int] = 6
+BLUE_MIN: Final[int] = 7                     # 蓝方棋子编号7-12
+BLUE_MAX: Final[int] = 12
+N_PIECE_IDS: Final[int] = BLUE_MAX + 1       # 按棋子编号索引的数组长度(下标0表示空格)
+
+RED_GOAL_CELL: Final[int] = N_CELLS - 1      # 红方目标格(4,4)
+BLUE_GOAL_CELL: Final[int] = 0               # 蓝方目标格(0,0)
@@ -0,0 +1,67 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+合法移动生成的Cython实现 - 与EinsteinGame.get_legal_moves_all_dice的纯Python版本逻辑完全一致
+编译: cythonize -i -3 core/_moves.pyx (见build.bat)
+未编译时游戏引擎自动使用纯Python版本
+查找表由调用方传入(core.game_engine中的_MOVE_TABLE和_MOVABLE_TABLE)，本模块不导入游戏引擎
+"""
+
+# 棋盘尺寸和每方棋子数，与core._consts一致
+cdef enum:
+    BOARD_SIZE = 5
+    N_CELLS = 25
+    PIECES_PER_SIDE = 6
+
+
+cpdef list legal_moves_all_dice(const signed char[:, ::1] board, int player,
+                                const signed char[:, :, ::1] move_table,
+                                const signed char[:, :, ::1] movable_table):
+    """
+    一次性获取6个骰子点数下的合法移动
+
+    参数:
+        board: 5x5的int8棋盘(C连续)
+        player: 当前玩家 (1=蓝方, -1=红方)
+        move_table: 移动表 (2, 25, 3)，出界为-1
+        movable_table: 可移动棋子表 (6, 64, 2)，本方棋子序号1-6，0表示没有
+
+    返回:
+        长度6的列表，第die-1项为骰子点数die下的合法移动列表
+    """
+    cdef int player_idx = 0 if player == 1 else 1
+    cdef int first = 7 if player == 1 else 1
+    cdef int piece_cell[PIECES_PER_SIDE + 1]   # 本方棋子序号 -> 格子，-1表示不在棋盘上
+    cdef int alive = 0
+    cdef int cell, offset, d, i, k, p, from_cell, to_cell
+    cdef list moves_by_die = []
+    cdef list piece_moves = [None] * (PIECES_PER_SIDE + 1)  # 本方棋子序号 -> 该棋子的所有走法
+    cdef list moves, own_moves
+
+    for i in range(PIECES_PER_SIDE + 1):
+        piece_cell[i] = -1
+
+    # 一次遍历棋盘得到本方各棋子所在格子(按行优先取第一个)和存活位图
+    for cell in range(N_CELLS):
+        offset = board[cell // BOARD_SIZE, cell % BOARD_SIZE] - first
+        if 0 <= offset < PIECES_PER_SIDE and piece_cell[offset + 1] < 0:
+            piece_cell[offset + 1] = cell
+            alive |= 1 << offset
+
+    for d in range(PIECES_PER_SIDE):
+        moves = []
+        for i in range(2):
+            p = movable_table[d, alive, i]
+            if p == 0:
+                continue
+            if piece_moves[p] is None:
+                from_cell = piece_cell[p]
+                own_moves = []
+                for k in range(3):
+                    to_cell = move_table[player_idx, from_cell, k]
+                    if to_cell >= 0:
+                        own_moves.append((from_cell // BOARD_SIZE, from_cell % BOARD_SIZE,
+                                          to_cell // BOARD_SIZE, to_cell % BOARD_SIZE))
+                piece_moves[p] = own_moves
+            moves.extend(<list>piece_moves[p])
+        moves_by_die.append(moves)
+    return moves_by_die
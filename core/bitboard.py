@@ -0,0 +1,211 @@
+"""
+位棋盘模块 - 用整数位运算表示爱因斯坦棋的局面
+格子编号为 x*5+y (0-24)，红方棋子1-6、蓝方棋子7-12对应全局棋子下标0-11
+所有规则判断(存活、计数、胜负、棋子位置)都变成常数次的整数位运算，
+适合PMCTS随机模拟这类需要大量调用规则函数的场景
+与numpy棋盘之间只在边界处转换一次(from_array / to_array)
+"""
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from core._consts import (PIECES_PER_SIDE, RED_MIN, RED_MAX, BLUE_MIN, BLUE_MAX, RED_GOAL_CELL,
+                          BLUE_GOAL_CELL)
+from core.game_engine import _MOVE_TABLE, _MOVABLE_TABLE
+from core.zobrist import ZOBRIST
+
+BITS_PER_POS = 5                         # 每个棋子位置占用的位数(格子编号0-24需要5位)
+POS_MASK = (1 << BITS_PER_POS) - 1       # 单个位置的掩码 0x1F
+RED_GOAL_BIT = 1 << RED_GOAL_CELL        # 红方目标格(4,4)
+BLUE_GOAL_BIT = 1 << BLUE_GOAL_CELL      # 蓝方目标格(0,0)
+
+
+# 每个格子可以到达的目标格子(来自游戏引擎的移动表，已排除出界位置)
+_BLUE_DESTINATIONS, _RED_DESTINATIONS = (
+    tuple(tuple(to for to in row if to >= 0) for row in plane)
+    for plane in _MOVE_TABLE.tolist()
+)
+
+# [玩家下标][骰子点数-1][存活位图] -> (可移动棋子的全局下标, ...)，来自游戏引擎的可移动棋子表
+_MOVABLE_INDICES = tuple(
+    tuple(tuple(tuple(base - 1 + p for p in pair if p) for pair in row)
+          for row in _MOVABLE_TABLE.tolist())
+    for base in (PIECES_PER_SIDE, 0)
+)
+
+
+@dataclass
+class BitBoard:
+    """
+    位棋盘状态
+
+    属性:
+        red_bb: 红方占据格子的位图(第cell位为1表示有红方棋子)
+        blue_bb: 蓝方占据格子的位图
+        pos: 12个棋子的位置，第p个棋子的格子编号位于第5p~5p+4位
+        red_alive: 红方存活棋子位图(第i位对应棋子i+1)
+        blue_alive: 蓝方存活棋子位图(第i位对应棋子i+7)
+        zobrist: 棋盘的Zobrist哈希(见core.zobrist，不含走棋方)，随移动增量更新
+    """
+    red_bb: int = 0
+    blue_bb: int = 0
+    pos: int = 0
+    red_alive: int = 0
+    blue_alive: int = 0
+    zobrist: int = 0
+
+    @classmethod
+    def from_array(cls, board: np.ndarray) -> "BitBoard":
+        """
+        从5x5棋盘数组创建位棋盘
+
+        参数:
+            board: 5x5棋盘数组
+
+        返回:
+            对应的位棋盘
+        """
+        state = cls()
+        for cell, piece in enumerate(board.ravel().tolist()):
+            if RED_MIN <= piece <= RED_MAX:
+                state.red_bb |= 1 << cell
+                state.red_alive |= 1 << (piece - RED_MIN)
+            elif BLUE_MIN <= piece <= BLUE_MAX:
+                state.blue_bb |= 1 << cell
+                state.blue_alive |= 1 << (piece - BLUE_MIN)
+            else:
+                continue
+            state.pos |= cell << (BITS_PER_POS * (piece - 1))
+            state.zobrist ^= ZOBRIST[piece][cell]
+        return state
+
+    def to_array(self) -> np.ndarray:
+        """
+        转换回5x5棋盘数组
+
+        返回:
+            5x5棋盘数组(int8)
+        """
+        cells = np.zeros(25, dtype=np.int8)
+        alive = self.red_alive | (self.blue_alive << PIECES_PER_SIDE)
+        for index in range(12):
+            if alive >> index & 1:
+                cells[self.piece_cell(index)] = index + 1
+        return cells.reshape(5, 5)
+
+    def copy(self) -> "BitBoard":
+        """复制位棋盘(所有字段都是整数，浅复制即可)"""
+        return BitBoard(self.red_bb, self.blue_bb, self.pos, self.red_alive, self.blue_alive,
+                        self.zobrist)
+
+    def piece_cell(self, index: int) -> int:
+        """读取全局下标为index(棋子编号减1)的棋子所在格子"""
+        return (self.pos >> (BITS_PER_POS * index)) & POS_MASK
+
+    def find_movable_pieces(self, die: int, player: int) -> List[int]:
+        """
+        根据骰子点数找到可以移动的棋子，规则与EinsteinGame._find_movable_pieces一致
+
+        参数:
+            die: 骰子点数 (1-6)
+            player: 玩家 (1=蓝方, -1=红方)
+
+        返回:
+            可移动棋子的全局下标列表(先较大编号，后较小编号)
+        """
+        if player == 1:
+            return list(_MOVABLE_INDICES[0][die - 1][self.blue_alive])
+        return list(_MOVABLE_INDICES[1][die - 1][self.red_alive])
+
+    def get_legal_moves(self, die: int, player: int) -> List[Tuple[int, int, int]]:
+        """
+        获取所有合法移动，顺序与EinsteinGame.get_legal_moves一致
+
+        参数:
+            die: 骰子点数 (1-6)
+            player: 玩家 (1=蓝方, -1=红方)
+
+        返回:
+            移动列表，每个移动是(起始格子, 目标格子, 棋子全局下标)
+        """
+        destinations = _BLUE_DESTINATIONS if player == 1 else _RED_DESTINATIONS
+        moves = []
+        player_idx, alive = (0, self.blue_alive) if player == 1 else (1, self.red_alive)
+        for index in _MOVABLE_INDICES[player_idx][die - 1][alive]:
+            from_cell = self.piece_cell(index)
+            for to_cell in destinations[from_cell]:
+                moves.append((from_cell, to_cell, index))
+        return moves
+
+    def make_move(self, from_idx: int, to_idx: int, piece: int) -> None:
+        """
+        原地执行移动(可能吃掉目标格子上的任意一方棋子)
+
+        参数:
+            from_idx: 起始格子编号
+            to_idx: 目标格子编号
+            piece: 移动棋子的全局下标(棋子编号减1)
+        """
+        from_bit = 1 << from_idx
+        to_bit = 1 << to_idx
+
+        # 目标格子有棋子时先把它吃掉(爱因斯坦棋允许吃己方棋子)
+        if (self.red_bb | self.blue_bb) & to_bit:
+            self._capture_at(to_idx)
+
+        if piece < PIECES_PER_SIDE:
+            self.red_bb = (self.red_bb & ~from_bit) | to_bit
+        else:
+            self.blue_bb = (self.blue_bb & ~from_bit) | to_bit
+
+        shift = BITS_PER_POS * piece
+        self.pos ^= (from_idx ^ to_idx) << shift
+        zobrist_row = ZOBRIST[piece + 1]
+        self.zobrist ^= zobrist_row[from_idx] ^ zobrist_row[to_idx]
+
+    def is_game_over(self) -> bool:
+        """检查游戏是否结束，规则与EinsteinGame.is_game_over一致"""
+        return bool(self.red_bb & RED_GOAL_BIT or self.blue_bb & BLUE_GOAL_BIT
+                    or not self.red_alive or not self.blue_alive)
+
+    def get_winner(self) -> int:
+        """
+        获取获胜方，判断顺序与EinsteinGame.get_winner一致
+
+        返回:
+            1: 蓝方获胜, -1: 红方获胜, 0: 游戏未结束
+        """
+        if self.red_bb & RED_GOAL_BIT:
+            return -1
+        if self.blue_bb & BLUE_GOAL_BIT:
+            return 1
+        if not self.red_alive:
+            return 1
+        if not self.blue_alive:
+            return -1
+        return 0
+
+    def _capture_at(self, cell: int) -> None:
+        """移除格子cell上的棋子: 清除占据位、存活位和位置，并从哈希中移除"""
+        cell_bit = 1 << cell
+        if self.red_bb & cell_bit:
+            self.red_bb &= ~cell_bit
+            alive, base = self.red_alive, 0
+        else:
+            self.blue_bb &= ~cell_bit
+            alive, base = self.blue_alive, PIECES_PER_SIDE
+
+        for offset in range(PIECES_PER_SIDE):
+            index = base + offset
+            if alive >> offset & 1 and self.piece_cell(index) == cell:
+                alive &= ~(1 << offset)
+                self.pos &= ~(POS_MASK << (BITS_PER_POS * index))
+                self.zobrist ^= ZOBRIST[index + 1][cell]
+                break
+
+        if base == 0:
+            self.red_alive = alive
+        else:
+            self.blue_alive = alive
@@ -20,6 +20,11 @@ class Config:
     # PMCTS特有参数
     UCB_CONSTANT = 1.0       # UCB公式中的探索常数，论文中使用cof=1
     MAX_GAME_MOVES = 200     # 最大游戏步数(防止无限循环)
+    SEARCH_THREADS = 1       # 单次搜索的线程数(安装numba后模拟释放GIL，可设为CPU核数)
+    ROOT_PARALLEL_WORKERS = 1  # 根并行搜索的进程数(大于1时各进程独立建树并汇总访问次数)
+    CHILD_BATCHING = True    # 叶子节点对6个骰子点数各模拟一次并取平均(总模拟次数不变)
+    LEAF_BATCH_SIZE = 1      # 对象搜索树单线程搜索时每轮批量模拟的叶子节点数(大于1时用WU-UCT选出多个叶子)
+    NUMBA_KERNEL = True      # 安装numba时单线程搜索使用数组形式的编译搜索核心(core/pmcts_kernel.py)
     
     # 概率节点参数 - 论文3.2.1节
     DICE_FACES = 6           # 骰子面数 (1-6)
@@ -31,6 +36,11 @@ class Config:
     RED_INPUT_FILE = "test_files/JavaOut1.txt"    # 红方AI输入文件
     RED_OUTPUT_FILE = "test_files/JavaIn1.txt"    # 红方AI输出文件
     
+    # GUI调用AI的方式
+    AI_PERSISTENT_PROCESS = True  # 整局游戏复用一个常驻AI进程(管道通信)，False时每步启动AI程序并通过文件通信
+    AI_TIMEOUT = 60               # 单步AI计算的超时时间(秒)
+    AI_CACHE_SIZE = 4096          # GUI缓存的AI决策数(悔棋后重走相同局面时直接复用，最近最少使用的先淘汰)
+    
     # 调试开关
     DEBUG_MODE = True        # 是否输出调试信息
     LOG_MOVES = True         # 是否记录移动日志
\ No newline at end of file
@@ -3,12 +3,18 @@
 支持PMCTS算法的文件输入输出处理
 """
 
+import os
+
 import numpy as np
-from typing import Tuple, List
+from typing import Tuple, List, TextIO, Union
+
+from core.logger import log
 
 class FileHandler:
     """文件输入输出处理类"""
     
+    RESET_REQUEST = "reset"  # 常驻AI进程的新对局命令(清空跨步保留的搜索状态)
+    
     @staticmethod
     def parse_input_file(filename: str) -> Tuple[int, int, np.ndarray]:
         """
@@ -23,33 +29,26 @@ class FileHandler:
             board: 5x5棋盘数组
         """
         try:
-            # 打开文件并读取所有行
             with open(filename, 'r', encoding='utf-8') as file:
-                lines = file.readlines()
+                # 解析第一行: "难度 骰子点数"
+                first_line = file.readline().split()
+                difficulty = int(first_line[0])
+                die = int(first_line[1])
+                
+                # 解析棋盘(第2-6行)，由numpy一次性读入5x5数组
+                board_array = np.loadtxt(file, dtype=np.int8, max_rows=5, ndmin=2)
             
-            # 解析第一行: "难度 骰子点数"
-            first_line = lines[0].strip().split()  # 去除空白并分割
-            difficulty = int(first_line[0])        # 转换为整数
-            die = int(first_line[1])
+            if board_array.shape != (5, 5):
+                raise ValueError(f"棋盘应为5x5，实际为{board_array.shape}")
             
-            # 解析棋盘(第2-6行)
-            board = []
-            for i in range(1, 6):  # 从第2行开始,共5行
-                # 将每行分割并转换为整数列表
-                row = list(map(int, lines[i].strip().split()))
-                board.append(row)
-            
-            # 转换为numpy数组便于操作
-            board_array = np.array(board, dtype=int)
-            
-            print(f"成功读取文件 {filename}: 难度={difficulty}, 骰子={die}")
+            log.debug(f"成功读取文件 {filename}: 难度={difficulty}, 骰子={die}")
             return difficulty, die, board_array
             
         except Exception as error:
             # 发生错误时输出错误信息并返回默认值
-            print(f"读取文件 {filename} 出错: {error}")
+            log.error(f"读取文件 {filename} 出错: {error}")
             # 返回默认的空棋盘
-            default_board = np.zeros((5, 5), dtype=int)
+            default_board = np.zeros((5, 5), dtype=np.int8)
             return 4, 1, default_board  # 默认难度4,骰子1
     
     @staticmethod
@@ -65,21 +64,66 @@ class FileHandler:
             bool: 是否写入成功
         """
         try:
-            # 打开文件准备写入
+            # 每行数字用空格分隔，由numpy一次性写入
             with open(filename, 'w', encoding='utf-8') as file:
-                # 逐行写入棋盘状态
-                for row in board:
-                    # 将每行数字用空格连接并写入
-                    line = ' '.join(map(str, row))
-                    file.write(line + '\n')
+                np.savetxt(file, np.asarray(board, dtype=np.int8), fmt='%d')
             
-            print(f"成功写入文件 {filename}")
+            log.debug(f"成功写入文件 {filename}")
             return True
             
         except Exception as error:
-            print(f"写入文件 {filename} 出错: {error}")
+            log.error(f"写入文件 {filename} 出错: {error}")
             return False
     
+    @staticmethod
+    def read_request(stream: TextIO) -> Union[Tuple[int, int, np.ndarray], str, None]:
+        """
+        从常驻AI进程的标准输入读取一次请求(GUI通过管道发送，见ai_blue.py/ai_red.py的serve)
+        移动请求为两行: "难度 骰子点数" 和 行优先的25个棋盘数字(空格分隔)；
+        新对局命令为一行RESET_REQUEST
+        
+        参数:
+            stream: 输入流
+            
+        返回:
+            移动请求返回(difficulty, die, board)，新对局命令返回RESET_REQUEST，输入流结束时返回None
+        """
+        header = stream.readline()
+        if not header:
+            return None
+        if header.strip() == FileHandler.RESET_REQUEST:
+            return FileHandler.RESET_REQUEST
+        difficulty, die = map(int, header.split())
+        cells = list(map(int, stream.readline().split()))
+        if len(cells) != 25:
+            raise ValueError(f"棋盘应有25个数字，实际为{len(cells)}")
+        return difficulty, die, np.array(cells, dtype=np.int8).reshape(5, 5)
+    
+    @staticmethod
+    def format_board_line(board: np.ndarray) -> str:
+        """把5x5棋盘转换为行优先的一行25个数字(常驻AI进程的通信格式)"""
+        return ' '.join(map(str, np.asarray(board).ravel().tolist()))
+    
+    @staticmethod
+    def format_board_text(board: np.ndarray) -> str:
+        """把5x5棋盘转换为5行文本(每行5个数字，空格分隔)，供调用方拼好整个文件后一次写入"""
+        return ''.join(' '.join(map(str, row)) + '\n' for row in np.asarray(board).tolist())
+    
+    @staticmethod
+    def write_text_atomic(filename: str, text: str):
+        """
+        原子地写入文本文件: 先一次写入同目录下的临时文件，再用os.replace替换目标文件
+        读取方(AI进程或Java程序)只会看到旧文件或完整的新文件，不会读到写了一半的内容
+        
+        参数:
+            filename: 目标文件名
+            text: 完整的文件内容
+        """
+        tmp_file = filename + '.tmp'
+        with open(tmp_file, 'w') as file:
+            file.write(text)
+        os.replace(tmp_file, filename)
+    
     @staticmethod
     def log_move_info(player_name: str, difficulty: int, die: int):
         """
@@ -95,5 +139,5 @@ class FileHandler:
         # 获取当前时间
         current_time = datetime.datetime.now().strftime("%H:%M:%S")
         # 输出格式化的日志信息，标注使用PMCTS算法
-        print(f"[{current_time}] {player_name} AI开始思考: 难度={difficulty}, 骰子={die}")
-        print(f"[{current_time}] 使用概率启发的蒙特卡洛树搜索(PMCTS)算法")
\ No newline at end of file
+        log.debug(f"[{current_time}] {player_name} AI开始思考: 难度={difficulty}, 骰子={die}")
+        log.debug(f"[{current_time}] 使用概率启发的蒙特卡洛树搜索(PMCTS)算法")
\ No newline at end of file
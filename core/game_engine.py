@@ -4,9 +4,230 @@
 """
 
 import numpy as np
+from dataclasses import dataclass, field
 from typing import List, Tuple, Optional
 import random
 
+from core._consts import (BOARD_SIZE, N_CELLS, N_PIECE_IDS, PIECES_PER_SIDE, RED_MIN, RED_MAX,
+                          BLUE_MIN, BLUE_MAX)
+from core.logger import log
+
+try:
+    # 可选：Cython编译的合法移动生成(core/_moves.pyx，见build.bat)
+    from core._moves import legal_moves_all_dice as _legal_moves_all_dice
+except ImportError:
+    _legal_moves_all_dice = None
+
+_RED_PIECES = frozenset(range(RED_MIN, RED_MAX + 1))     # 红方棋子编号
+_BLUE_PIECES = frozenset(range(BLUE_MIN, BLUE_MAX + 1))  # 蓝方棋子编号
+_LAST = BOARD_SIZE - 1                                   # 最后一行/列的下标
+
+# 每个格子(x*5+y)的位置价值: 10 - 到本方目标角的曼哈顿距离
+_BLUE_VAL = np.array([10 - (i + j) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE)],
+                     dtype=np.int8)
+_RED_VAL = np.array([10 - ((_LAST - i) + (_LAST - j)) for i in range(BOARD_SIZE)
+                     for j in range(BOARD_SIZE)], dtype=np.int8)
+
+# 各玩家的移动方向: 蓝方向左上，红方向右下
+_DIRECTIONS = {
+    1: ((-1, 0), (0, -1), (-1, -1)),   # 蓝方: 上、左、左上
+    -1: ((1, 0), (0, 1), (1, 1))       # 红方: 下、右、右下
+}
+
+
+def _init_tables() -> np.ndarray:
+    """
+    预先计算每个(玩家, 格子)沿三个方向的目标格子编号(x*5+y)，出界为-1
+    玩家下标0为蓝方，1为红方
+    """
+    table = np.full((2, N_CELLS, 3), -1, dtype=np.int8)
+    for player_idx, player in enumerate((1, -1)):
+        for cell in range(N_CELLS):
+            x, y = divmod(cell, BOARD_SIZE)
+            for d, (dx, dy) in enumerate(_DIRECTIONS[player]):
+                if 0 <= x + dx < BOARD_SIZE and 0 <= y + dy < BOARD_SIZE:
+                    table[player_idx, cell, d] = (x + dx) * BOARD_SIZE + (y + dy)
+    return table
+
+
+_MOVE_TABLE = _init_tables()
+
+# Python循环中使用的元组版本: [玩家下标][格子] -> ((目标x, 目标y), ...)
+_MOVE_DESTINATIONS = tuple(
+    tuple(tuple(divmod(to, BOARD_SIZE) for to in row if to >= 0) for row in plane)
+    for plane in _MOVE_TABLE.tolist()
+)
+
+
+def _init_movable_table() -> np.ndarray:
+    """
+    预先计算每个(骰子点数, 存活位图)下可以移动的棋子
+    存活位图第i位对应本方第i+1个棋子；结果为本方棋子序号(1-6)，0表示没有
+    骰子对应的棋子存活时为(该棋子, 0)，否则为(向上最近的存活棋子, 向下最近的存活棋子)
+    """
+    table = np.zeros((PIECES_PER_SIDE, 1 << PIECES_PER_SIDE, 2), dtype=np.int8)
+    for die in range(1, PIECES_PER_SIDE + 1):
+        for mask in range(1 << PIECES_PER_SIDE):
+            if mask >> (die - 1) & 1:
+                table[die - 1, mask] = (die, 0)
+                continue
+            upper = next((p for p in range(die + 1, PIECES_PER_SIDE + 1) if mask >> (p - 1) & 1), 0)
+            lower = next((p for p in range(die - 1, 0, -1) if mask >> (p - 1) & 1), 0)
+            table[die - 1, mask] = (upper, lower)
+    return table
+
+
+_MOVABLE_TABLE = _init_movable_table()
+
+# Python循环中使用的元组版本: [玩家下标][骰子点数-1][存活位图] -> (可移动的棋子编号, ...)
+_MOVABLE_PIECES = tuple(
+    tuple(tuple(tuple(first - 1 + p for p in pair if p) for pair in row)
+          for row in _MOVABLE_TABLE.tolist())
+    for first in (BLUE_MIN, RED_MIN)
+)
+
+@dataclass
+class GameState:
+    """
+    带增量统计信息的游戏状态
+    棋盘之外同时维护每个棋子的位置和双方的存活位图，执行移动时只更新受影响的几项，
+    判断胜负、棋子是否存在、可移动棋子和棋子位置都不需要再扫描整个棋盘
+    
+    属性:
+        board: 5x5棋盘数组(make_move会原地修改)
+        piece_cell: 棋子编号 -> 格子编号(x*5+y)，-1表示已被吃掉(下标0不使用)
+        red_alive_mask: 红方存活位图(第i位对应棋子i+1)
+        blue_alive_mask: 蓝方存活位图(第i位对应棋子i+7)
+    """
+    board: np.ndarray
+    piece_cell: List[int] = field(default_factory=lambda: [-1] * N_PIECE_IDS)
+    red_alive_mask: int = 0
+    blue_alive_mask: int = 0
+    
+    @classmethod
+    def from_board(cls, board: np.ndarray) -> "GameState":
+        """
+        从棋盘创建游戏状态(持有传入的棋盘，不复制)
+        
+        参数:
+            board: 5x5棋盘数组
+            
+        返回:
+            游戏状态
+        """
+        state = cls(board)
+        for cell, piece in enumerate(board.ravel().tolist()):
+            if RED_MIN <= piece <= RED_MAX:
+                state.red_alive_mask |= 1 << (piece - RED_MIN)
+            elif BLUE_MIN <= piece <= BLUE_MAX:
+                state.blue_alive_mask |= 1 << (piece - BLUE_MIN)
+            else:
+                continue
+            state.piece_cell[piece] = cell
+        return state
+    
+    @property
+    def red_count(self) -> int:
+        """红方棋子数"""
+        return self.red_alive_mask.bit_count()
+    
+    @property
+    def blue_count(self) -> int:
+        """蓝方棋子数"""
+        return self.blue_alive_mask.bit_count()
+    
+    def piece_exists(self, piece: int) -> bool:
+        """检查指定棋子是否还在棋盘上"""
+        if piece <= RED_MAX:
+            return bool(self.red_alive_mask >> (piece - RED_MIN) & 1)
+        return bool(self.blue_alive_mask >> (piece - BLUE_MIN) & 1)
+    
+    def find_movable_pieces(self, die: int, player: int) -> List[int]:
+        """
+        根据骰子点数找到可以移动的棋子，规则与EinsteinGame._find_movable_pieces一致
+        
+        参数:
+            die: 骰子点数 (1-6)
+            player: 玩家 (1=蓝方, -1=红方)
+            
+        返回:
+            可移动的棋子编号列表(先较大编号，后较小编号)
+        """
+        if player == 1:
+            return list(_MOVABLE_PIECES[0][die - 1][self.blue_alive_mask])
+        return list(_MOVABLE_PIECES[1][die - 1][self.red_alive_mask])
+    
+    def get_legal_moves(self, die: int, player: int) -> List[Tuple[int, int, int, int]]:
+        """
+        获取所有合法移动，结果和顺序与EinsteinGame.get_legal_moves一致
+        
+        参数:
+            die: 骰子点数 (1-6)
+            player: 当前玩家 (1=蓝方, -1=红方)
+            
+        返回:
+            合法移动列表，每个移动是(起始x, 起始y, 目标x, 目标y)
+        """
+        if player == 1:
+            player_idx, alive = 0, self.blue_alive_mask
+        else:
+            player_idx, alive = 1, self.red_alive_mask
+        destinations = _MOVE_DESTINATIONS[player_idx]
+        moves = []
+        for piece in _MOVABLE_PIECES[player_idx][die - 1][alive]:
+            cell = self.piece_cell[piece]
+            from_x, from_y = divmod(cell, BOARD_SIZE)
+            for to_x, to_y in destinations[cell]:
+                moves.append((from_x, from_y, to_x, to_y))
+        return moves
+    
+    def make_move(self, move: Tuple[int, int, int, int]) -> None:
+        """
+        原地执行移动，并更新被吃棋子的统计信息
+        
+        参数:
+            move: 移动 (起始x, 起始y, 目标x, 目标y)
+        """
+        from_x, from_y, to_x, to_y = move
+        board = self.board
+        src_piece = int(board[from_x, from_y])
+        dst_piece = int(board[to_x, to_y])
+        
+        if dst_piece:
+            # 目标位置的棋子被吃掉
+            self.piece_cell[dst_piece] = -1
+            if dst_piece <= RED_MAX:
+                self.red_alive_mask &= ~(1 << (dst_piece - RED_MIN))
+            else:
+                self.blue_alive_mask &= ~(1 << (dst_piece - BLUE_MIN))
+        
+        board[from_x, from_y] = 0
+        board[to_x, to_y] = src_piece
+        self.piece_cell[src_piece] = to_x * BOARD_SIZE + to_y
+    
+    def find_piece_position(self, piece: int) -> Optional[Tuple[int, int]]:
+        """查找棋子位置，棋子已被吃掉时返回None"""
+        cell = self.piece_cell[piece]
+        return divmod(cell, BOARD_SIZE) if cell >= 0 else None
+    
+    def is_game_over(self) -> bool:
+        """检查游戏是否结束，规则与EinsteinGame.is_game_over一致"""
+        return self.get_winner() != 0
+    
+    def get_winner(self) -> int:
+        """获取获胜方，判断顺序与EinsteinGame.get_winner一致 (1=蓝方, -1=红方, 0=未结束)"""
+        red_goal = self.board[_LAST, _LAST]
+        if RED_MIN <= red_goal <= RED_MAX:
+            return -1
+        blue_goal = self.board[0, 0]
+        if BLUE_MIN <= blue_goal <= BLUE_MAX:
+            return 1
+        if not self.red_alive_mask:
+            return 1
+        if not self.blue_alive_mask:
+            return -1
+        return 0
+
 class EinsteinGame:
     """
     爱因斯坦棋游戏规则引擎
@@ -15,7 +236,9 @@ class EinsteinGame:
     
     def __init__(self):
         """初始化游戏引擎"""
-        self.board_size = 5  # 棋盘大小5x5
+        self.board_size = BOARD_SIZE  # 棋盘大小5x5(规则代码直接使用core._consts中的常量)
+        # get_legal_moves_into的默认输出缓冲区(多线程使用时各线程应传入自己的缓冲区)
+        self._moves_out = np.empty((18, 4), dtype=np.int8)
     
     def get_legal_moves(self, board: np.ndarray, die: int, player: int) -> List[Tuple[int, int, int, int]]:
         """
@@ -37,6 +260,9 @@ class EinsteinGame:
         if not movable_pieces:
             return moves  # 没有可移动的棋子
         
+        # 这个玩家从每个格子出发的目标位置(预先计算，已排除出界位置)
+        destinations = _MOVE_DESTINATIONS[0 if player == 1 else 1]
+        
         # 第2步: 为每个可移动的棋子生成所有合法移动
         for piece in movable_pieces:
             # 找到这个棋子在棋盘上的位置
@@ -46,21 +272,94 @@ class EinsteinGame:
             
             from_x, from_y = piece_position
             
-            # 获取这个玩家可以移动的方向
-            directions = self._get_movement_directions(player)
-            
-            # 检查每个方向是否可以移动
-            for dx, dy in directions:
-                to_x = from_x + dx  # 计算目标位置
-                to_y = from_y + dy
-                
-                # 检查目标位置是否在棋盘内
-                if self._is_position_valid(to_x, to_y):
-                    moves.append((from_x, from_y, to_x, to_y))
+            # 查表得到所有目标位置
+            for to_x, to_y in destinations[from_x * BOARD_SIZE + from_y]:
+                moves.append((from_x, from_y, to_x, to_y))
         
         return moves
     
-    def make_move(self, board: np.ndarray, move: Tuple[int, int, int, int]) -> np.ndarray:
+    def get_legal_moves_into(self, board: np.ndarray, die: int, player: int,
+                             out: Optional[np.ndarray] = None) -> int:
+        """
+        与get_legal_moves相同，但把合法移动写入调用方复用的数组，不分配列表和元组
+        
+        参数:
+            board: 5x5棋盘数组
+            die: 骰子点数 (1-6)
+            player: 当前玩家 (1=蓝方, -1=红方)
+            out: 输出数组 (至少6行, 4列)，为None时使用引擎自带的缓冲区
+            
+        返回:
+            合法移动数n，移动保存在out[:n]中，每行为(起始x, 起始y, 目标x, 目标y)
+        """
+        if out is None:
+            out = self._moves_out
+        
+        destinations = _MOVE_DESTINATIONS[0 if player == 1 else 1]
+        n = 0
+        for piece in self._find_movable_pieces(board, die, player):
+            piece_position = self._find_piece_position(board, piece)
+            if piece_position is None:
+                continue
+            
+            from_x, from_y = piece_position
+            for to_x, to_y in destinations[from_x * BOARD_SIZE + from_y]:
+                out[n, 0] = from_x
+                out[n, 1] = from_y
+                out[n, 2] = to_x
+                out[n, 3] = to_y
+                n += 1
+        
+        return n
+    
+    def get_legal_moves_all_dice(self, board: np.ndarray,
+                                 player: int) -> List[List[Tuple[int, int, int, int]]]:
+        """
+        一次性获取6个骰子点数下的合法移动，结果与分别调用get_legal_moves(board, die, player)一致
+        只遍历一次棋盘；同一个棋子在多个点数下都可以移动时，它的走法只生成一次
+        
+        参数:
+            board: 5x5棋盘数组
+            player: 当前玩家 (1=蓝方, -1=红方)
+            
+        返回:
+            长度6的列表，第die-1项为骰子点数die下的合法移动列表
+        """
+        if _legal_moves_all_dice is not None:
+            return _legal_moves_all_dice(np.ascontiguousarray(board, dtype=np.int8), player,
+                                         _MOVE_TABLE, _MOVABLE_TABLE)
+        
+        if player == 1:  # 蓝方 (棋子编号7-12)
+            player_idx, first = 0, BLUE_MIN
+        else:  # 红方 (棋子编号1-6)
+            player_idx, first = 1, RED_MIN
+        
+        # 一次遍历棋盘得到本方各棋子所在格子(按行优先取第一个)和存活位图
+        piece_cells = {}
+        alive_mask = 0
+        for cell, piece in enumerate(board.ravel().tolist()):
+            offset = piece - first
+            if 0 <= offset < PIECES_PER_SIDE and piece not in piece_cells:
+                piece_cells[piece] = cell
+                alive_mask |= 1 << offset
+        
+        destinations = _MOVE_DESTINATIONS[player_idx]
+        piece_moves = {}  # 棋子编号 -> 该棋子的所有走法
+        moves_by_die = []
+        for movable_by_mask in _MOVABLE_PIECES[player_idx]:
+            moves = []
+            for piece in movable_by_mask[alive_mask]:
+                if piece not in piece_moves:
+                    cell = piece_cells[piece]
+                    from_x, from_y = divmod(cell, BOARD_SIZE)
+                    piece_moves[piece] = [(from_x, from_y, to_x, to_y)
+                                          for to_x, to_y in destinations[cell]]
+                moves.extend(piece_moves[piece])
+            moves_by_die.append(moves)
+        return moves_by_die
+    
+    def make_move(self, board: np.ndarray, move: Tuple[int, int, int, int],
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         执行一个移动，返回新的棋盘状态
         PMCTS算法扩展阶段使用此函数生成新状态
@@ -68,12 +367,17 @@ class EinsteinGame:
         参数:
             board: 当前棋盘状态
             move: 移动 (起始x, 起始y, 目标x, 目标y)
+            out: 预先分配的5x5输出数组(可选，不分配新数组)，None时复制board
             
         返回:
-            新的棋盘状态
+            新的棋盘状态(提供out时就是out)
         """
         # 复制棋盘以避免修改原棋盘
-        new_board = board.copy()
+        if out is None:
+            new_board = board.copy()
+        else:
+            new_board = out
+            new_board[...] = board
         
         from_x, from_y, to_x, to_y = move
         
@@ -88,6 +392,36 @@ class EinsteinGame:
         
         return new_board
     
+    def make_move_inplace(self, board: np.ndarray, move: Tuple[int, int, int, int]) -> int:
+        """
+        原地执行移动，不复制棋盘，可用undo_move撤销
+        
+        参数:
+            board: 棋盘状态(会被修改)
+            move: 移动 (起始x, 起始y, 目标x, 目标y)
+            
+        返回:
+            被吃掉的棋子编号，没有吃子时为0
+        """
+        from_x, from_y, to_x, to_y = move
+        captured = int(board[to_x, to_y])
+        board[to_x, to_y] = board[from_x, from_y]
+        board[from_x, from_y] = 0
+        return captured
+    
+    def undo_move(self, board: np.ndarray, move: Tuple[int, int, int, int], captured: int) -> None:
+        """
+        撤销make_move_inplace执行的移动
+        
+        参数:
+            board: 棋盘状态(会被修改)
+            move: 之前执行的移动
+            captured: make_move_inplace返回的被吃棋子编号
+        """
+        from_x, from_y, to_x, to_y = move
+        board[from_x, from_y] = board[to_x, to_y]
+        board[to_x, to_y] = captured
+    
     def is_game_over(self, board: np.ndarray) -> bool:
         """
         检查游戏是否结束
@@ -100,20 +434,16 @@ class EinsteinGame:
             bool: 游戏是否结束
         """
         # 胜利条件1: 红方棋子到达右下角(4,4)
-        if 1 <= board[4, 4] <= 6:
+        if RED_MIN <= board[_LAST, _LAST] <= RED_MAX:
             return True
         
         # 胜利条件2: 蓝方棋子到达左上角(0,0)  
-        if 7 <= board[0, 0] <= 12:
+        if BLUE_MIN <= board[0, 0] <= BLUE_MAX:
             return True
         
-        # 胜利条件3: 一方棋子全部被吃光
-        red_mask = (board >= 1) & (board <= 6)
-        blue_mask = (board >= 7) & (board <= 12)
-        red_count = int(np.sum(red_mask))    # 统计红方棋子
-        blue_count = int(np.sum(blue_mask))  # 统计蓝方棋子
-        
-        if red_count == 0 or blue_count == 0:
+        # 胜利条件3: 一方棋子全部被吃光(一次遍历得到棋盘上出现的所有棋子)
+        present = set(board.ravel().tolist())
+        if present.isdisjoint(_RED_PIECES) or present.isdisjoint(_BLUE_PIECES):
             return True
         
         return False
@@ -130,22 +460,19 @@ class EinsteinGame:
             1: 蓝方获胜, -1: 红方获胜, 0: 游戏未结束或平局
         """
         # 红方到达目标
-        if 1 <= board[4, 4] <= 6:
+        if RED_MIN <= board[_LAST, _LAST] <= RED_MAX:
             return -1  # 红方获胜
         
         # 蓝方到达目标
-        if 7 <= board[0, 0] <= 12:
+        if BLUE_MIN <= board[0, 0] <= BLUE_MAX:
             return 1   # 蓝方获胜
         
-        # 统计棋子数量
-        red_mask = (board >= 1) & (board <= 6)
-        blue_mask = (board >= 7) & (board <= 12)
-        red_count = int(np.sum(red_mask))
-        blue_count = int(np.sum(blue_mask))
+        # 检查双方是否还有棋子(一次遍历得到棋盘上出现的所有棋子)
+        present = set(board.ravel().tolist())
         
-        if red_count == 0:
+        if present.isdisjoint(_RED_PIECES):
             return 1   # 红方棋子被吃光，蓝方获胜
-        if blue_count == 0:
+        if present.isdisjoint(_BLUE_PIECES):
             return -1  # 蓝方棋子被吃光，红方获胜
         
         return 0  # 游戏未结束
@@ -162,42 +489,18 @@ class EinsteinGame:
         返回:
             评估分数，正数表示对该玩家有利
         """
-        score = 0.0
-        
-        # 棋子数量优势
-        red_mask = (board >= 1) & (board <= 6)
-        blue_mask = (board >= 7) & (board <= 12)
-        red_count = int(np.sum(red_mask))
-        blue_count = int(np.sum(blue_mask))
-        
-        if player == 1:  # 蓝方视角
-            score += (blue_count - red_count) * 10
-        else:  # 红方视角
-            score += (red_count - blue_count) * 10
-        
-        # 位置优势(越接近目标越好)
-        for i in range(5):
-            for j in range(5):
-                piece = board[i, j]
-                if 1 <= piece <= 6:  # 红方棋子
-                    # 距离右下角(4,4)越近越好
-                    distance_to_goal = abs(4-i) + abs(4-j)
-                    position_value = 10 - distance_to_goal
-                    if player == -1:  # 红方视角
-                        score += position_value
-                    else:  # 蓝方视角
-                        score -= position_value
-                        
-                elif 7 <= piece <= 12:  # 蓝方棋子
-                    # 距离左上角(0,0)越近越好
-                    distance_to_goal = abs(0-i) + abs(0-j)
-                    position_value = 10 - distance_to_goal
-                    if player == 1:  # 蓝方视角
-                        score += position_value
-                    else:  # 红方视角
-                        score -= position_value
-        
-        return score
+        flat = board.ravel()
+        red_mask = (flat >= RED_MIN) & (flat <= RED_MAX)
+        blue_mask = (flat >= BLUE_MIN) & (flat <= BLUE_MAX)
+        
+        # 棋子数量优势(蓝方视角)
+        count_score = 10 * (int(blue_mask.sum()) - int(red_mask.sum()))
+        
+        # 位置优势(越接近目标越好，蓝方视角): 红方距离右下角(4,4)，蓝方距离左上角(0,0)
+        pos_score = int(_BLUE_VAL[blue_mask].sum()) - int(_RED_VAL[red_mask].sum())
+        
+        score = float(count_score + pos_score)
+        return score if player == 1 else -score
     
     def check_immediate_win(self, board: np.ndarray, die: int, player: int) -> Optional[Tuple[int, int, int, int]]:
         """
@@ -212,19 +515,83 @@ class EinsteinGame:
         返回:
             获胜移动，如果没有则返回None
         """
-        legal_moves = self.get_legal_moves(board, die, player)
-        
-        for move in legal_moves:
-            # 模拟执行这个移动
-            new_board = self.make_move(board, move)
+        out = self._moves_out
+        n = self.get_legal_moves_into(board, die, player, out)
+        
+        for i in range(n):
+            # 在原棋盘上试走这个移动，检查完立即撤销(不复制棋盘)
+            move = out[i]
+            captured = self.make_move_inplace(board, move)
+            try:
+                winning = self.get_winner(board) == player
+            finally:
+                self.undo_move(board, move, captured)
             
-            # 检查是否获胜
-            if self.is_game_over(new_board) and self.get_winner(new_board) == player:
-                print(f"发现获胜移动: {move}")
+            if winning:
+                move = tuple(int(v) for v in move)
+                log.debug('发现获胜移动: %s', move)
                 return move
         
         return None
     
+    # === 批量接口(多棋盘并行处理) ===
+    
+    def make_move_batch(self, boards: np.ndarray, moves: np.ndarray) -> np.ndarray:
+        """
+        对一批棋盘同时执行各自的移动
+        
+        参数:
+            boards: 棋盘数组 (N, 5, 5)
+            moves: 移动数组 (N, 4)，每行为(起始x, 起始y, 目标x, 目标y)
+            
+        返回:
+            新的棋盘数组 (N, 5, 5)
+        """
+        new_boards = boards.copy()
+        moves = np.asarray(moves, dtype=int).reshape(-1, 4)
+        idx = np.arange(len(new_boards))
+        
+        # 取出棋子 -> 清空起始位置 -> 放到目标位置(可能吃子)
+        pieces = new_boards[idx, moves[:, 0], moves[:, 1]]
+        new_boards[idx, moves[:, 0], moves[:, 1]] = 0
+        new_boards[idx, moves[:, 2], moves[:, 3]] = pieces
+        
+        return new_boards
+    
+    def is_game_over_batch(self, boards: np.ndarray) -> np.ndarray:
+        """
+        批量检查游戏是否结束
+        
+        参数:
+            boards: 棋盘数组 (N, 5, 5)
+            
+        返回:
+            bool数组 (N,)
+        """
+        return self.get_winner_batch(boards) != 0
+    
+    def get_winner_batch(self, boards: np.ndarray) -> np.ndarray:
+        """
+        批量获取获胜方，规则与get_winner一致
+        
+        参数:
+            boards: 棋盘数组 (N, 5, 5)
+            
+        返回:
+            int数组 (N,)，1: 蓝方获胜, -1: 红方获胜, 0: 游戏未结束
+        """
+        red_count = ((boards >= RED_MIN) & (boards <= RED_MAX)).sum(axis=(1, 2))
+        blue_count = ((boards >= BLUE_MIN) & (boards <= BLUE_MAX)).sum(axis=(1, 2))
+        red_goal = (boards[:, _LAST, _LAST] >= RED_MIN) & (boards[:, _LAST, _LAST] <= RED_MAX)
+        blue_goal = (boards[:, 0, 0] >= BLUE_MIN) & (boards[:, 0, 0] <= BLUE_MAX)
+        
+        # 按get_winner的判断顺序选择结果
+        return np.select(
+            [red_goal, blue_goal, red_count == 0, blue_count == 0],
+            [-1, 1, 1, -1],
+            default=0
+        )
+    
     # === 私有辅助方法 ===
     
     def _find_movable_pieces(self, board: np.ndarray, die: int, player: int) -> List[int]:
@@ -241,56 +608,27 @@ class EinsteinGame:
         返回:
             可移动的棋子编号列表
         """
-        movable_pieces = []
-        
         if player == 1:  # 蓝方 (棋子编号7-12)
-            target_piece = die + 6  # 蓝方1号棋子编号是7
-            piece_range = range(7, 13)
+            player_idx, first = 0, BLUE_MIN
         else:  # 红方 (棋子编号1-6)
-            target_piece = die       # 红方1号棋子编号是1
-            piece_range = range(1, 7)
-        
-        # 获取当前玩家存活的棋子编号
-        alive_pieces = set()
-        for piece_num in piece_range:
-            if self._piece_exists_on_board(board, piece_num):
-                alive_pieces.add(piece_num)
-        
-        # 规则1：如果骰子点数对应的棋子存在，直接移动
-        if target_piece in alive_pieces:
-            movable_pieces.append(target_piece)
-            return movable_pieces
-        
-        # 规则2：如果该棋子不存在，找逻辑相邻的棋子
-        
-        # 向上找：比target_piece大的最小存在棋子
-        upper_candidate = None
-        for piece_num in range(target_piece + 1, max(piece_range) + 1):
-            if piece_num in alive_pieces:
-                upper_candidate = piece_num
-                break  # 找到第一个（最小的）就停止
-        
-        # 向下找：比target_piece小的最大存在棋子
-        lower_candidate = None
-        for piece_num in range(target_piece - 1, min(piece_range) - 1, -1):
-            if piece_num in alive_pieces:
-                lower_candidate = piece_num
-                break  # 找到第一个（最大的）就停止
-        
-        # 添加找到的候选棋子
-        if upper_candidate is not None:
-            movable_pieces.append(upper_candidate)
-        
-        if lower_candidate is not None:
-            movable_pieces.append(lower_candidate)
-        
-        return movable_pieces
+            player_idx, first = 1, RED_MIN
+        
+        # 一次遍历棋盘得到当前玩家的存活位图(第i位对应本方第i+1个棋子)
+        alive_mask = 0
+        for piece in set(board.ravel().tolist()):
+            offset = piece - first
+            if 0 <= offset < PIECES_PER_SIDE:
+                alive_mask |= 1 << offset
+        
+        # 规则1(骰子对应的棋子存在则直接移动)和规则2(否则移动向上、向下最近的存活棋子)
+        # 都已预先计算在查找表中
+        return list(_MOVABLE_PIECES[player_idx][die - 1][alive_mask])
     
     def _find_piece_position(self, board: np.ndarray, piece: int) -> Optional[Tuple[int, int]]:
         """找到指定棋子在棋盘上的位置"""
-        positions = np.where(board == piece)  # 查找棋子位置
-        if len(positions[0]) > 0:
-            return (int(positions[0][0]), int(positions[1][0]))  # 返回第一个找到的位置
+        cells = board.ravel().tolist()
+        if piece in cells:
+            return divmod(cells.index(piece), BOARD_SIZE)  # 返回第一个找到的位置(按行优先顺序)
         return None
     
     def _get_movement_directions(self, player: int) -> List[Tuple[int, int]]:
@@ -298,14 +636,11 @@ class EinsteinGame:
         获取玩家的移动方向
         红方只能向右下方向移动，蓝方只能向左上方向移动
         """
-        if player == 1:  # 蓝方向左上移动
-            return [(-1, 0), (0, -1), (-1, -1)]  # 上、左、左上
-        else:  # 红方向右下移动
-            return [(1, 0), (0, 1), (1, 1)]      # 下、右、右下
+        return list(_DIRECTIONS[1 if player == 1 else -1])
     
     def _is_position_valid(self, x: int, y: int) -> bool:
         """检查位置是否在棋盘范围内"""
-        return 0 <= x < self.board_size and 0 <= y < self.board_size
+        return 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE
     
     def _piece_exists_on_board(self, board: np.ndarray, piece: int) -> bool:
         """检查指定棋子是否还在棋盘上"""
@@ -0,0 +1,43 @@
+"""
+日志模块 - 统一管理AI程序的调试输出
+Config.DEBUG_MODE为True时输出调试信息，否则只输出警告和错误
+使用logging代替print，关闭调试时消息不会被格式化，也不会写入标准输出
+"""
+
+import functools
+import logging
+import sys
+
+from core.config import Config
+
+class _StdoutHandler(logging.StreamHandler):
+    """每次输出时使用当前的sys.stdout(兼容输出重定向，以及没有控制台的打包程序)"""
+    
+    def emit(self, record):
+        self.stream = sys.stdout
+        if self.stream is not None:
+            super().emit(record)
+
+
+log = logging.getLogger('einstein')
+log.setLevel(logging.DEBUG if Config.DEBUG_MODE else logging.WARNING)
+
+if not log.handlers:
+    # 只输出消息本身，保持与原来print相同的输出格式
+    _handler = _StdoutHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    log.addHandler(_handler)
+    log.propagate = False
+
+
+def quiet(func):
+    """装饰器：函数执行期间关闭调试日志(用于批量对战等无人查看搜索过程的场景)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous_level = log.level
+        log.setLevel(logging.WARNING)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            log.setLevel(previous_level)
+    return wrapper
@@ -5,36 +5,140 @@
 2. 选择策略：随机选择概率节点，UCB选择最值节点
 3. 扩展策略：一次性创建所有6个概率节点，避免偏差
 4. 回溯路径：正确处理Max/Min节点和多父节点情况
-5. 数据存储：概率节点存储骰子信息，最值节点存储统计信息
+5. 数据存储：概率节点以长度6的数组存放在最值节点上(下标为骰子点数-1)，最值节点存储统计信息
 """
 from __future__ import annotations  # 添加这行
 
-import math
+import importlib.util
+import logging
+import os
 import random
+import threading
 import numpy as np
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from typing import List, Optional, Tuple, Dict, TYPE_CHECKING
 
+from core.bitboard import BitBoard
+from core.zobrist import TranspositionTable, hash_state, hash_after_moves
+from core.config import Config
+from core.logger import log
+from core.uct import best_child, best_child_wu
+
 if TYPE_CHECKING:
     from core.game_engine import EinsteinGame
 
-class ProbabilityNode:
+_rollout_numba = None  # core.rollout_numba模块，第一次模拟时才加载(见_load_rollout_numba)
+_pmcts_kernel = None   # core.pmcts_kernel模块，第一次使用编译搜索核心时才加载
+_root_worker_pmcts: Optional["PMCTS"] = None  # 根并行搜索子进程内的PMCTS实例
+_thread_local = threading.local()  # 每个线程各自的random.Random实例(见_thread_random)
+
+
+def _load_rollout_numba():
+    """
+    加载numba模拟模块(导入numba较慢，只在真正进入模拟阶段时导入一次)
+    只有一个合法移动或直接获胜时搜索不会进入模拟，Java每步启动的AI进程可以省去这部分开销
+    """
+    global _rollout_numba
+    if _rollout_numba is None:
+        from core import rollout_numba
+        _rollout_numba = rollout_numba
+    return _rollout_numba
+
+
+def _load_pmcts_kernel():
+    """加载数组形式的编译搜索核心(同样依赖numba，延迟到第一次搜索时导入)"""
+    global _pmcts_kernel
+    if _pmcts_kernel is None:
+        from core import pmcts_kernel
+        _pmcts_kernel = pmcts_kernel
+    return _pmcts_kernel
+
+
+def _thread_random() -> random.Random:
+    """
+    获取当前线程的随机数生成器(首次调用时创建，种子取自os.urandom)
+    模拟循环中调用实例的方法，不经过random模块的全局实例，各线程互不共享
+    """
+    rng = getattr(_thread_local, 'random', None)
+    if rng is None:
+        rng = _thread_local.random = random.Random()
+    return rng
+
+
+def _reset_thread_random() -> None:
+    """丢弃当前线程的随机数生成器，下次使用时重新取种子"""
+    _thread_local.random = None
+
+
+def seed_thread(seed: Optional[int] = None) -> None:
     """
-    概率节点类 - 论文3.2.1节
-    用于表示骰子事件的概率节点，每个概率节点对应一个骰子点数
+    为当前线程的搜索设置随机数种子(概率节点选择、位棋盘模拟和numba模拟都由它确定)
+    给出seed时本线程的单线程搜索可以复现，None表示重新从os.urandom取种子
+    多线程搜索(num_threads>1)的工作线程各自取种子，不受影响
     """
+    _thread_local.random = random.Random(seed)
+    _load_rollout_numba().seed_thread(seed)
+
+
+if hasattr(os, 'register_at_fork'):
+    # 与random模块的全局实例一样，fork出的子进程重新取种子，不与父进程产生相同的随机序列
+    os.register_at_fork(after_in_child=_reset_thread_random)
+
+
+def _init_root_worker() -> None:
+    """
+    根并行搜索的进程池初始化函数
+    重新生成各随机数种子(fork启动的子进程会继承父进程的随机数状态，各棵树将完全相同)
+    """
+    _reset_thread_random()
+    np.random.seed(int.from_bytes(os.urandom(4), 'little'))
+    _load_rollout_numba().seed_thread()
+    log.setLevel(logging.WARNING)  # 子进程中不需要搜索过程的调试日志
+
+
+def _root_worker_search(task: Tuple) -> Dict[Tuple[int, int, int, int], int]:
+    """
+    根并行搜索的工作函数 - 在子进程中独立建立一棵搜索树
     
-    def __init__(self, dice_value: int, probability: float):
-        """
-        初始化概率节点
+    参数:
+        task: (棋盘, 骰子点数, 当前玩家, 模拟次数, 探索常数, 是否批量模拟子节点)
         
-        参数:
-            dice_value: 骰子点数 (1-6)
-            probability: 该骰子点数出现的概率（根节点为1.0，其他为1/6）
-        """
-        self.dice_value = dice_value      # 骰子点数
-        self.probability = probability    # 概率值：根节点1.0，其他1/6
-        self.children: List[MCTSNode] = []               # 子节点列表 (MCTSNode类型)
-        self.parent_mcts_node: Optional[MCTSNode] = None     # 父MCTS节点的引用
+    返回:
+        根节点各移动的访问次数
+    """
+    from core.game_engine import EinsteinGame
+    
+    global _root_worker_pmcts
+    board, die, player, num_simulations, exploration_constant, child_batching = task
+    if _root_worker_pmcts is None:
+        # 编译搜索核心只返回最佳移动，汇总访问次数需要使用对象形式的搜索树
+        _root_worker_pmcts = PMCTS(EinsteinGame(), exploration_constant,
+                                   child_batching=child_batching, use_kernel=False)
+    return _root_worker_pmcts.search_visit_counts(board, die, player, num_simulations)
+
+
+# 非根节点的概率节点分布: 6个骰子点数各1/6(所有节点共用，只读)
+_UNIFORM_PROBS = np.full(6, 1.0 / 6, dtype=np.float32)
+_UNIFORM_PROBS.flags.writeable = False
+
+
+def _probability_cdf(probs: np.ndarray) -> Tuple[float, ...]:
+    """
+    由概率数组计算归一化的累积分布，扩展节点时计算一次，选择时只需一次二分查找
+    最后一项固定为1.0(避免浮点误差)，概率全为0时按均匀分布
+    """
+    total = float(probs.sum())
+    if total <= 0:
+        probs, total = _UNIFORM_PROBS, float(_UNIFORM_PROBS.sum())
+    cdf = (np.cumsum(probs, dtype=np.float64) / total).tolist()
+    cdf[-1] = 1.0
+    return tuple(cdf)
+
+
+_UNIFORM_CDF = _probability_cdf(_UNIFORM_PROBS)
+
 
 class MCTSNode:
     """
@@ -42,32 +146,76 @@ class MCTSNode:
     每个节点代表一个游戏状态，存储访问次数、胜利次数等统计信息
     """
     
-    def __init__(self, board: np.ndarray, player: int, move: Optional[Tuple[int, int, int, int]] = None, is_root: bool = False):
+    def __init__(self, board: Optional[np.ndarray], player: int,
+                 move: Optional[Tuple[int, int, int, int]] = None,
+                 is_root: bool = False, copy_board: bool = True, key: Optional[int] = None):
         """
         初始化MCTS节点
         
         参数:
-            board: 当前棋盘状态
+            board: 当前棋盘状态，为None时在第一次访问board时由父节点的棋盘执行move生成
+                   (此时必须提供key，节点须由父节点扩展时创建)
             player: 当前轮到的玩家 (1=蓝方Max节点, -1=红方Min节点)
             move: 导致此状态的移动
             is_root: 是否为根节点
+            copy_board: 是否复制棋盘(传入make_move新生成的棋盘时可设为False，直接持有)
+            key: 状态的Zobrist哈希(见core.zobrist)，为None时根据棋盘和玩家计算
         """
-        self.board = board.copy()        # 当前棋盘状态的副本
+        if board is not None:
+            # 棋盘统一为连续的int8数组(子节点的棋盘由此复制，模拟时可以直接传给numba函数)
+            board = (np.array(board, dtype=np.int8) if copy_board
+                     else np.ascontiguousarray(board, dtype=np.int8))
+        self._board = board              # 当前棋盘状态(见board属性)
         self.player = player             # 当前玩家
         self.move = move                 # 导致此状态的移动
         self.is_root = is_root          # 是否为根节点
+        self.key = hash_state(board, player) if key is None else key  # 置换表键
         
         # 最值节点的统计信息
         self.visits = 0                  # 访问次数
         self.wins = 0.0                  # 胜利次数(可以是小数)
-        
-        # 概率子节点字典 {dice_value: ProbabilityNode}
-        self.probability_children: Dict[int, ProbabilityNode] = {}   
-        self.parent_prob_nodes: List[ProbabilityNode] = []      # 父概率节点列表（一个最值节点可能有多个父概率节点）
+        self.unobserved = 0              # 多线程搜索时经过该节点、尚未回传结果的模拟次数(WU-UCT)
+        self.winner: Optional[int] = None  # 局面的获胜方缓存(见is_terminal)，None表示尚未计算
+        
+        # 概率节点: 下标为骰子点数-1，扩展后prob_children为6个子节点列表，prob_probs为对应的概率
+        self.prob_children: List[List[MCTSNode]] = []
+        self.prob_probs: np.ndarray = _UNIFORM_PROBS
+        self.prob_cdf: Tuple[float, ...] = _UNIFORM_CDF  # prob_probs的累积分布
+        self.known_dice_idx: Optional[int] = None  # 骰子点数已知(根节点)时的概率节点下标
+        # 父概率节点列表 [(父最值节点, 骰子下标)]（一个最值节点可能有多个父概率节点）
+        self.parent_links: List[Tuple[MCTSNode, int]] = []
+        self.parent: Optional[MCTSNode] = None  # 第一个父概率节点所属的最值节点(由它的棋盘生成board)
+    
+    @property
+    def board(self) -> np.ndarray:
+        """
+        当前棋盘状态
+        扩展时子节点只记录移动，第一次访问时才由父节点的棋盘复制并执行移动(之后缓存)
+        大部分子节点在搜索中从未被选中，不必为它们生成棋盘
+        """
+        board = self._board
+        if board is None:
+            # 父节点已经扩展过，其棋盘一定已经生成
+            board = self.parent.board.copy()
+            from_x, from_y, to_x, to_y = self.move
+            board[to_x, to_y] = board[from_x, from_y]
+            board[from_x, from_y] = 0
+            self._board = board
+        return board
+    
+    def is_terminal(self, game: "EinsteinGame") -> bool:
+        """
+        局面是否已分胜负
+        第一次调用时计算获胜方并缓存在winner中，之后选择、扩展时的判断不再检查棋盘
+        """
+        winner = self.winner
+        if winner is None:
+            winner = self.winner = game.get_winner(self.board)
+        return winner != 0
     
     def is_fully_expanded(self) -> bool:
         """检查节点是否已完全扩展(所有骰子点数都已尝试)"""
-        return len(self.probability_children) == 6
+        return len(self.prob_children) == 6
     
     def get_win_rate(self) -> float:
         """
@@ -83,70 +231,50 @@ class MCTSNode:
         win_rate = self.wins / self.visits
         return win_rate
     
-    def select_best_move_child_ucb(self, prob_node: ProbabilityNode) -> Optional[MCTSNode]:
+    def select_best_move_child_ucb(self, dice_idx: int, c: float = 2.0) -> Optional[MCTSNode]:
         """
         使用UCB公式从概率节点的子节点中选择最佳移动节点
         这是论文中正确的做法：对最值节点使用UCB选择
         
         参数:
-            prob_node: 概率节点
+            dice_idx: 概率节点下标(骰子点数-1)
+            c: 根号内的探索系数(见PMCTS.ucb_c)
             
         返回:
             UCB值最高的移动节点
         """
-        if not prob_node.children:
-            return None
-        
-        best_value = -float('inf')
-        best_child = None
-        
-        # 对概率节点的所有子节点（最值节点）计算UCB值
-        for child in prob_node.children:
-            if child.visits == 0:
-                # 未访问的节点给最高优先级
-                return child
-            
-            # UCB公式：平均胜率 + 探索项
-
-            exploitation = child.get_win_rate()
-         
-            # 使用当前节点的访问次数计算探索项
-            exploration = math.sqrt(2*math.log(self.visits) / child.visits)
-            ucb_value = exploitation + exploration
-            
-            if ucb_value > best_value:
-                best_value = ucb_value
-                best_child = child
-        
-        return best_child
+        children = self.prob_children[dice_idx]
+        if len(children) <= 1:
+            # 没有走法，或只有一个走法(强制移动)时不需要计算UCB
+            return children[0] if children else None
+        
+        # UCB公式：平均胜率 + sqrt(c*ln(当前节点访问次数)/子节点访问次数)，未访问的节点优先
+        # (子节点可能带有置换表中的历史访问次数，父节点访问次数至少按1计)
+        if self.unobserved:
+            # 多线程搜索中有模拟正经过该节点：探索项计入进行中的模拟(WU-UCT)
+            return children[best_child_wu(children, self.visits + self.unobserved, c)]
+        return children[best_child(children, self.visits, c)]
     
-    def select_probability_child_random(self) -> Optional[ProbabilityNode]:
+    def select_probability_child_random(self) -> Optional[int]:
         """
         随机选择概率节点
         这是论文中正确的做法：对概率节点使用随机选择
         
         返回:
-            随机选择的概率节点
+            随机选择的概率节点下标(骰子点数-1)，未扩展时返回None
         """
-        if not self.probability_children:
+        if not self.prob_children:
             return None
         
-        # 根据概率分布随机选择概率节点
-        prob_nodes = list(self.probability_children.values())
-        probabilities = [node.probability for node in prob_nodes]
-        
-        # 归一化概率（防止数值误差）
-        total_prob = sum(probabilities)
-        if total_prob > 0:
-            probabilities = [p / total_prob for p in probabilities]
-            # 使用numpy的随机选择函数
-            selected_idx = np.random.choice(len(prob_nodes), p=probabilities)
-            return prob_nodes[selected_idx]
-        else:
-            # 如果概率都为0，则均匀随机选择
-            return random.choice(prob_nodes)
+        if self.known_dice_idx is not None:
+            return self.known_dice_idx  # 根节点的骰子点数已知，概率分布退化，无需抽样
+        
+        # 根据预先计算的累积分布随机选择概率节点(cdf最后一项为1.0，下标不会越界)
+        return bisect_right(self.prob_cdf, _thread_random().random())
     
-    def expand_all_probability_nodes(self, game: "EinsteinGame", current_die: Optional[int] = None) -> bool:
+    def expand_all_probability_nodes(self, game: "EinsteinGame", current_die: Optional[int] = None,
+                                     transpositions: Optional[Dict[int, MCTSNode]] = None,
+                                     table: Optional[TranspositionTable] = None) -> bool:
         """
         一次性扩展所有概率节点 - 根据论文步骤1-4的正确做法
         
@@ -159,134 +287,166 @@ class MCTSNode:
         参数:
             game: 游戏引擎
             current_die: 当前已知骰子点数（仅对根节点有效）
+            transpositions: 本次搜索中 状态哈希->节点 的映射，不同走子顺序到达的
+                            同一局面共用一个节点(搜索树变为有向无环图)
+            table: 跨搜索的置换表，新建节点时用其中的历史统计初始化
             
         返回:
             是否成功扩展
         """
-        if self.probability_children:
+        if self.prob_children:
             return False  # 已经扩展过了
         
-        
         # 步骤1: 创建6个概率节点，初始化概率节点的参数d和p
-        for dice_value in range(1, 7):
-            # 设置正确的概率值
-            if self.is_root and current_die is not None:
-                # 根节点：只有当前已知骰子点数概率为1，其他为0
-                probability = 1.0 if dice_value == current_die else 0.0
-            else:
-                # 非根节点：所有骰子点数概率为1/6
-                probability = 1.0/6
-            
-            # 创建概率节点
-            prob_node = ProbabilityNode(dice_value, probability)
-            prob_node.parent_mcts_node = self
-            
-            # 步骤2: 将概率节点加入叶子节点的孩子列表中
-            self.probability_children[dice_value] = prob_node
+        if self.is_root and current_die is not None:
+            # 根节点：只有当前已知骰子点数概率为1，其他为0
+            self.prob_probs = np.zeros(6, dtype=np.float32)
+            self.prob_probs[current_die - 1] = 1.0
+            self.prob_cdf = _probability_cdf(self.prob_probs)
+            self.known_dice_idx = current_die - 1
+        else:
+            # 非根节点：所有骰子点数概率为1/6
+            self.prob_probs = _UNIFORM_PROBS
+            self.prob_cdf = _UNIFORM_CDF
+        
+        # 步骤2: 将概率节点(子节点列表)加入叶子节点
+        self.prob_children = [[] for _ in range(6)]
         
         # 步骤3: 根据叶子节点的棋盘状态生成所有合法走法，创建最值节点
-        # 首先收集所有可能的移动（不考虑骰子限制）
-        all_possible_moves = set()
+        # 6个骰子点数的合法走法一次生成(只遍历一次棋盘)，步骤4中复用
+        legal_by_die = game.get_legal_moves_all_dice(self.board, self.player)
         
-        for dice_value in range(1, 7):
-            legal_moves = game.get_legal_moves(self.board, dice_value, self.player)
-            for move in legal_moves:
-                all_possible_moves.add(move)
+        # 首先收集所有可能的移动（不考虑骰子限制）
+        all_possible_moves = set().union(*legal_by_die)
         
         # 为每个唯一的移动创建最值节点
         move_to_node = {}  # 移动到节点的映射
         
-        for move in all_possible_moves:
-            # 执行移动得到新状态
-            new_board = game.make_move(self.board, move)
-            next_player = -self.player  # 切换玩家
+        # 增量计算所有新状态的哈希(一次批量计算)，已出现过的局面直接复用节点
+        child_keys = hash_after_moves(self.key, self.board, all_possible_moves)
+        for move, child_key in zip(all_possible_moves, child_keys):
+            child_node = transpositions.get(child_key) if transpositions is not None else None
             
-            # 创建新的MCTS节点
-            child_node = MCTSNode(new_board, next_player, move=move)
+            if child_node is None:
+                next_player = -self.player  # 切换玩家
+                
+                # 创建新的MCTS节点，新状态的棋盘在第一次访问时才生成(见MCTSNode.board)
+                child_node = MCTSNode(None, next_player, move=move, key=child_key)
+                if table is not None:
+                    child_node.load_statistics(table)
+                if transpositions is not None:
+                    transpositions[child_key] = child_node
             move_to_node[move] = child_node
         
         # 步骤4: 对于每一个骰子点数，在所有合法走法中找出骰子点数已知情况下
         # 的合法走法，并将对应最值节点与概率节点建立连接
         for dice_value in range(1, 7):
-            prob_node = self.probability_children[dice_value]
-            legal_moves = game.get_legal_moves(self.board, dice_value, self.player)
+            dice_idx = dice_value - 1
+            children = self.prob_children[dice_idx]
             
-            for move in legal_moves:
+            for move in legal_by_die[dice_idx]:
                 if move in move_to_node:
                     child_node = move_to_node[move]
                     # 建立连接：概率节点 -> 最值节点
-                    prob_node.children.append(child_node)
+                    children.append(child_node)
                     # 设置最值节点的父概率节点（一个最值节点可能有多个父概率节点）
-                    child_node.parent_prob_nodes.append(prob_node)
+                    if not child_node.parent_links:
+                        child_node.parent = self
+                    child_node.parent_links.append((self, dice_idx))
         
         return True
     
-    def simulate(self, game: "EinsteinGame", max_moves: int = 200) -> float:
+    def load_statistics(self, table: TranspositionTable) -> None:
+        """如果置换表中有该状态的统计信息，用它初始化访问次数和胜利次数"""
+        entry = table.probe(self.key)
+        if entry is not None:
+            value, visits = entry
+            self.visits = visits
+            self.wins = value * visits
+    
+    def simulate(self, game: "EinsteinGame", max_moves: int = 200,
+                 first_die: Optional[int] = None) -> float:
         """
         从当前节点开始进行随机模拟，直到游戏结束
+        安装了numba时整局模拟由core.rollout_numba中编译后的函数完成，
+        否则在位棋盘(core.bitboard)上原地进行，规则与游戏引擎一致
         
         参数:
             game: 游戏引擎
             max_moves: 最大模拟步数(防止无限循环)
+            first_die: 第一步使用的骰子点数，None表示随机
             
         返回:
             模拟结果 (1.0=当前玩家获胜, 0.0=对手获胜, 0.5=平局)
         """
-        current_board = self.board.copy()  # 复制当前棋盘状态
+        rollout_numba = _rollout_numba or _load_rollout_numba()
+        if rollout_numba.NUMBA_AVAILABLE:
+            # 编译后的模拟使用当前线程自己的xorshift64随机数状态
+            board_flat = np.ascontiguousarray(self.board, dtype=np.int8).ravel()
+            winner = rollout_numba.rollout(board_flat, self.player, max_moves,
+                                           rollout_numba.thread_rng_state(), first_die or 0)
+        else:
+            winner = self._simulate_bitboard(max_moves, first_die)
+        
+        if winner == self.player:
+            return 0.0    # 当前玩家获胜
+        elif winner == -self.player:
+            return 1.0    # 对手获胜
+        else:
+            # 游戏未结束或平局
+            return 0.5
+    
+    def simulate_all_dice(self, game: "EinsteinGame", max_moves: int = 200) -> float:
+        """
+        对6个骰子点数各进行一次模拟(第一步使用该点数)，返回按1/6加权的平均结果
+        相当于在叶子节点的概率节点上做一次期望，而不是只抽样一个骰子点数
+        
+        参数:
+            game: 游戏引擎
+            max_moves: 最大模拟步数
+            
+        返回:
+            平均模拟结果，含义与simulate相同
+        """
+        rollout_numba = _rollout_numba or _load_rollout_numba()
+        if rollout_numba.NUMBA_AVAILABLE:
+            # 6次模拟和结果换算都在编译后的函数中完成，只转换一次棋盘、调用一次
+            board_flat = np.ascontiguousarray(self.board, dtype=np.int8).ravel()
+            return rollout_numba.evaluate(board_flat, self.player, max_moves,
+                                          rollout_numba.thread_rng_state(), True)
+        return sum(self.simulate(game, max_moves, first_die=die) for die in range(1, 7)) / 6
+    
+    def _simulate_bitboard(self, max_moves: int, first_die: Optional[int] = None) -> int:
+        """在位棋盘上进行随机模拟，返回获胜方(0表示未分胜负)"""
+        state = BitBoard.from_array(self.board)  # 只在模拟开始时转换一次
+        rand = _thread_random().random     # 本线程的随机数生成器([0, 1)均匀分布)
         current_player = self.player       # 当前玩家
         moves_count = 0                    # 移动计数器
         
         # 进行随机模拟直到游戏结束或达到最大步数
-        while not game.is_game_over(current_board) and moves_count < max_moves:
-            # 生成随机骰子点数
-            die = random.randint(1, 6)
+        while not state.is_game_over() and moves_count < max_moves:
+            # 生成随机骰子点数(指定了第一步的点数时直接使用)
+            if moves_count == 0 and first_die is not None:
+                die = first_die
+            else:
+                die = int(rand() * 6) + 1
             
             # 获取当前玩家的合法移动
-            legal_moves = game.get_legal_moves(current_board, die, current_player)
+            legal_moves = state.get_legal_moves(die, current_player)
             
             if not legal_moves:
                 break  # 没有合法移动，模拟结束
             
-            # 随机选择一个移动并执行
-            move = random.choice(legal_moves)
-            current_board = game.make_move(current_board, move)
+            # 随机选择一个移动并原地执行
+            state.make_move(*legal_moves[int(rand() * len(legal_moves))])
             
             # 切换到下一个玩家
             current_player = -current_player
             moves_count += 1
         
         # 评估最终游戏结果
-        winner = game.get_winner(current_board)
-        
-        if winner == self.player:
-            return 0.0    # 当前玩家获胜
-        elif winner == -self.player:
-            return 1.0    # 对手获胜
-        else:
-            # 游戏未结束或平局
-            return 0.5
+        return state.get_winner()
     
-    def backpropagate(self, result: float) -> None:
-        """
-        回传模拟结果到根节点
-        处理最值节点可能有多个父概率节点的情况
-        
-        参数:
-            result: 模拟结果 (1.0=获胜, -1.0=失败，从模拟节点的玩家视角)
-        """
-        # 更新当前节点的统计信息
-        self.visits += 1
-        self.wins += result  # result可能为负值
-        
-        # 如果有父概率节点，需要回传结果
-        if self.parent_prob_nodes:
-            # 选择第一个父概率节点进行回传
-            prob_node = self.parent_prob_nodes[0]
-            if prob_node.parent_mcts_node:
-                # 向上回溯时，结果需要反转（当前玩家的胜利对父节点是失败）
-                parent_mcts_node = prob_node.parent_mcts_node
-                reversed_result = -result  # 反转结果
-                parent_mcts_node.backpropagate(reversed_result)
 
 
 class PMCTS:
@@ -295,18 +455,44 @@ class PMCTS:
     基于论文第3.2节实现，修正了扩展策略和选择策略
     """
     
-    def __init__(self, game: "EinsteinGame", exploration_constant: float = 1.0):
+    def __init__(self, game: "EinsteinGame", exploration_constant: float = 1.0,
+                 tt_size_bits: int = 20, child_batching: Optional[bool] = None,
+                 use_kernel: Optional[bool] = None, leaf_batch_size: Optional[int] = None):
         """
         初始化PMCTS
         
         参数:
             game: 游戏引擎实例
             exploration_constant: UCB公式中的探索常数
+            tt_size_bits: 置换表条目数为2**tt_size_bits
+            child_batching: 是否在叶子节点对6个骰子点数各模拟一次(None则使用Config.CHILD_BATCHING)
+            use_kernel: 单线程搜索时是否使用编译搜索核心core.pmcts_kernel
+                        (None则在Config.NUMBA_KERNEL开启且安装了numba时使用)
+            leaf_batch_size: 不使用编译搜索核心的单线程搜索每轮批量模拟的叶子节点数
+                             (None则使用Config.LEAF_BATCH_SIZE，见_search_leaf_batch)
         """
         self.game = game
         self.exploration_constant = exploration_constant
+        # UCB探索项 C*sqrt(2*ln(N)/n) 写成 sqrt(2*C^2*ln(N)/n)，根号内的系数只计算一次
+        self.ucb_c = 2.0 * exploration_constant * exploration_constant
+        self.child_batching = Config.CHILD_BATCHING if child_batching is None else child_batching
+        if use_kernel is None:
+            # 只检查numba是否存在，不在这里导入(导入推迟到第一次搜索)
+            use_kernel = Config.NUMBA_KERNEL and importlib.util.find_spec('numba') is not None
+        self.use_kernel = use_kernel
+        self.leaf_batch_size = Config.LEAF_BATCH_SIZE if leaf_batch_size is None else leaf_batch_size
+        # 置换表在同一局的多次搜索之间保留，复用已搜索过局面的统计信息
+        self.transposition_table = TranspositionTable(tt_size_bits)
+    
+    def reset(self) -> None:
+        """
+        重置跨对局保留的搜索状态，使实例可以在新的一局中复用
+        清空置换表(搜索树每次search都会重新建立)
+        """
+        self.transposition_table.clear()
     
-    def search(self, board: np.ndarray, die: int, player: int, num_simulations: int) -> Optional[Tuple[int, int, int, int]]:
+    def search(self, board: np.ndarray, die: int, player: int, num_simulations: int,
+               num_threads: int = 1) -> Optional[Tuple[int, int, int, int]]:
         """
         执行PMCTS搜索，返回最佳移动
         
@@ -315,6 +501,7 @@ class PMCTS:
             die: 当前骰子点数（已知）
             player: 当前玩家
             num_simulations: 模拟次数
+            num_threads: 搜索线程数，大于1时使用共享搜索树的多线程搜索(见_search_parallel)
             
         返回:
             最佳移动 (from_x, from_y, to_x, to_y)，如果没有合法移动则返回None
@@ -328,45 +515,380 @@ class PMCTS:
         if len(legal_moves) == 1:
             return legal_moves[0]  # 只有一个合法移动，直接返回
         
+        # 开启子节点批量模拟时每次迭代模拟6次，迭代次数相应减少，总模拟次数不变
+        num_iterations = -(-num_simulations // 6) if self.child_batching else num_simulations
+        
+        if self.use_kernel and num_threads <= 1:
+            return self._search_kernel(board, die, player, num_simulations, num_iterations)
+        
+        log.debug('开始PMCTS搜索: %d次模拟, %d个可选移动', num_simulations, len(legal_moves))
+        root = self._grow_tree(board, die, player, num_iterations, num_threads)
+        
+        # 选择访问次数最多的移动
+        best_move = self._select_best_move(root, die)
+        
+        if best_move:
+            log.debug('最佳移动: %s', best_move)
+        else:
+            log.debug('未找到最佳移动')
+        
+        return best_move
+    
+    def search_visit_counts(self, board: np.ndarray, die: int, player: int,
+                            num_simulations: int) -> Dict[Tuple[int, int, int, int], int]:
+        """
+        执行单线程PMCTS搜索，返回根节点各移动的访问次数(供根并行搜索汇总)
+        
+        参数:
+            board: 当前棋盘状态
+            die: 当前骰子点数（已知）
+            player: 当前玩家
+            num_simulations: 模拟次数
+            
+        返回:
+            {移动: 访问次数}，没有合法移动时为空字典
+        """
+        num_iterations = -(-num_simulations // 6) if self.child_batching else num_simulations
+        root = self._grow_tree(board, die, player, num_iterations)
+        return {child.move: child.visits for child in root.prob_children[die - 1]}
+    
+    def search_root_parallel(self, board: np.ndarray, die: int, player: int, num_simulations: int,
+                             n_workers: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        根并行PMCTS搜索：n_workers个子进程各自独立建立一棵搜索树(模拟次数平分)，
+        最后按移动汇总各棵树根节点的访问次数，选择总访问次数最多的移动
+        各进程之间不共享任何状态，不受GIL限制
+        
+        参数:
+            board: 当前棋盘状态
+            die: 当前骰子点数（已知）
+            player: 当前玩家
+            num_simulations: 总模拟次数
+            n_workers: 进程数，不大于1时等同于search
+            
+        返回:
+            最佳移动 (from_x, from_y, to_x, to_y)，如果没有合法移动则返回None
+        """
+        legal_moves = self.game.get_legal_moves(board, die, player)
+        
+        if not legal_moves:
+            return None  # 没有合法移动
+        
+        if len(legal_moves) == 1:
+            return legal_moves[0]  # 只有一个合法移动，直接返回
+        
+        if n_workers <= 1:
+            return self.search(board, die, player, num_simulations)
+        
+        share = max(1, num_simulations // n_workers)
+        log.debug('开始根并行PMCTS搜索: %d个进程, 每个%d次模拟', n_workers, share)
+        
+        task = (board, die, player, share, self.exploration_constant, self.child_batching)
+        total_visits: Counter = Counter()
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_root_worker) as executor:
+            for visit_counts in executor.map(_root_worker_search, [task] * n_workers):
+                total_visits.update(visit_counts)
+        
+        if not total_visits:
+            log.debug('未找到最佳移动')
+            return None
+        
+        best_move, visits = total_visits.most_common(1)[0]
+        log.debug('最佳移动共访问%d次', visits)
+        log.debug('最佳移动: %s', best_move)
+        return best_move
+    
+    def _grow_tree(self, board: np.ndarray, die: int, player: int, num_iterations: int,
+                   num_threads: int = 1) -> MCTSNode:
+        """
+        建立根节点并执行指定次数的PMCTS迭代，结束后把统计信息写入置换表
+        
+        参数:
+            board: 当前棋盘状态
+            die: 当前骰子点数
+            player: 当前玩家
+            num_iterations: 迭代次数
+            num_threads: 搜索线程数
+            
+        返回:
+            搜索完成的根节点
+        """
         # 创建根节点（最值节点）
         root = MCTSNode(board, player, is_root=True)
-        
-        print(f"开始PMCTS搜索: {num_simulations}次模拟, {len(legal_moves)}个可选移动")
+        root.load_statistics(self.transposition_table)
+        transpositions = {root.key: root}  # 本次搜索的 状态哈希->节点
         
         # 一次性扩展根节点的所有概率节点
-        root.expand_all_probability_nodes(self.game, current_die=die)
+        root.expand_all_probability_nodes(self.game, current_die=die, transpositions=transpositions,
+                                          table=self.transposition_table)
         
-        print(f"根节点扩展完成，当前骰子点数={die}")
-
-        # 执行指定次数的PMCTS迭代
-        for simulation in range(num_simulations):
-            # 第1步: 选择 - 从根节点开始选择到叶子节点
-            selected_node = self._select(root)
+        log.debug('根节点扩展完成，当前骰子点数=%d', die)
+        
+        if num_threads > 1:
+            self._search_parallel(root, transpositions, num_iterations, num_threads)
+        elif self.leaf_batch_size > 1:
+            self._search_leaf_batch(root, transpositions, num_iterations, self.leaf_batch_size)
+        else:
+            self._search_serial(root, transpositions, num_iterations)
+        
+        # 保存本次搜索的统计信息供后续搜索复用
+        self._store_statistics(transpositions)
+        return root
+    
+    def _search_kernel(self, board: np.ndarray, die: int, player: int, num_simulations: int,
+                       num_iterations: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        使用编译搜索核心执行整个搜索(见core.pmcts_kernel)，置换表与对象实现共用
+        
+        参数:
+            board: 当前棋盘状态
+            die: 当前骰子点数
+            player: 当前玩家
+            num_simulations: 模拟次数(仅用于日志)
+            num_iterations: 迭代次数
             
-            # 第2步: 扩展 - 如果游戏未结束且可以扩展，则扩展节点
-            if not self.game.is_game_over(selected_node.board):
-                self._expand(selected_node)
+        返回:
+            最佳移动，没有可选走法时返回None
+        """
+        kernel = _pmcts_kernel or _load_pmcts_kernel()
+        rollout_numba = _rollout_numba or _load_rollout_numba()
+        tt = self.transposition_table
+        
+        log.debug('开始PMCTS搜索(编译核心): %d次模拟', num_simulations)
+        from_cell, to_cell, visits, wins = kernel.search_kernel(
+            np.ascontiguousarray(board, dtype=np.int8).ravel(), kernel.root_key(board, player),
+            die, player, num_iterations, self.child_batching, 200, self.ucb_c,
+            rollout_numba.thread_rng_state(),
+            tt.table['key'], tt.table['value'], tt.table['visits'], tt.table['flag'],
+            np.uint64(tt.mask))
+        
+        if from_cell < 0:
+            log.debug('未找到最佳移动')
+            return None
+        
+        best_move = (*divmod(int(from_cell), 5), *divmod(int(to_cell), 5))
+        log.debug('最佳移动访问%d次, 获胜次数%s,胜率%.2f%%', visits, wins,
+                  (wins / visits if visits else 0.5) * 100)
+        log.debug('最佳移动: %s', best_move)
+        return best_move
+    
+    def _search_serial(self, root: MCTSNode, transpositions: Dict[int, MCTSNode],
+                       num_simulations: int) -> None:
+        """
+        单线程执行指定次数的PMCTS迭代
+        
+        参数:
+            root: 已扩展的根节点
+            transpositions: 本次搜索的 状态哈希->节点 映射
+            num_simulations: 迭代次数
+        """
+        # 进度每完成十分之一输出一次：按段执行迭代，循环体内不做取模判断；
+        # 关闭调试日志时整个搜索只有一段
+        show_progress = log.isEnabledFor(logging.DEBUG)
+        progress_step = max(1, num_simulations // 10) if show_progress else num_simulations
+        done = 0
+        while done < num_simulations:
+            count = min(progress_step, num_simulations - done)
+            for _ in range(count):
+                # 第1步: 选择 - 从根节点开始选择到叶子节点
+                path = self._select_path(root)
+                selected_node = path[-1]
+                
+                # 第2步: 扩展 - 如果游戏未结束且可以扩展，则扩展节点
+                if not selected_node.is_terminal(self.game):
+                    self._expand(selected_node, transpositions)
+                
+                # 第3步: 模拟 - 从选中的节点随机模拟到游戏结束
+                result = self._evaluate(selected_node)
+                
+                # 第4步: 回传 - 沿选择路径将结果回传到根节点
+                self._backpropagate(path, result)
             
-            # 第3步: 模拟 - 从选中的节点随机模拟到游戏结束
-            result = selected_node.simulate(self.game)
+            done += count
+            # 进度输出
+            if show_progress:
+                log.debug('搜索进度: %.0f%%', done / num_simulations * 100)
+    
+    def _search_parallel(self, root: MCTSNode, transpositions: Dict[int, MCTSNode],
+                         num_simulations: int, num_threads: int) -> None:
+        """
+        多线程共享一棵搜索树执行PMCTS迭代(WU-UCT)
+        选择/扩展和回传在锁内进行；选择后把路径上节点的未观测模拟次数加1，
+        其他线程选择时探索项计入这些进行中的模拟，从而倾向别的分支，而胜率不受影响；
+        随机模拟在锁外进行(numba编译的模拟会释放GIL，从而真正并行)
+        
+        参数:
+            root: 已扩展的根节点
+            transpositions: 本次搜索的 状态哈希->节点 映射
+            num_simulations: 总迭代次数
+            num_threads: 线程数
+        """
+        lock = threading.Lock()
+        
+        def worker(count: int) -> None:
+            for _ in range(count):
+                with lock:
+                    path = self._select_path(root)
+                    leaf = path[-1]
+                    if not leaf.is_terminal(self.game):
+                        self._expand(leaf, transpositions)
+                    for node in path:
+                        node.unobserved += 1
+                
+                result = self._evaluate(leaf)
+                
+                with lock:
+                    # 模拟完成：撤销未观测计数，沿同一路径回传真实结果
+                    for node in path:
+                        node.unobserved -= 1
+                    self._backpropagate(path, result)
+        
+        # 把模拟次数尽量平均地分给各线程
+        share, extra = divmod(num_simulations, num_threads)
+        counts = [share + (1 if i < extra else 0) for i in range(num_threads)]
+        
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            list(executor.map(worker, counts))
+    
+    def _search_leaf_batch(self, root: MCTSNode, transpositions: Dict[int, MCTSNode],
+                           num_simulations: int, batch_size: int) -> None:
+        """
+        单线程的叶子批量PMCTS迭代
+        每轮依次选出batch_size个叶子节点并扩展，路径上的未观测模拟次数加1，
+        后续选择按WU-UCT计入这些尚未回传的模拟，从而选出不同的叶子；
+        然后把所有叶子的模拟合并为一次批量评估(见_evaluate_batch)，再依次回传
+        
+        参数:
+            root: 已扩展的根节点
+            transpositions: 本次搜索的 状态哈希->节点 映射
+            num_simulations: 总迭代次数
+            batch_size: 每轮的叶子节点数
+        """
+        done = 0
+        while done < num_simulations:
+            count = min(batch_size, num_simulations - done)
+            paths = []
+            for _ in range(count):
+                path = self._select_path(root)
+                leaf = path[-1]
+                if not leaf.is_terminal(self.game):
+                    self._expand(leaf, transpositions)
+                for node in path:
+                    node.unobserved += 1
+                paths.append(path)
             
-            # 第4步: 回传 - 将结果回传到根节点
-            selected_node.backpropagate(result)
+            results = self._evaluate_batch([path[-1] for path in paths])
             
-            # 进度输出
-            if (simulation + 1) % (num_simulations // 10) == 0:
-                progress = (simulation + 1) / num_simulations * 100
-                print(f"搜索进度: {progress:.0f}%")
+            for path, result in zip(paths, results):
+                # 撤销未观测计数，沿同一路径回传真实结果
+                for node in path:
+                    node.unobserved -= 1
+                self._backpropagate(path, result)
+            done += count
+    
+    def _evaluate_batch(self, nodes: List[MCTSNode]) -> List[float]:
+        """
+        批量模拟阶段，结果与逐个调用_evaluate的含义相同
+        安装了numba时所有未分胜负的节点在一次编译函数调用中完成模拟，否则逐个模拟
         
-        # 选择访问次数最多的移动
-        best_move = self._select_best_move(root, die)
+        参数:
+            nodes: 叶子节点列表
+            
+        返回:
+            每个节点的模拟结果
+        """
+        rollout_numba = _rollout_numba or _load_rollout_numba()
+        pending = [node for node in nodes if not node.is_terminal(self.game)]
+        if not rollout_numba.NUMBA_AVAILABLE or not pending:
+            return [self._evaluate(node) for node in nodes]
+        
+        boards = np.stack([node.board.ravel() for node in pending])
+        players = np.array([node.player for node in pending], dtype=np.int64)
+        pending_results = np.empty(len(pending))
+        rollout_numba.evaluate_batch(boards, players, 200, rollout_numba.thread_rng_state(),
+                                     self.child_batching, pending_results)
+        
+        results = iter(pending_results.tolist())
+        return [self._evaluate(node) if node.is_terminal(self.game) else next(results)
+                for node in nodes]
+    
+    def _evaluate(self, node: MCTSNode) -> float:
+        """
+        模拟阶段：开启子节点批量模拟时对6个骰子点数取平均，否则模拟一次
+        已分胜负的叶子节点直接由缓存的获胜方得到结果(含义与simulate相同)，不进入模拟
+        """
+        if node.is_terminal(self.game):
+            return 0.0 if node.winner == node.player else 1.0
+        if self.child_batching:
+            return node.simulate_all_dice(self.game)
+        return node.simulate(self.game)
+    
+    def search_batch(self, boards: np.ndarray, dice: np.ndarray, players: np.ndarray,
+                     num_simulations: int) -> List[Optional[Tuple[int, int, int, int]]]:
+        """
+        对多个独立局面同步执行PMCTS搜索
+        每次迭代中各棵树分别完成选择/扩展，然后把所有叶子节点的模拟合并为一次批量评估
+        (见_evaluate_batch，安装了numba时在一次编译函数调用中完成)，摊薄每次模拟的Python调用开销
         
-        if best_move:
-            print(f"最佳移动: {best_move}")
-        else:
-            print("未找到最佳移动")
+        参数:
+            boards: 棋盘数组 (E, 5, 5)
+            dice: 各局面的骰子点数 (E,)
+            players: 各局面的当前玩家 (E,)
+            num_simulations: 每棵树的模拟次数
+            
+        返回:
+            每个局面的最佳移动列表，没有合法移动的局面为None
+        """
+        best_moves: List[Optional[Tuple[int, int, int, int]]] = [None] * len(boards)
+        roots: List[MCTSNode] = []
+        root_indices: List[int] = []
+        tree_transpositions: List[Dict[int, MCTSNode]] = []
+        
+        for i in range(len(boards)):
+            die, player = int(dice[i]), int(players[i])
+            legal_moves = self.game.get_legal_moves(boards[i], die, player)
+            
+            if len(legal_moves) <= 1:
+                # 没有或只有一个合法移动，无需搜索
+                best_moves[i] = legal_moves[0] if legal_moves else None
+                continue
+            
+            root = MCTSNode(boards[i], player, is_root=True)
+            root.load_statistics(self.transposition_table)
+            transpositions = {root.key: root}
+            root.expand_all_probability_nodes(self.game, current_die=die, transpositions=transpositions,
+                                              table=self.transposition_table)
+            roots.append(root)
+            root_indices.append(i)
+            tree_transpositions.append(transpositions)
+        
+        if not roots:
+            return best_moves
+        
+        log.debug('开始批量PMCTS搜索: %d棵树, 每棵%d次模拟', len(roots), num_simulations)
+        
+        # 与search相同：开启子节点批量模拟时每次迭代模拟6次，迭代次数相应减少，总模拟次数不变
+        num_iterations = -(-num_simulations // 6) if self.child_batching else num_simulations
+        for _ in range(num_iterations):
+            # 选择 + 扩展：每棵树各自进行
+            paths = [self._select_path(root) for root in roots]
+            leaves = [path[-1] for path in paths]
+            for leaf, transpositions in zip(leaves, tree_transpositions):
+                if not leaf.is_terminal(self.game):
+                    self._expand(leaf, transpositions)
+            
+            # 模拟：所有叶子节点一起批量评估
+            results = self._evaluate_batch(leaves)
+            
+            # 回传
+            for path, result in zip(paths, results):
+                self._backpropagate(path, result)
         
-        return best_move
+        for root, i, transpositions in zip(roots, root_indices, tree_transpositions):
+            self._store_statistics(transpositions)
+            best_moves[i] = self._select_best_move(root, int(dice[i]))
+        
+        return best_moves
     
     def _select(self, root: MCTSNode) -> MCTSNode:
         """
@@ -380,37 +902,77 @@ class PMCTS:
         返回:
             选择到的叶子节点
         """
+        return self._select_path(root)[-1]
+    
+    def _select_path(self, root: MCTSNode) -> List[MCTSNode]:
+        """
+        与_select相同的选择过程，返回从根节点到叶子节点经过的所有最值节点
+        
+        参数:
+            root: 根节点
+            
+        返回:
+            选择路径(最后一个为叶子节点)
+        """
         node = root
+        path = [node]
         
         # 向下选择直到找到叶子节点或终止状态
-        while node.probability_children and not self.game.is_game_over(node.board):
+        while node.prob_children and not node.is_terminal(self.game):
             # 随机选择概率子节点
-            prob_node = node.select_probability_child_random()
-            if not prob_node or not prob_node.children:
+            dice_idx = node.select_probability_child_random()
+            if dice_idx is None or not node.prob_children[dice_idx]:
                 break
             
             # 使用UCB从概率节点的子节点中选择最佳移动节点
-            next_node = node.select_best_move_child_ucb(prob_node)
+            next_node = node.select_best_move_child_ucb(dice_idx, self.ucb_c)
             if not next_node:
                 break
             
             node = next_node
+            path.append(node)
+        
+        return path
+    
+    @staticmethod
+    def _backpropagate(path: List[MCTSNode], result: float) -> None:
+        """
+        回传阶段：沿选择路径从叶子节点回到根节点
+        同一局面共用节点后搜索树是有向无环图，节点可能有多个父节点，
+        只有本次选择实际经过的节点才更新统计信息
         
-        return node
+        参数:
+            path: _select_path返回的选择路径(最后一个为叶子节点)
+            result: 模拟结果 (1.0=获胜, -1.0=失败，从叶子节点的玩家视角)
+        """
+        for node in reversed(path):
+            node.visits += 1
+            node.wins += result  # result可能为负值
+            # 向上回溯时，结果需要反转（当前玩家的胜利对父节点是失败）
+            result = -result
 
-    def _expand(self, node: MCTSNode) -> None:
+    def _expand(self, node: MCTSNode, transpositions: Optional[Dict[int, MCTSNode]] = None) -> None:
         """
         扩展阶段：一次性扩展所有概率节点，从所有新创建的节点中选择一个
         
         参数:
             node: 要扩展的节点
+            transpositions: 本次搜索的 状态哈希->节点 映射
             
         返回:
             不需要返回任何东西只需扩展即可
         """
         # 如果节点还没有完全扩展，一次性扩展所有概率节点
         if not node.is_fully_expanded():
-            success = node.expand_all_probability_nodes(self.game)
+            success = node.expand_all_probability_nodes(self.game, transpositions=transpositions,
+                                                        table=self.transposition_table)
+    
+    def _store_statistics(self, transpositions: Dict[int, MCTSNode]) -> None:
+        """把本次搜索中访问过的节点统计信息写入置换表"""
+        table = self.transposition_table
+        for key, node in transpositions.items():
+            if node.visits > 0:
+                table.store(key, node.wins / node.visits, node.visits)
 
     def _select_best_move(self, root: MCTSNode, die: int) -> Optional[Tuple[int, int, int, int]]:
         """
@@ -424,18 +986,18 @@ class PMCTS:
             最佳移动
         """
         # 获取当前骰子点数对应的概率节点
-        if die not in root.probability_children:
+        if not root.prob_children:
             return None
         
-        prob_node = root.probability_children[die]
-        if not prob_node.children:
+        children = root.prob_children[die - 1]
+        if not children:
             return None
         
         # 选择访问次数最多的子节点对应的移动
-        best_child = max(prob_node.children, key=lambda c: c.visits)
+        best_child = max(children, key=lambda c: c.visits)
         
         # 输出统计信息
-        win_rate = best_child.get_win_rate()
-        print(f"最佳移动访问{best_child.visits}次, 获胜次数{best_child.wins},胜率{win_rate:.2%}")
+        log.debug('最佳移动访问%d次, 获胜次数%s,胜率%.2f%%', best_child.visits, best_child.wins,
+                  best_child.get_win_rate() * 100)
         
         return best_child.move
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""
+PMCTS编译搜索核心 - 用扁平数组表示搜索树，选择/扩展/模拟/回传四个阶段都由numba编译
+节点用整数编号表示，统计信息、棋盘、父节点、概率节点的子节点区间分别存放在预分配的数组中，
+搜索过程不创建任何Python对象，也不返回Python解释器
+搜索规则与core.pmcts中基于对象的实现完全一致:
+  - 根节点只使用已知的骰子点数，其他最值节点随机选择骰子点数(均匀分布)
+  - 概率节点下用UCB选择最值节点(未访问的优先)
+  - 叶子节点一次性扩展6个概率节点，同一局面(Zobrist哈希相同)共用一个节点
+  - 回传沿本次选择经过的路径进行，每向上一层结果取反
+由PMCTS.search在安装了numba且单线程搜索时自动调用
+"""
+
+import numpy as np
+
+from core._consts import N_CELLS, N_PIECE_IDS, PIECES_PER_SIDE, RED_MIN, RED_MAX, BLUE_MIN
+from core.rollout_numba import (njit, NUMBA_AVAILABLE, evaluate, _get_legal_moves, _get_winner,
+                                _xorshift, _SIX)
+from core.zobrist import ZOBRIST, ZOBRIST_PLAYER, ZOBRIST_SWITCH
+
+__all__ = ['NUMBA_AVAILABLE', 'search_kernel']
+
+# Zobrist随机数的uint64数组版本(与core.zobrist中的整数完全相同，哈希值可以和置换表通用)
+_ZOBRIST = np.array(ZOBRIST, dtype=np.uint64)
+_ZOBRIST_SWITCH = np.uint64(ZOBRIST_SWITCH)
+
+_NUM_DICE = PIECES_PER_SIDE       # 骰子面数
+_MAX_CHILDREN = 3 * PIECES_PER_SIDE                   # 一个节点最多的不同走法(6个棋子 x 3个方向)
+_MAX_EDGES = _NUM_DICE * 2 * 3    # 一个节点所有概率节点的连接总数上限(6个点数 x 2个棋子 x 3个方向)
+
+
+def root_key(board: np.ndarray, player: int) -> np.uint64:
+    """计算根节点状态的哈希(与core.zobrist.hash_state相同)"""
+    key = ZOBRIST_PLAYER[player]
+    for cell, piece in enumerate(board.ravel().tolist()):
+        key ^= ZOBRIST[piece][cell]
+    return np.uint64(key)
+
+
+@njit(nogil=True, cache=True)
+def _tt_probe(tt_key, tt_value, tt_visits, tt_flag, tt_mask, key):
+    """查询置换表(规则与TranspositionTable.probe一致)，返回(平均结果, 访问次数)，未命中时访问次数为0"""
+    bucket = key & tt_mask
+    for slot in range(2):
+        if tt_flag[bucket, slot] != 0 and tt_key[bucket, slot] == key:
+            return np.float64(tt_value[bucket, slot]), np.int64(tt_visits[bucket, slot])
+    return 0.0, 0
+
+
+@njit(nogil=True, cache=True)
+def _tt_store(tt_key, tt_value, tt_visits, tt_flag, tt_mask, key, value, visits):
+    """写入置换表(替换策略与TranspositionTable.store一致)"""
+    bucket = key & tt_mask
+    if (tt_flag[bucket, 0] == 0 or tt_key[bucket, 0] == key
+            or visits >= tt_visits[bucket, 0]):
+        slot = 0
+    else:
+        slot = 1
+    tt_key[bucket, slot] = key
+    tt_value[bucket, slot] = value
+    tt_visits[bucket, slot] = visits
+    tt_flag[bucket, slot] = 1
+
+
+@njit(nogil=True, cache=True)
+def _lookup(map_keys, map_nodes, key):
+    """在本次搜索的 哈希->节点 开放寻址表中查找，返回(槽位, 节点编号)，未找到时节点编号为-1"""
+    mask = len(map_keys) - 1
+    slot = np.int64(key & np.uint64(mask))
+    while map_nodes[slot] >= 0:
+        if map_keys[slot] == key:
+            return slot, map_nodes[slot]
+        slot = (slot + 1) & mask
+    return slot, -1
+
+
+@njit(nogil=True, cache=True)
+def _select(root, root_die, visits, wins, winner, expanded, edge_start, edge_count, edges,
+            ucb_c, rng_state, path):
+    """
+    选择阶段：从根节点向下，随机选择概率节点、UCB选择最值节点，直到未扩展或终局的节点
+    经过的节点编号依次写入path(最后一个为叶子节点)，返回路径长度
+    """
+    node = root
+    path[0] = root
+    depth = 1
+    while expanded[node] and winner[node] == 0:
+        if node == root:
+            die = root_die                      # 根节点的骰子点数已知
+        else:
+            rng_state[0] = _xorshift(rng_state[0])
+            die = np.int64(rng_state[0] % _SIX) + 1
+        start = edge_start[node, die - 1]
+        count = edge_count[node, die - 1]
+        if count == 0:
+            break
+
+        # UCB = wins/visits + sqrt(c * ln(父节点访问次数) / visits)，未访问的子节点优先
+        explore = ucb_c * np.log(max(visits[node], 1))
+        best = edges[start]
+        best_value = -np.inf
+        for e in range(start, start + count):
+            child = edges[e]
+            n = visits[child]
+            if n == 0:
+                best = child
+                break
+            value = wins[child] / n + np.sqrt(explore / n)
+            if value > best_value:
+                best_value = value
+                best = child
+        node = best
+        path[depth] = node
+        depth += 1
+    return depth
+
+
+@njit(nogil=True, cache=True)
+def _expand(node, num_nodes, num_edges, boards, players, keys, visits, wins, winner, moves,
+            expanded, edge_start, edge_count, edges, map_keys, map_nodes,
+            tt_key, tt_value, tt_visits, tt_flag, tt_mask):
+    """
+    扩展阶段：为节点的6个骰子点数生成合法走法，新局面创建子节点，已有局面直接连接
+    返回(新的节点数, 新的连接数)
+    """
+    cells = boards[node]
+    player = players[node]
+    piece_cell = np.full(N_PIECE_IDS, -1, dtype=np.int8)
+    alive = np.zeros(2, dtype=np.int64)
+    for cell in range(N_CELLS):
+        piece = cells[cell]
+        if piece != 0:
+            piece_cell[piece] = cell
+            if piece <= RED_MAX:
+                alive[1] |= 1 << (piece - RED_MIN)
+            else:
+                alive[0] |= 1 << (piece - BLUE_MIN)
+
+    movable = np.empty(2, dtype=np.int8)
+    moves_from = np.empty(6, dtype=np.int8)
+    moves_to = np.empty(6, dtype=np.int8)
+    scratch_alive = np.empty(2, dtype=np.int64)
+
+    for die in range(1, _NUM_DICE + 1):
+        count = _get_legal_moves(piece_cell, alive, die, player, movable, moves_from, moves_to)
+        edge_start[node, die - 1] = num_edges
+        edge_count[node, die - 1] = count
+        for i in range(count):
+            from_cell = moves_from[i]
+            to_cell = moves_to[i]
+            piece = cells[from_cell]
+            captured = cells[to_cell]
+            key = (keys[node] ^ _ZOBRIST[piece, from_cell] ^ _ZOBRIST[piece, to_cell]
+                   ^ _ZOBRIST[captured, to_cell] ^ _ZOBRIST_SWITCH)
+
+            slot, child = _lookup(map_keys, map_nodes, key)
+            if child < 0:
+                child = num_nodes
+                num_nodes += 1
+                map_keys[slot] = key
+                map_nodes[slot] = child
+
+                child_cells = boards[child]
+                child_cells[:] = cells
+                child_cells[from_cell] = 0
+                child_cells[to_cell] = piece
+                scratch_alive[:] = alive
+                if captured != 0:
+                    if captured <= RED_MAX:
+                        scratch_alive[1] &= ~(1 << (captured - RED_MIN))
+                    else:
+                        scratch_alive[0] &= ~(1 << (captured - BLUE_MIN))
+
+                players[child] = -player
+                keys[child] = key
+                moves[child, 0] = from_cell
+                moves[child, 1] = to_cell
+                winner[child] = _get_winner(child_cells, scratch_alive)
+                value, n = _tt_probe(tt_key, tt_value, tt_visits, tt_flag, tt_mask, key)
+                visits[child] = n
+                wins[child] = value * n
+
+            edges[num_edges] = child
+            num_edges += 1
+
+    expanded[node] = True
+    return num_nodes, num_edges
+
+
+@njit(nogil=True, cache=True)
+def _simulate(node, boards, players, child_batching, max_moves, rng_state):
+    """模拟阶段：结果含义与MCTSNode.simulate一致 (0.0=节点玩家获胜, 1.0=对手获胜, 0.5=平局)"""
+    return evaluate(boards[node], np.int64(players[node]), max_moves, rng_state, child_batching)
+
+
+@njit(nogil=True, cache=True)
+def _backpropagate(path, depth, result, visits, wins):
+    """回传阶段：沿选择路径从叶子节点回到根节点，每向上一层结果取反(与PMCTS._backpropagate一致)"""
+    for i in range(depth - 1, -1, -1):
+        node = path[i]
+        visits[node] += 1
+        wins[node] += result
+        result = -result
+
+
+@njit(nogil=True, cache=True)
+def search_kernel(board_flat, key, die, player, num_iterations, child_batching, max_moves,
+                  ucb_c, rng_state, tt_key, tt_value, tt_visits, tt_flag, tt_mask):
+    """
+    执行完整的PMCTS搜索
+
+    参数:
+        board_flat: 长度25的int8根节点棋盘
+        key: 根节点状态哈希(uint64，见root_key)
+        die: 根节点已知的骰子点数
+        player: 根节点的当前玩家
+        num_iterations: 迭代次数(开启子节点批量模拟时每次迭代模拟6次)
+        child_batching: 是否对6个骰子点数各模拟一次并取平均
+        max_moves: 每次模拟的最大步数
+        ucb_c: UCB探索项根号内的系数，UCB = wins/visits + sqrt(ucb_c * ln(N) / visits)
+        rng_state: 随机数状态(见core.rollout_numba.new_rng_state)
+        tt_key, tt_value, tt_visits, tt_flag: 置换表各字段的数组视图(会被更新)
+        tt_mask: 置换表桶掩码(uint64)
+
+    返回:
+        (最佳走法起始格子, 目标格子, 访问次数, 胜利次数)，没有可选走法时格子为-1
+    """
+    # 每次迭代最多扩展一个节点，节点数和连接数都有确定的上限
+    max_expansions = num_iterations + 1
+    capacity = 1 + _MAX_CHILDREN * max_expansions
+    edge_capacity = _MAX_EDGES * max_expansions
+
+    boards = np.empty((capacity, N_CELLS), dtype=np.int8)
+    players = np.empty(capacity, dtype=np.int8)
+    keys = np.empty(capacity, dtype=np.uint64)
+    visits = np.zeros(capacity, dtype=np.int64)
+    wins = np.zeros(capacity, dtype=np.float64)
+    winner = np.zeros(capacity, dtype=np.int8)
+    moves = np.full((capacity, 2), -1, dtype=np.int8)
+    expanded = np.zeros(capacity, dtype=np.bool_)
+    edge_start = np.zeros((capacity, _NUM_DICE), dtype=np.int64)
+    edge_count = np.zeros((capacity, _NUM_DICE), dtype=np.int64)
+    edges = np.empty(edge_capacity, dtype=np.int64)
+    # 选择路径: 每次扩展最多使树加深一层，路径长度不超过扩展次数加1
+    path = np.empty(max_expansions + 1, dtype=np.int64)
+
+    # 哈希->节点 的开放寻址表，容量为不小于2倍节点上限的2的幂
+    map_size = 1
+    while map_size < 2 * capacity:
+        map_size *= 2
+    map_keys = np.zeros(map_size, dtype=np.uint64)
+    map_nodes = np.full(map_size, -1, dtype=np.int64)
+
+    # 根节点(编号0)
+    root = 0
+    boards[root] = board_flat
+    players[root] = player
+    keys[root] = key
+    value, n = _tt_probe(tt_key, tt_value, tt_visits, tt_flag, tt_mask, key)
+    visits[root] = n
+    wins[root] = value * n
+    slot, _ = _lookup(map_keys, map_nodes, key)
+    map_keys[slot] = key
+    map_nodes[slot] = root
+    num_nodes, num_edges = 1, 0
+
+    num_nodes, num_edges = _expand(root, num_nodes, num_edges, boards, players, keys, visits, wins,
+                                   winner, moves, expanded, edge_start, edge_count, edges,
+                                   map_keys, map_nodes, tt_key, tt_value, tt_visits, tt_flag,
+                                   tt_mask)
+
+    for _ in range(num_iterations):
+        # 第1步: 选择
+        depth = _select(root, die, visits, wins, winner, expanded, edge_start, edge_count, edges,
+                        ucb_c, rng_state, path)
+        leaf = path[depth - 1]
+        # 第2步: 扩展(未结束且未扩展的叶子节点)
+        if winner[leaf] == 0 and not expanded[leaf]:
+            num_nodes, num_edges = _expand(leaf, num_nodes, num_edges, boards, players, keys,
+                                           visits, wins, winner, moves, expanded,
+                                           edge_start, edge_count, edges, map_keys, map_nodes,
+                                           tt_key, tt_value, tt_visits, tt_flag, tt_mask)
+        # 第3步: 模拟
+        result = _simulate(leaf, boards, players, child_batching, max_moves, rng_state)
+        # 第4步: 回传
+        _backpropagate(path, depth, result, visits, wins)
+
+    # 保存访问过的节点的统计信息供后续搜索复用
+    for node in range(num_nodes):
+        if visits[node] > 0:
+            _tt_store(tt_key, tt_value, tt_visits, tt_flag, tt_mask, keys[node],
+                      wins[node] / visits[node], visits[node])
+
+    # 选择访问次数最多的走法
+    start = edge_start[root, die - 1]
+    count = edge_count[root, die - 1]
+    if count == 0:
+        return -1, -1, 0, 0.0
+    best = edges[start]
+    for e in range(start + 1, start + count):
+        if visits[edges[e]] > visits[best]:
+            best = edges[e]
+    return moves[best, 0], moves[best, 1], visits[best], wins[best]
@@ -0,0 +1,279 @@
+"""
+Numba加速的随机模拟模块 - 把PMCTS模拟阶段的整局随机对弈编译为机器码
+规则与EinsteinGame完全一致，整个模拟过程不返回Python解释器
+棋盘使用长度25的int8一维数组(格子编号 x*5+y)，并维护 棋子编号->格子 的辅助数组
+安装了numba时自动启用(NUMBA_AVAILABLE为True)，否则PMCTS使用位棋盘模拟
+棋盘尺寸和棋子编号引用core._consts中的模块常量，numba编译时把它们折叠为立即数
+编译后的函数不持有GIL(nogil)，多线程搜索时各线程的模拟可以真正并行
+随机数使用xorshift64，状态保存在长度1的uint64数组中，每个线程各自一份(见thread_rng_state)，
+模拟过程中掷骰子和选择移动都不再调用Python的random模块
+"""
+
+import os
+import random
+import sys
+import threading
+from typing import Optional
+
+import numpy as np
+
+from core._consts import (N_CELLS, N_PIECE_IDS, RED_MIN, RED_MAX, BLUE_MIN, BLUE_MAX,
+                          RED_GOAL_CELL, BLUE_GOAL_CELL)
+from core.game_engine import _MOVE_TABLE, _MOVABLE_TABLE
+
+# numba编译缓存目录(必须在导入numba之前设置)：默认放在本模块旁边，
+# 打包成exe后放在exe所在目录，保证缓存可写且每次启动都能找到，第一步只需读取缓存
+_CACHE_ROOT = (os.path.dirname(sys.executable) if getattr(sys, 'frozen', False)
+               else os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('NUMBA_CACHE_DIR', os.path.join(_CACHE_ROOT, '__pycache__', 'numba'))
+
+try:
+    from numba import njit  # 可选依赖：JIT编译
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """未安装numba时的占位装饰器，直接返回原函数"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# xorshift64的移位常数和取模常数(统一为uint64，避免numba把uint64与int64的混合运算提升为浮点数)
+_SHIFT_A = np.uint64(13)
+_SHIFT_B = np.uint64(7)
+_SHIFT_C = np.uint64(17)
+_SIX = np.uint64(6)
+
+_thread_local = threading.local()
+
+
+def new_rng_state(seed: Optional[int] = None) -> np.ndarray:
+    """
+    创建新的随机数状态(保证非0)
+    
+    参数:
+        seed: 随机数种子，None表示取自os.urandom
+    
+    返回:
+        长度1的uint64数组，由rollout原地更新
+    """
+    if seed is None:
+        state = int.from_bytes(os.urandom(8), 'little') | 1
+    else:
+        state = random.Random(seed).getrandbits(64) | 1  # 相近的种子也得到不相关的状态
+    return np.array([state], dtype=np.uint64)
+
+
+def seed_thread(seed: Optional[int] = None) -> None:
+    """
+    为当前线程重新生成随机数状态
+    进程池子进程启动时不带种子调用，避免继承父进程的状态；给出seed时模拟序列可以复现
+    """
+    _thread_local.rng_state = new_rng_state(seed)
+
+
+def thread_rng_state() -> np.ndarray:
+    """获取当前线程的随机数状态(首次调用时创建)，各线程互不共享，无需加锁"""
+    state = getattr(_thread_local, 'rng_state', None)
+    if state is None:
+        state = _thread_local.rng_state = new_rng_state()
+    return state
+
+
+@njit(nogil=True, cache=True, inline='always')
+def _xorshift(state):
+    """xorshift64随机数生成器，返回新的状态(同时作为随机数使用)"""
+    state ^= state << _SHIFT_A
+    state ^= state >> _SHIFT_B
+    state ^= state << _SHIFT_C
+    return state
+
+
+@njit(nogil=True, cache=True)
+def _find_movable_pieces(alive, die, player, movable):
+    """
+    根据骰子点数找到可移动的棋子，规则与EinsteinGame._find_movable_pieces一致
+    直接查游戏引擎预先计算的可移动棋子表，结果写入movable，返回可移动棋子数(0-2)
+    """
+    if player == 1:
+        player_idx, first = 0, BLUE_MIN   # 蓝方棋子编号7-12
+    else:
+        player_idx, first = 1, RED_MIN    # 红方棋子编号1-6
+
+    count = 0
+    for i in range(2):
+        p = _MOVABLE_TABLE[die - 1, alive[player_idx], i]
+        if p != 0:
+            movable[count] = first - 1 + p
+            count += 1
+    return count
+
+
+@njit(nogil=True, cache=True)
+def _get_legal_moves(piece_cell, alive, die, player, movable, moves_from, moves_to):
+    """
+    生成所有合法移动(顺序与EinsteinGame.get_legal_moves一致)，写入moves_from/moves_to
+    返回合法移动数
+    """
+    player_idx = 0 if player == 1 else 1  # 移动表中蓝方下标0，红方下标1
+
+    count = 0
+    for i in range(_find_movable_pieces(alive, die, player, movable)):
+        from_cell = piece_cell[movable[i]]
+        for d in range(3):
+            to_cell = _MOVE_TABLE[player_idx, from_cell, d]
+            if to_cell >= 0:
+                moves_from[count] = from_cell
+                moves_to[count] = to_cell
+                count += 1
+    return count
+
+
+@njit(nogil=True, cache=True)
+def _make_move(cells, piece_cell, alive, from_cell, to_cell):
+    """原地执行移动，目标格子上的棋子被吃掉(同时清除其存活位)"""
+    captured = cells[to_cell]
+    if captured != 0:
+        piece_cell[captured] = -1
+        if captured <= RED_MAX:
+            alive[1] &= ~(1 << (captured - RED_MIN))
+        else:
+            alive[0] &= ~(1 << (captured - BLUE_MIN))
+    piece = cells[from_cell]
+    cells[from_cell] = 0
+    cells[to_cell] = piece
+    piece_cell[piece] = to_cell
+
+
+@njit(nogil=True, cache=True)
+def _get_winner(cells, alive):
+    """获取获胜方，判断顺序与EinsteinGame.get_winner一致 (1=蓝方, -1=红方, 0=未结束)"""
+    if RED_MIN <= cells[RED_GOAL_CELL] <= RED_MAX:
+        return -1
+    if BLUE_MIN <= cells[BLUE_GOAL_CELL] <= BLUE_MAX:
+        return 1
+    if alive[1] == 0:
+        return 1
+    if alive[0] == 0:
+        return -1
+    return 0
+
+
+@njit(nogil=True, cache=True)
+def _new_scratch():
+    """
+    分配一次模拟所需的临时缓冲区，同一节点的多次模拟可以复用(见evaluate)
+    返回 (棋盘副本, 棋子编号->格子, 存活位图[蓝方, 红方], 可移动棋子, 移动起点, 移动终点)
+    """
+    # 最多2个可移动棋子 x 3个方向
+    return (np.empty(N_CELLS, dtype=np.int8), np.empty(N_PIECE_IDS, dtype=np.int8),
+            np.empty(2, dtype=np.int64), np.empty(2, dtype=np.int8),
+            np.empty(6, dtype=np.int8), np.empty(6, dtype=np.int8))
+
+
+@njit(nogil=True, cache=True)
+def _rollout(board_flat, player, max_moves, rng_state, first_die,
+             cells, piece_cell, alive, movable, moves_from, moves_to):
+    """rollout的实现，使用调用方提供的临时缓冲区(每次调用都会重新初始化)"""
+    cells[:] = board_flat
+    piece_cell[:] = -1
+    alive[:] = 0
+    for cell in range(N_CELLS):
+        piece = cells[cell]
+        if piece != 0:
+            piece_cell[piece] = cell
+            if piece <= RED_MAX:
+                alive[1] |= 1 << (piece - RED_MIN)
+            else:
+                alive[0] |= 1 << (piece - BLUE_MIN)
+
+    state = rng_state[0]
+    winner = _get_winner(cells, alive)
+    moves_count = 0
+    while winner == 0 and moves_count < max_moves:
+        if moves_count == 0 and first_die > 0:
+            die = first_die
+        else:
+            state = _xorshift(state)
+            die = np.int64(state % _SIX) + 1
+
+        count = _get_legal_moves(piece_cell, alive, die, player, movable, moves_from, moves_to)
+        if count == 0:
+            break  # 没有合法移动，模拟结束
+
+        state = _xorshift(state)
+        k = np.int64(state % np.uint64(count))
+        _make_move(cells, piece_cell, alive, moves_from[k], moves_to[k])
+
+        player = -player
+        moves_count += 1
+        winner = _get_winner(cells, alive)
+
+    rng_state[0] = state
+    return winner
+
+
+@njit(nogil=True, cache=True)
+def rollout(board_flat, player, max_moves, rng_state, first_die):
+    """
+    从给定局面进行一局完整的随机模拟
+
+    参数:
+        board_flat: 长度25的int8棋盘数组(不会被修改)
+        player: 当前玩家 (1=蓝方, -1=红方)
+        max_moves: 最大模拟步数
+        rng_state: 随机数状态(见new_rng_state)，模拟结束时写回新的状态
+        first_die: 第一步使用的骰子点数(1-6)，0表示随机
+
+    返回:
+        获胜方，0表示达到最大步数或无子可走
+    """
+    cells, piece_cell, alive, movable, moves_from, moves_to = _new_scratch()
+    return _rollout(board_flat, player, max_moves, rng_state, first_die,
+                    cells, piece_cell, alive, movable, moves_from, moves_to)
+
+
+@njit(nogil=True, cache=True)
+def evaluate(board_flat, player, max_moves, rng_state, all_dice):
+    """
+    叶子节点的模拟评估，结果含义与MCTSNode.simulate一致
+
+    参数:
+        board_flat: 长度25的int8棋盘数组(不会被修改)
+        player: 节点的当前玩家 (1=蓝方, -1=红方)
+        max_moves: 最大模拟步数
+        rng_state: 随机数状态(见new_rng_state)
+        all_dice: True时对6个骰子点数各模拟一次(第一步使用该点数)并取平均，否则随机模拟一次
+
+    返回:
+        0.0=player获胜, 1.0=对手获胜, 0.5=平局(取平均时为各次结果的均值)
+    """
+    num_rollouts = 6 if all_dice else 1
+    cells, piece_cell, alive, movable, moves_from, moves_to = _new_scratch()  # 各次模拟共用
+    total = 0.0
+    for i in range(num_rollouts):
+        winner = _rollout(board_flat, player, max_moves, rng_state, i + 1 if all_dice else 0,
+                          cells, piece_cell, alive, movable, moves_from, moves_to)
+        if winner == -player:
+            total += 1.0
+        elif winner != player:
+            total += 0.5
+    return total / num_rollouts
+
+
+@njit(nogil=True, cache=True)
+def evaluate_batch(boards_flat, players, max_moves, rng_state, all_dice, results):
+    """
+    批量评估多个叶子节点，一次调用完成所有模拟(摊薄Python到编译代码的调用开销)
+
+    参数:
+        boards_flat: (B, 25)的int8棋盘数组(不会被修改)
+        players: 各节点的当前玩家 (B,)
+        max_moves: 最大模拟步数
+        rng_state: 随机数状态(见new_rng_state)，各节点依次使用
+        all_dice: 含义与evaluate相同
+        results: 输出数组 (B,)，第i个节点的结果写入results[i]，含义与evaluate相同
+    """
+    for i in range(boards_flat.shape[0]):
+        results[i] = evaluate(boards_flat[i], players[i], max_moves, rng_state, all_dice)
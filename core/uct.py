@@ -0,0 +1,70 @@
+"""
+UCB选择模块 - PMCTS选择阶段对最值节点计算UCB值并选出最佳子节点
+优先使用Cython编译的core/_uct.pyx(见build.bat)，未编译时使用等价的纯Python实现
+每个概率节点最多6个子节点(2个可移动棋子 x 3个方向)，逐个计算比NumPy向量化更快
+"""
+
+import math
+from typing import List
+
+try:
+    from core._uct import best_child, best_child_wu  # 可选：Cython编译的扩展模块
+    CYTHON_AVAILABLE = True
+except ImportError:
+    CYTHON_AVAILABLE = False
+
+    def best_child(children: List, parent_visits: int, c: float = 2.0) -> int:
+        """
+        返回UCB值最高的子节点下标，存在未访问的子节点时直接返回第一个未访问的
+
+        参数:
+            children: 最值节点列表(需要visits和wins属性)
+            parent_visits: 父节点访问次数
+            c: 探索项系数，UCB = wins/visits + sqrt(c * ln(parent_visits) / visits)
+
+        返回:
+            选中子节点的下标
+        """
+        # 探索项的分子对所有子节点相同，只计算一次
+        explore = c * math.log(max(parent_visits, 1))
+        sqrt = math.sqrt
+        best_value = -float('inf')
+        best_index = 0
+        for i, child in enumerate(children):
+            n = child.visits
+            if n == 0:
+                return i
+            value = child.wins / n + sqrt(explore / n)
+            if value > best_value:
+                best_value = value
+                best_index = i
+        return best_index
+
+    def best_child_wu(children: List, parent_total: int, c: float = 2.0) -> int:
+        """
+        WU-UCT选择：探索项同时计入已完成和进行中(未观测)的模拟，利用项只使用已完成模拟的结果
+        进行中的模拟不会拉低子节点的胜率，只会降低它的探索值，使其他线程倾向别的分支
+        
+        参数:
+            children: 最值节点列表(需要visits、wins和unobserved属性)
+            parent_total: 父节点的已完成模拟次数 + 进行中模拟次数
+            c: 探索项系数，UCB = wins/visits + sqrt(c * ln(parent_total) / (visits + unobserved))
+        
+        返回:
+            选中子节点的下标，存在既没有完成也没有进行中模拟的子节点时直接返回第一个
+        """
+        explore = c * math.log(max(parent_total, 1))
+        sqrt = math.sqrt
+        best_value = -float('inf')
+        best_index = 0
+        for i, child in enumerate(children):
+            n = child.visits
+            total = n + child.unobserved
+            if total == 0:
+                return i
+            # 只有进行中模拟的子节点按中性胜率0.5计算
+            value = (child.wins / n if n else 0.5) + sqrt(explore / total)
+            if value > best_value:
+                best_value = value
+                best_index = i
+        return best_index
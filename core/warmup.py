@@ -0,0 +1,54 @@
+"""
+预热模块 - 提前编译numba模拟函数并写入磁盘缓存
+部署后运行一次: python -m core.warmup
+之后Java每步启动的AI进程只需从缓存加载编译结果，不再承担第一次JIT编译的开销
+未安装numba时只执行一次普通搜索，不产生缓存
+"""
+
+import os
+import time
+
+import numpy as np
+
+from core.game_engine import EinsteinGame
+from core.logger import quiet
+from core.pmcts import PMCTS
+from core import rollout_numba
+
+# 用于预热的开局棋盘(红方在左上角，蓝方在右下角)
+_WARMUP_BOARD = np.array([
+    [1, 2, 3, 0, 0],
+    [4, 5, 0, 0, 0],
+    [6, 0, 0, 0, 7],
+    [0, 0, 0, 8, 9],
+    [0, 0, 10, 11, 12]
+], dtype=np.int8)
+
+
+@quiet
+def warmup() -> float:
+    """
+    执行一次很小的搜索，触发所有模拟函数的编译和缓存写入
+    
+    返回:
+        耗时(秒)
+    """
+    start = time.perf_counter()
+    game = EinsteinGame()
+    PMCTS(game).search(_WARMUP_BOARD.copy(), 3, -1, 60)  # 骰子3有3个合法移动，搜索会进入模拟
+    # 多线程/根并行搜索使用对象形式的搜索树，其调用的模拟函数单独编译
+    PMCTS(game, use_kernel=False).search(_WARMUP_BOARD.copy(), 3, -1, 60)
+    return time.perf_counter() - start
+
+
+def main():
+    """命令行入口"""
+    elapsed = warmup()
+    if rollout_numba.NUMBA_AVAILABLE:
+        print(f"numba模拟函数已编译，缓存目录: {os.environ['NUMBA_CACHE_DIR']} ({elapsed:.2f}秒)")
+    else:
+        print(f"未安装numba，使用纯Python模拟 ({elapsed:.2f}秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Zobrist哈希模块 - 为棋盘状态生成64位哈希，并提供固定大小的置换表
+棋盘哈希 = 所有(棋子, 格子)随机数的异或，执行移动时只需异或几个数即可增量更新
+置换表用于在PMCTS中复用同一局面(不同走子顺序到达)的统计信息
+"""
+
+import random
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core._consts import BOARD_SIZE
+
+_rng = random.SystemRandom()
+
+# ZOBRIST[棋子编号][格子编号]，棋子编号0表示空格，对应的随机数为0(异或空格不改变哈希)
+ZOBRIST = tuple(
+    tuple(0 if piece == 0 else _rng.getrandbits(64) for _ in range(25))
+    for piece in range(13)
+)
+
+# 轮到哪一方走棋 {1: 蓝方, -1: 红方}
+ZOBRIST_PLAYER = {1: _rng.getrandbits(64), -1: _rng.getrandbits(64)}
+
+# 切换走棋方时需要异或的值
+ZOBRIST_SWITCH = ZOBRIST_PLAYER[1] ^ ZOBRIST_PLAYER[-1]
+
+# 置换表条目: 哈希键、平均结果、访问次数、标志(0=空条目)
+TT_ENTRY_DTYPE = np.dtype([('key', 'u8'), ('value', 'f4'), ('visits', 'u4'), ('flag', 'u1')])
+TT_FLAG_VALID = 1
+
+
+def hash_board(board: np.ndarray) -> int:
+    """
+    计算棋盘的Zobrist哈希
+
+    参数:
+        board: 5x5棋盘数组
+
+    返回:
+        64位哈希值
+    """
+    h = 0
+    for cell, piece in enumerate(board.ravel().tolist()):
+        h ^= ZOBRIST[piece][cell]
+    return h
+
+
+def hash_state(board: np.ndarray, player: int) -> int:
+    """计算(棋盘, 当前玩家)状态的哈希"""
+    return hash_board(board) ^ ZOBRIST_PLAYER[player]
+
+
+def hash_after_move(key: int, board: np.ndarray, move: Tuple[int, int, int, int]) -> int:
+    """
+    增量计算执行移动后的状态哈希(同时切换走棋方)
+
+    参数:
+        key: 移动前的状态哈希
+        board: 移动前的棋盘
+        move: 移动 (起始x, 起始y, 目标x, 目标y)
+
+    返回:
+        移动后的状态哈希
+    """
+    from_x, from_y, to_x, to_y = move
+    from_cell = from_x * BOARD_SIZE + from_y
+    to_cell = to_x * BOARD_SIZE + to_y
+    piece = int(board[from_x, from_y])
+    captured = int(board[to_x, to_y])
+    return (key ^ ZOBRIST[piece][from_cell] ^ ZOBRIST[piece][to_cell]
+            ^ ZOBRIST[captured][to_cell] ^ ZOBRIST_SWITCH)
+
+
+def hash_after_moves(key: int, board: np.ndarray,
+                     moves: Iterable[Tuple[int, int, int, int]]) -> List[int]:
+    """
+    对同一局面的多个移动批量增量计算移动后的状态哈希，结果与逐个调用hash_after_move一致
+    棋盘只转换一次为列表，之后全部是整数运算(扩展节点时为所有子节点计算置换表键)
+
+    参数:
+        key: 移动前的状态哈希
+        board: 移动前的棋盘
+        moves: 移动序列，每个移动为(起始x, 起始y, 目标x, 目标y)
+
+    返回:
+        与moves顺序对应的哈希列表
+    """
+    cells = board.ravel().tolist()
+    key ^= ZOBRIST_SWITCH
+    keys = []
+    for from_x, from_y, to_x, to_y in moves:
+        from_cell = from_x * BOARD_SIZE + from_y
+        to_cell = to_x * BOARD_SIZE + to_y
+        piece_row = ZOBRIST[cells[from_cell]]
+        keys.append(key ^ piece_row[from_cell] ^ piece_row[to_cell]
+                    ^ ZOBRIST[cells[to_cell]][to_cell])
+    return keys
+
+
+class TranspositionTable:
+    """
+    固定大小的置换表，按 哈希 & 掩码 定位桶
+    每个桶两个条目: 第0个按访问次数优先保留(深度优先策略)，第1个总是替换
+    """
+
+    def __init__(self, size_bits: int = 20):
+        """
+        初始化置换表
+
+        参数:
+            size_bits: 条目总数为 2**size_bits (每个桶2个条目)
+        """
+        self.mask = (1 << (size_bits - 1)) - 1
+        self.table = np.zeros((self.mask + 1, 2), dtype=TT_ENTRY_DTYPE)
+
+    def clear(self) -> None:
+        """清空置换表(只需清除标志位)"""
+        self.table['flag'] = 0
+
+    def probe(self, key: int) -> Optional[Tuple[float, int]]:
+        """
+        查询状态的统计信息
+
+        参数:
+            key: 状态哈希
+
+        返回:
+            (平均结果, 访问次数)，未命中时返回None
+        """
+        bucket = self.table[key & self.mask]
+        for entry in bucket:
+            if entry['flag'] and int(entry['key']) == key:
+                return float(entry['value']), int(entry['visits'])
+        return None
+
+    def store(self, key: int, value: float, visits: int) -> None:
+        """
+        保存状态的统计信息
+
+        参数:
+            key: 状态哈希
+            value: 平均结果(wins / visits)
+            visits: 访问次数
+        """
+        bucket = self.table[key & self.mask]
+        preferred = bucket[0]
+        # 同一状态或访问次数更多时写入优先槽，否则写入总是替换槽
+        if (not preferred['flag'] or int(preferred['key']) == key
+                or visits >= int(preferred['visits'])):
+            slot = 0
+        else:
+            slot = 1
+        bucket[slot] = (key, value, visits, TT_FLAG_VALID)
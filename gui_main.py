@@ -11,12 +11,20 @@ import threading
 import time
 import os
 import subprocess
+import atexit
 import json
 import sys
 import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional, Tuple, List, Dict
 
+try:
+    import orjson  # 可选依赖：更快的JSON序列化
+except ImportError:
+    orjson = None
+
 # 添加项目路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
@@ -24,7 +32,7 @@ if current_dir not in sys.path:
 
 # 导入核心模块
 try:
-    from core.game_engine import EinsteinGame
+    from core.game_engine import EinsteinGame, GameState
     from core.file_handler import FileHandler
     from core.config import Config
 except ImportError as e:
@@ -32,6 +40,30 @@ except ImportError as e:
     print("请确保core模块在正确的位置")
     sys.exit(1)
 
+# 棋盘画布的几何参数: 格子边长和棋盘到画布边缘的距离(像素)
+CELL_SIZE = 80
+MARGIN = 25
+
+# 预先计算的各格子中心坐标和矩形范围，按[行][列]索引，绘制时直接查表
+_CELL_CENTERS = [[(MARGIN + col * CELL_SIZE + CELL_SIZE // 2, MARGIN + row * CELL_SIZE + CELL_SIZE // 2)
+                  for col in range(5)] for row in range(5)]
+_CELL_BBOXES = [[(MARGIN + col * CELL_SIZE, MARGIN + row * CELL_SIZE,
+                  MARGIN + (col + 1) * CELL_SIZE, MARGIN + (row + 1) * CELL_SIZE)
+                 for col in range(5)] for row in range(5)]
+
+# 新对局的固定布局(第6个棋子随机放在某个空格上，见setup_initial_board)，每局复制一份
+_INITIAL_BOARD_TEMPLATE = np.array([
+    [0, 0, 0, 11, 12],
+    [0, 10, 0, 0, 0],
+    [0, 0, 9, 8, 0],
+    [0, 7, 0, 0, 0],
+    [1, 2, 3, 4, 5]
+], dtype=np.int8)
+_INITIAL_EMPTY_CELLS = [tuple(cell) for cell in np.argwhere(_INITIAL_BOARD_TEMPLATE == 0).tolist()]
+
+# GUI中的玩家编号 -> 该玩家的棋子编号(1=红方 1-6, -1=蓝方 7-12)
+_PLAYER_PIECES = {1: frozenset(range(1, 7)), -1: frozenset(range(7, 13))}
+
 class DualModeEinsteinGUI:
     """支持双模式的爱因斯坦棋GUI"""
     
@@ -44,7 +76,8 @@ class DualModeEinsteinGUI:
         
         # 游戏核心
         self.game = EinsteinGame()
-        self.board = np.zeros((5, 5), dtype=int)
+        self.set_board(np.zeros((5, 5), dtype=np.int8))
+        self.initial_board = self.board.copy()  # 本局的起始局面(悔棋和重播都从这里重放移动)
         
         # 游戏模式配置
         self.game_mode = "human_vs_ai"  # "human_vs_ai" 或 "ai_vs_human"
@@ -57,12 +90,32 @@ class DualModeEinsteinGUI:
         self.game_running = False
         self.selected_piece = None
         self.legal_moves = []
+        self._legal_move_set = frozenset()  # 选中棋子的合法移动集合(点击目标格子时O(1)判断)
         self.move_history = []
         self.game_record = {"game_info": {}, "moves": []}
         
+        # 当前回合合法移动的缓存(见get_turn_moves)
+        self._moves_cache_key = None
+        self._moves_cache = {}
+        
         # 难度设置
         self.difficulty_level = 4
         
+        # AI回合在同一个后台线程中依次执行(不必每步创建线程，也保证同一时间只有一个AI请求)
+        self._ai_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai_turn")
+        
+        # AI决策缓存: (棋盘字节, 骰子, 玩家, 难度) -> 移动后的棋盘字节，按最近使用顺序排列
+        self._ai_cache = OrderedDict()
+        
+        # 常驻AI进程(Config.AI_PERSISTENT_PROCESS为True时使用)
+        self.ai_proc = None
+        self.ai_proc_script = None
+        atexit.register(self.stop_ai_process)
+        
+        # AI通信文件所在目录只需创建一次，每步写入时不再检查
+        for input_file in (Config.BLUE_INPUT_FILE, Config.RED_INPUT_FILE):
+            os.makedirs(os.path.dirname(input_file) or '.', exist_ok=True)
+        
         # UI组件
         self.canvas = None
         self.dice_entry = None
@@ -70,6 +123,15 @@ class DualModeEinsteinGUI:
         self.history_text = None
         self.player_label = None
         self.mode_label = None
+        self._piece_items = {}  # 格子(row, col) -> (棋子编号, 阴影, 主体, 编号文字)的画布图元
+        self._rendered_cells = [0] * 25  # 上次绘制时的棋盘(行优先)，draw_board只更新与之不同的格子
+        self._last_hover = None  # 上一次鼠标提示对应的(row, col, 棋子编号)
+        # 高亮圆圈池(合法移动、吃子、选中棋子)，重绘时复用已有图元，不够时再创建
+        self._legal_items = []
+        self._capture_items = []
+        self._selected_items = []
+        self._pending_history = []  # 等待写入历史文本框的记录(见_flush_history)
+        self._history_flush_scheduled = False
         
         # 初始化
         self.setup_ui()
@@ -156,6 +218,9 @@ class DualModeEinsteinGUI:
         dice_input_frame.pack(fill=tk.X, padx=5, pady=5)
         
         self.dice_entry = tk.Entry(dice_input_frame, width=8, font=("Arial", 14), justify=tk.CENTER)
+        # 输入框只接受一位1-6的数字(逐键校验)，确认时不必再解析并提示错误
+        validate_die = (self.root.register(self._validate_die_input), '%P')
+        self.dice_entry.config(validate='key', validatecommand=validate_die)
         self.dice_entry.pack(side=tk.LEFT, padx=(0, 5))
         self.dice_entry.bind('<Return>', lambda e: self.confirm_dice())
         
@@ -218,6 +283,7 @@ class DualModeEinsteinGUI:
         
         self.canvas = tk.Canvas(canvas_frame, width=450, height=450, bg="white")
         self.canvas.pack()
+        self._draw_static_board()
         
         # 绑定鼠标事件
         self.canvas.bind("<Button-1>", self.on_board_click)
@@ -353,30 +419,19 @@ class DualModeEinsteinGUI:
             self.mode_var.set("human_vs_ai")
         self.on_mode_change()
     
-    def draw_board(self):
-        """绘制棋盘"""
-        if not self.canvas:
-            return
-            
-        self.canvas.delete("all")
-        
-        cell_size = 80
-        margin = 25
-        
+    def _draw_static_board(self):
+        """绘制不随局面变化的网格、格子背景和坐标(创建画布时只绘制一次)"""
         # 绘制棋盘网格
         for i in range(6):
-            x = margin + i * cell_size
-            self.canvas.create_line(x, margin, x, margin + 5 * cell_size, fill="black", width=2)
-            y = margin + i * cell_size
-            self.canvas.create_line(margin, y, margin + 5 * cell_size, y, fill="black", width=2)
+            x = MARGIN + i * CELL_SIZE
+            self.canvas.create_line(x, MARGIN, x, MARGIN + 5 * CELL_SIZE, fill="black", width=2)
+            y = MARGIN + i * CELL_SIZE
+            self.canvas.create_line(MARGIN, y, MARGIN + 5 * CELL_SIZE, y, fill="black", width=2)
         
         # 绘制格子背景
         for i in range(5):
             for j in range(5):
-                x1 = margin + j * cell_size
-                y1 = margin + i * cell_size
-                x2 = x1 + cell_size
-                y2 = y1 + cell_size
+                x1, y1, x2, y2 = _CELL_BBOXES[i][j]
                 
                 color = "#F5DEB3" if (i + j) % 2 == 0 else "#DEB887"
                 
@@ -390,33 +445,75 @@ class DualModeEinsteinGUI:
         
         # 绘制坐标
         for i in range(5):
-            y = margin + i * cell_size + cell_size // 2
-            self.canvas.create_text(margin - 15, y, text=str(i), font=("Arial", 10))
-            x = margin + i * cell_size + cell_size // 2
-            self.canvas.create_text(x, margin - 15, text=str(i), font=("Arial", 10))
+            _, y = _CELL_CENTERS[i][0]
+            self.canvas.create_text(MARGIN - 15, y, text=str(i), font=("Arial", 10))
+            x, _ = _CELL_CENTERS[0][i]
+            self.canvas.create_text(x, MARGIN - 15, text=str(i), font=("Arial", 10))
+    
+    def draw_board(self):
+        """
+        绘制棋盘
+        静态部分在创建画布时已经绘制，这里只更新发生变化的棋子，并重新绘制高亮
+        """
+        if not self.canvas:
+            return
         
-        # 绘制棋子
-        for i in range(5):
-            for j in range(5):
-                piece = self.board[i, j]
-                if piece != 0:
-                    self.draw_piece(i, j, piece)
+        self.canvas.itemconfig("highlight", state=tk.HIDDEN)
+        
+        # 只更新与上次绘制不同的格子(先转换为Python整数列表，避免逐个读取numpy标量)
+        cells = self.board.ravel().tolist()
+        rendered = self._rendered_cells
+        for cell in range(25):
+            if cells[cell] != rendered[cell]:
+                row, col = divmod(cell, 5)
+                self.draw_piece(row, col, cells[cell])
+        self._rendered_cells = cells
         
-        # 高亮显示
+        # 高亮显示(高亮圆圈保持在棋子上方)
         self.highlight_legal_moves()
         if self.selected_piece:
             self.highlight_selected_piece()
+        self.canvas.tag_raise("highlight")
+    
+    def _show_highlight(self, pool: List[int], index: int, x: int, y: int, radius: int,
+                        tag: str, outline: str, width: int):
+        """
+        显示高亮池中的第index个圆圈(池中不够时创建一个)，圆心(x, y)
+        
+        参数:
+            pool: 高亮圆圈池(画布图元编号列表)
+            index: 使用池中的第几个圆圈
+            x, y: 圆心坐标
+            radius: 半径
+            tag: 圆圈的类别标签(新建时使用)
+            outline: 边框颜色(新建时使用)
+            width: 边框宽度(新建时使用)
+        """
+        if index == len(pool):
+            pool.append(self.canvas.create_oval(0, 0, 0, 0, outline=outline, width=width, fill="",
+                                                tags=("highlight", tag)))
+        item = pool[index]
+        self.canvas.coords(item, x - radius, y - radius, x + radius, y + radius)
+        self.canvas.itemconfig(item, state=tk.NORMAL)
     
     def draw_piece(self, row: int, col: int, piece: int):
-        """绘制棋子"""
+        """
+        更新格子上的棋子: 与已绘制的棋子相同时不做任何操作，不同时修改已有图元，
+        piece为0时删除该格子的图元
+        """
         if not self.canvas:
             return
-            
-        cell_size = 80
-        margin = 25
         
-        x = margin + col * cell_size + cell_size // 2
-        y = margin + row * cell_size + cell_size // 2
+        items = self._piece_items.get((row, col))
+        if items is not None and items[0] == piece:
+            return
+        if piece == 0:
+            if items is not None:
+                self.canvas.delete(*items[1:])
+                del self._piece_items[(row, col)]
+            return
+            
+        x, y = _CELL_CENTERS[row][col]
         radius = 28
         
         if 1 <= piece <= 6:  # 红方
@@ -430,19 +527,27 @@ class DualModeEinsteinGUI:
             text = str(piece - 6)
             outline_color = "#1976D2"
         
+        if items is not None:
+            _, shadow, body, label = items
+            self.canvas.itemconfig(body, fill=bg_color, outline=outline_color)
+            self.canvas.itemconfig(label, text=text, fill=text_color)
+            self._piece_items[(row, col)] = (piece, shadow, body, label)
+            return
+        
         # 阴影
-        self.canvas.create_oval(x - radius + 2, y - radius + 2, 
-                               x + radius + 2, y + radius + 2,
-                               fill="gray", outline="")
+        shadow = self.canvas.create_oval(x - radius + 2, y - radius + 2, 
+                                        x + radius + 2, y + radius + 2,
+                                        fill="gray", outline="")
         
         # 棋子主体
-        self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
-                               fill=bg_color, outline=outline_color, width=3,
-                               tags=f"piece_{row}_{col}")
+        body = self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
+                                      fill=bg_color, outline=outline_color, width=3,
+                                      tags=f"piece_{row}_{col}")
         
         # 编号
-        self.canvas.create_text(x, y, text=text, font=("Arial", 16, "bold"),
-                               fill=text_color, tags=f"piece_{row}_{col}")
+        label = self.canvas.create_text(x, y, text=text, font=("Arial", 16, "bold"),
+                                       fill=text_color, tags=f"piece_{row}_{col}")
+        self._piece_items[(row, col)] = (piece, shadow, body, label)
     
     def highlight_legal_moves(self):
         """高亮合法移动"""
@@ -451,23 +556,20 @@ class DualModeEinsteinGUI:
         
         if not self.canvas:
             return
-        cell_size = 80
-        margin = 25
-        
-        for move in self.legal_moves:
+        cells = self.board.tolist()
+        captures = 0
+        for index, move in enumerate(self.legal_moves):
             from_row, from_col, to_row, to_col = move
             
-            x = margin + to_col * cell_size + cell_size // 2
-            y = margin + to_row * cell_size + cell_size // 2
+            x, y = _CELL_CENTERS[to_row][to_col]
             
             # 绿色圆圈表示可移动
-            self.canvas.create_oval(x - 35, y - 35, x + 35, y + 35,
-                                   outline="green", width=4, fill="", tags="legal_move")
+            self._show_highlight(self._legal_items, index, x, y, 35, "legal_move", "green", 4)
             
             # 红色标记吃子
-            if self.board[to_row, to_col] != 0:
-                self.canvas.create_oval(x - 30, y - 30, x + 30, y + 30,
-                                       outline="red", width=3, fill="", tags="capture_move")
+            if cells[to_row][to_col] != 0:
+                self._show_highlight(self._capture_items, captures, x, y, 30, "capture_move", "red", 3)
+                captures += 1
     
     def highlight_selected_piece(self):
         """高亮选中棋子"""
@@ -476,47 +578,47 @@ class DualModeEinsteinGUI:
         if not self.canvas:
             return
         row, col = self.selected_piece
-        cell_size = 80
-        margin = 25
+        x, y = _CELL_CENTERS[row][col]
         
-        x = margin + col * cell_size + cell_size // 2
-        y = margin + row * cell_size + cell_size // 2
-        
-        self.canvas.create_oval(x - 35, y - 35, x + 35, y + 35,
-                               outline="yellow", width=4, fill="", tags="selected_piece")
+        self._show_highlight(self._selected_items, 0, x, y, 35, "selected_piece", "yellow", 4)
+    
+    def _xy_to_rc(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """把画布坐标转换为格子(row, col)，不在棋盘上时返回None"""
+        col = (x - MARGIN) // CELL_SIZE
+        row = (y - MARGIN) // CELL_SIZE
+        if 0 <= row < 5 and 0 <= col < 5:
+            return row, col
+        return None
     
     def on_board_click(self, event):
         """处理棋盘点击"""
         if not self.game_running or not self.is_human_turn():
             return
-            
-        cell_size = 80
-        margin = 25
         
-        col = (event.x - margin) // cell_size
-        row = (event.y - margin) // cell_size
-        
-        if 0 <= row < 5 and 0 <= col < 5:
-            self.handle_board_click(row, col)
+        cell = self._xy_to_rc(event.x, event.y)
+        if cell is not None:
+            self.handle_board_click(*cell)
     
     def on_mouse_motion(self, event):
         """鼠标移动提示"""
         if self.status_label is None:
             return
-            
-        cell_size = 80
-        margin = 25
         
-        col = (event.x - margin) // cell_size
-        row = (event.y - margin) // cell_size
-        
-        if 0 <= row < 5 and 0 <= col < 5:
-            piece = self.board[row, col]
+        cell = self._xy_to_rc(event.x, event.y)
+        if cell is not None:
+            row, col = cell
+            piece = int(self.board[row, col])
+            # 鼠标仍在同一格子且棋子没有变化时不更新状态栏(移动事件每个像素触发一次)
+            if self._last_hover == (row, col, piece):
+                return
+            self._last_hover = (row, col, piece)
             if piece != 0:
                 piece_name = f"红{piece}" if 1 <= piece <= 6 else f"蓝{piece-6}"
                 self.status_label.config(text=f"位置 ({row},{col}): {piece_name}")
             else:
                 self.status_label.config(text=f"位置 ({row},{col}): 空格")
+        else:
+            self._last_hover = None  # 离开棋盘后再次进入时重新显示提示
     
     def is_human_turn(self) -> bool:
         """检查是否是人类回合"""
@@ -528,12 +630,13 @@ class DualModeEinsteinGUI:
     
     def handle_board_click(self, row: int, col: int):
         """处理棋盘点击"""
-        piece = self.board[row, col]
+        piece = int(self.board[row, col])
         
         if piece != 0 and self.is_player_piece(piece, self.current_player):
             # 选择己方棋子
             self.selected_piece = (row, col)
             self.legal_moves = self.get_piece_legal_moves(row, col)
+            self._legal_move_set = frozenset(self.legal_moves)
             self.draw_board()
             
             if not self.legal_moves:
@@ -545,48 +648,64 @@ class DualModeEinsteinGUI:
             from_row, from_col = self.selected_piece
             move = (from_row, from_col, row, col)
             
-            if move in self.legal_moves:
+            if move in self._legal_move_set:
                 self.execute_human_move(move)
             else:
                 messagebox.showwarning("无效移动", "这不是一个合法的移动")
                 
             self.selected_piece = None
             self.legal_moves = []
+            self._legal_move_set = frozenset()
             self.draw_board()
     
     def is_player_piece(self, piece: int, player: int) -> bool:
-        """检查棋子是否属于指定玩家"""
-        if player == 1:  # 红方
-            return 1 <= piece <= 6
-        else:  # 蓝方
-            return 7 <= piece <= 12
+        """检查棋子是否属于指定玩家(1=红方, 其他=蓝方)"""
+        return piece in _PLAYER_PIECES[1 if player == 1 else -1]
+    
+    def get_turn_moves(self) -> Dict[Tuple[int, int], List[Tuple[int, int, int, int]]]:
+        """
+        获取当前回合的所有合法移动，按起始格子分组
+        结果以(棋盘, 骰子, 当前玩家)为键缓存，同一回合内多次点击棋子不会重复生成移动；
+        键包含棋盘内容，任何一方走棋、悔棋或重置后都会自动重新生成
+        """
+        key = (self.board.tobytes(), self.current_die, self.current_player)
+        if key != self._moves_cache_key:
+            moves_by_cell = {}
+            for move in self.game.get_legal_moves(self.board, self.current_die, self.current_player):
+                moves_by_cell.setdefault((move[0], move[1]), []).append(move)
+            self._moves_cache_key, self._moves_cache = key, moves_by_cell
+        return self._moves_cache
     
     def get_piece_legal_moves(self, row: int, col: int) -> List[Tuple[int, int, int, int]]:
         """获取棋子合法移动"""
-        all_moves = self.game.get_legal_moves(self.board, self.current_die, self.current_player)
-        return [move for move in all_moves if move[0] == row and move[1] == col]
+        return list(self.get_turn_moves().get((row, col), []))
+    
+    @staticmethod
+    def _validate_die_input(proposed: str) -> bool:
+        """骰子输入框的逐键校验: 修改后的内容只能为空或一位1-6的数字"""
+        return proposed == "" or (len(proposed) == 1 and "1" <= proposed <= "6")
     
     def confirm_dice(self):
         """确认骰子输入"""
         if not self.dice_entry or not self.status_label:
             return
+        
+        # 输入框已经逐键校验，内容只可能为空或1-6
+        text = self.dice_entry.get()
+        if not text:
+            messagebox.showerror("错误", "请输入骰子点数(1-6)")
+            return
+        
+        die_value = int(text)
+        self.current_die = die_value
+        if self.dice_display:
+            self.dice_display.config(text=str(die_value))
+        self.dice_entry.delete(0, tk.END)
+        
+        if self.is_human_turn():
+            self.process_human_turn()
             
-        try:
-            die_value = int(self.dice_entry.get())
-            if 1 <= die_value <= 6:
-                self.current_die = die_value
-                if self.dice_display:
-                    self.dice_display.config(text=str(die_value))
-                self.dice_entry.delete(0, tk.END)
-                
-                if self.is_human_turn():
-                    self.process_human_turn()
-                    
-                self.status_label.config(text=f"骰子: {die_value}, 请选择要移动的棋子")
-            else:
-                messagebox.showerror("错误", "骰子点数必须在1-6之间")
-        except ValueError:
-            messagebox.showerror("错误", "请输入有效的数字")
+        self.status_label.config(text=f"骰子: {die_value}, 请选择要移动的棋子")
     
     def random_dice(self):
         """随机生成骰子"""
@@ -614,13 +733,11 @@ class DualModeEinsteinGUI:
         move_record = {
             "player": self.current_player,
             "die": self.current_die,
-            "move": move,
-            "board_before": self.board.copy().tolist()
+            "move": move
         }
         
-        # 执行移动
-        self.board = self.game.make_move(self.board, move)
-        move_record["board_after"] = self.board.copy().tolist()
+        # 执行移动(原地修改棋盘，同时增量更新存活棋子统计)
+        self.state.make_move(move)
         
         # 添加到历史
         self.move_history.append(move_record)
@@ -631,11 +748,12 @@ class DualModeEinsteinGUI:
         self.update_game_display()
         
         # 检查游戏结束
-        if self.game.is_game_over(self.board):
+        if self.state.is_game_over():
             self.handle_game_over()
         else:
-            # 写入AI输入文件
-            self.write_ai_input_file()
+            # 文件通信模式下写入AI输入文件(常驻AI进程通过管道接收棋盘，不需要文件)
+            if not Config.AI_PERSISTENT_PROCESS:
+                self.write_ai_input_file()
             # 切换到AI回合
             self.switch_to_ai_turn()
     
@@ -657,8 +775,8 @@ class DualModeEinsteinGUI:
             return
         self.dice_entry.config(state=tk.DISABLED)
         
-        # 在新线程中执行AI
-        threading.Thread(target=self.execute_ai_turn, daemon=True).start()
+        # 在AI线程中执行(execute_ai_turn自行捕获异常并通过handle_ai_error报告)
+        self._ai_pool.submit(self.execute_ai_turn)
     
     def execute_ai_turn(self):
         """执行AI回合"""
@@ -668,72 +786,194 @@ class DualModeEinsteinGUI:
             # 生成AI骰子
             ai_die = random.randint(1, 6)
             
-            # 根据模式选择AI程序和文件
-            if self.game_mode == "human_vs_ai":
-                # 人机对弈: AI是蓝方，调用ai_blue.py
-                ai_script = "ai_blue.py"
-                input_file = Config.BLUE_INPUT_FILE   # JavaOut.txt
-                output_file = Config.BLUE_OUTPUT_FILE # JavaIn.txt
-            else:
-                # 机人对弈: AI是红方，调用ai_red.py
-                ai_script = "ai_red.py"
-                input_file = Config.RED_INPUT_FILE    # JavaOut1.txt
-                output_file = Config.RED_OUTPUT_FILE  # JavaIn1.txt
-            
-            # 确保目录存在
-            os.makedirs(os.path.dirname(input_file), exist_ok=True)
-            
-            # 写入AI输入文件
-            with open(input_file, 'w') as f:
-                f.write(f"{self.difficulty_level} {ai_die}\n")
-                for row in self.board:
-                    f.write(' '.join(map(str, row)) + '\n')
-            
             # 调用AI程序
             self.ai_status_label.config(text="调用AI程序...")
-            result = subprocess.run(['python', ai_script], 
-                                  capture_output=True, text=True, timeout=60)
+            ai_script = self.get_ai_script()
+            cache_key = (self.board.tobytes(), ai_die, self.current_player, self.difficulty_level)
+            new_board = self.get_cached_ai_move(cache_key)
+            if new_board is None:
+                if Config.AI_PERSISTENT_PROCESS:
+                    new_board = self.request_ai_move(ai_script, ai_die)
+                else:
+                    new_board = self.run_ai_script(ai_script, ai_die)
+                if new_board is not None:
+                    self.store_ai_move(cache_key, new_board)
             
-            if result.returncode == 0:
-                # 读取AI输出
-                if os.path.exists(output_file):
-                    new_board = self.read_ai_output(output_file)
+            if new_board is not None:
+                # 找到AI移动
+                ai_move = self.find_move_difference(self.board, new_board)
+                
+                if ai_move:
+                    # 记录AI移动
+                    move_record = {
+                        "player": self.current_player,
+                        "die": ai_die,
+                        "move": ai_move
+                    }
                     
-                    if new_board is not None:
-                        # 找到AI移动
-                        ai_move = self.find_move_difference(self.board, new_board)
-                        
-                        if ai_move:
-                            # 记录AI移动
-                            move_record = {
-                                "player": self.current_player,
-                                "die": ai_die,
-                                "move": ai_move,
-                                "board_before": self.board.copy().tolist(),
-                                "board_after": new_board.tolist()
-                            }
-                            
-                            self.board = new_board
-                            self.move_history.append(move_record)
-                            self.game_record["moves"].append(move_record)
-                            
-                            # 更新UI
-                            self.root.after(0, lambda: self.finish_ai_turn(ai_move, ai_die))
-                        else:
-                            self.root.after(0, lambda: self.handle_ai_error("AI未执行有效移动"))
-                    else:
-                        self.root.after(0, lambda: self.handle_ai_error("读取AI输出失败"))
+                    self.set_board(new_board)
+                    self.move_history.append(move_record)
+                    self.game_record["moves"].append(move_record)
+                    
+                    # 更新UI
+                    self.root.after(0, lambda: self.finish_ai_turn(ai_move, ai_die))
                 else:
-                    self.root.after(0, lambda: self.handle_ai_error("AI输出文件不存在"))
+                    self.root.after(0, lambda: self.handle_ai_error("AI未执行有效移动"))
             else:
-                error_msg = result.stderr or "AI程序执行失败"
-                self.root.after(0, lambda: self.handle_ai_error(error_msg))
+                self.root.after(0, lambda: self.handle_ai_error("读取AI输出失败"))
                 
         except subprocess.TimeoutExpired:
             self.root.after(0, lambda: self.handle_ai_error("AI响应超时"))
+        except RuntimeError as e:
+            error_msg = str(e)
+            self.root.after(0, lambda: self.handle_ai_error(error_msg))
         except Exception as e:
             self.root.after(0, lambda: self.handle_ai_error(f"AI执行错误: {str(e)}"))
     
+    def get_cached_ai_move(self, key: Tuple[bytes, int, int, int]) -> Optional[np.ndarray]:
+        """
+        查询AI决策缓存(悔棋后重走、重复出现的局面不再重新搜索)
+        
+        参数:
+            key: (棋盘字节, 骰子, 当前玩家, 难度)
+            
+        返回:
+            缓存的移动后棋盘(新数组，可以修改)，未命中时返回None
+        """
+        cached = self._ai_cache.get(key)
+        if cached is None:
+            return None
+        self._ai_cache.move_to_end(key)
+        return np.frombuffer(cached, dtype=np.int8).reshape(5, 5).copy()
+    
+    def store_ai_move(self, key: Tuple[bytes, int, int, int], new_board: np.ndarray):
+        """保存AI决策，超过Config.AI_CACHE_SIZE时淘汰最近最少使用的条目"""
+        self._ai_cache[key] = np.asarray(new_board, dtype=np.int8).tobytes()
+        self._ai_cache.move_to_end(key)
+        if len(self._ai_cache) > Config.AI_CACHE_SIZE:
+            self._ai_cache.popitem(last=False)
+    
+    def get_ai_script(self) -> str:
+        """根据模式选择AI程序: 人机对弈时AI是蓝方(ai_blue.py)，机人对弈时AI是红方(ai_red.py)"""
+        return "ai_blue.py" if self.game_mode == "human_vs_ai" else "ai_red.py"
+    
+    def start_ai_process(self, ai_script: str) -> subprocess.Popen:
+        """
+        启动常驻AI进程(python <ai_script> --serve)，同一AI程序的进程仍在运行时直接复用
+        整局游戏只启动一次解释器，之后每步只通过管道交换一行请求和一行结果
+        
+        参数:
+            ai_script: AI程序文件名
+            
+        返回:
+            AI进程
+        """
+        proc = self.ai_proc
+        if proc is not None and proc.poll() is None and self.ai_proc_script == ai_script:
+            return proc
+        
+        self.stop_ai_process()
+        # 标准错误不重定向(AI的日志输出到GUI的控制台)，避免管道写满后阻塞AI进程
+        self.ai_proc = subprocess.Popen([sys.executable, '-u', ai_script, '--serve'],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True, bufsize=1)
+        self.ai_proc_script = ai_script
+        return self.ai_proc
+    
+    def stop_ai_process(self):
+        """结束常驻AI进程(关闭标准输入后AI进程自行退出，未及时退出时强制结束)"""
+        proc, self.ai_proc = self.ai_proc, None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+    
+    def reset_ai_process(self):
+        """通知常驻AI进程开始新的一局(进程不存在时先启动)，AI清空上一局保留的置换表"""
+        proc = self.start_ai_process(self.get_ai_script())
+        try:
+            proc.stdin.write(f"{FileHandler.RESET_REQUEST}\n")
+            proc.stdin.flush()
+        except OSError:
+            self.stop_ai_process()  # 下一步请求时重新启动
+    
+    def request_ai_move(self, ai_script: str, ai_die: int) -> Optional[np.ndarray]:
+        """
+        通过常驻AI进程计算一步移动
+        
+        参数:
+            ai_script: AI程序文件名
+            ai_die: 骰子点数
+            
+        返回:
+            AI移动后的棋盘，输出格式错误时返回None
+        """
+        proc = self.start_ai_process(ai_script)
+        request = f"{self.difficulty_level} {ai_die}\n{FileHandler.format_board_line(self.board)}\n"
+        
+        # 超时后结束AI进程，readline随即返回空字符串；记录超时，与AI进程自行退出区分
+        timed_out = threading.Event()
+        
+        def on_timeout():
+            timed_out.set()
+            proc.kill()
+        
+        timer = threading.Timer(Config.AI_TIMEOUT, on_timeout)
+        timer.start()
+        try:
+            proc.stdin.write(request)
+            proc.stdin.flush()
+            line = proc.stdout.readline()
+        except OSError:
+            line = ""
+        finally:
+            timer.cancel()
+        
+        if not line:
+            self.stop_ai_process()
+            if timed_out.is_set():
+                raise subprocess.TimeoutExpired(ai_script, Config.AI_TIMEOUT)
+            raise RuntimeError("AI进程无响应或已退出")
+        
+        cells = line.split()
+        if len(cells) != 25:
+            return None
+        return np.array(list(map(int, cells)), dtype=np.int8).reshape(5, 5)
+    
+    def run_ai_script(self, ai_script: str, ai_die: int) -> Optional[np.ndarray]:
+        """
+        每步单独启动AI程序并通过文件通信(Config.AI_PERSISTENT_PROCESS为False时使用，便于调试)
+        
+        参数:
+            ai_script: AI程序文件名
+            ai_die: 骰子点数
+            
+        返回:
+            AI移动后的棋盘，读取失败时返回None
+        """
+        if ai_script == "ai_blue.py":
+            input_file = Config.BLUE_INPUT_FILE   # JavaOut.txt
+            output_file = Config.BLUE_OUTPUT_FILE # JavaIn.txt
+        else:
+            input_file = Config.RED_INPUT_FILE    # JavaOut1.txt
+            output_file = Config.RED_OUTPUT_FILE  # JavaIn1.txt
+        
+        # 写入AI输入文件(目录在__init__中已创建)
+        FileHandler.write_text_atomic(
+            input_file, f"{self.difficulty_level} {ai_die}\n" + FileHandler.format_board_text(self.board))
+        
+        result = subprocess.run([sys.executable, ai_script],
+                              capture_output=True, text=True, timeout=Config.AI_TIMEOUT)
+        
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr or "AI程序执行失败")
+        if not os.path.exists(output_file):
+            raise RuntimeError("AI输出文件不存在")
+        return self.read_ai_output(output_file)
+    
     def finish_ai_turn(self, ai_move: Tuple[int, int, int, int], ai_die: int):
         """完成AI回合"""
         # 更新显示
@@ -745,7 +985,7 @@ class DualModeEinsteinGUI:
         self.ai_status_label.config(text="AI移动完成")
         
         # 检查游戏结束
-        if self.game.is_game_over(self.board):
+        if self.state.is_game_over():
             self.handle_game_over()
         else:
             # 切换回人类回合
@@ -792,53 +1032,56 @@ class DualModeEinsteinGUI:
                 # 机人对弈: 人类走完后给红方AI
                 input_file = Config.RED_INPUT_FILE   # JavaOut1.txt
             
-            os.makedirs(os.path.dirname(input_file), exist_ok=True)
-            
-            with open(input_file, 'w') as f:
-                f.write(f"{self.difficulty_level} 0\n")  # 骰子由AI生成
-                for row in self.board:
-                    f.write(' '.join(map(str, row)) + '\n')
+            # 整个文件拼成一个字符串后一次原子写入(目录在__init__中已创建)
+            FileHandler.write_text_atomic(
+                input_file, f"{self.difficulty_level} 0\n"  # 骰子由AI生成
+                + FileHandler.format_board_text(self.board))
                     
         except Exception as e:
             print(f"写入AI输入文件错误: {e}")
     
     def read_ai_output(self, output_file: str) -> Optional[np.ndarray]:
-        """读取AI输出文件"""
+        """读取AI输出文件(AI用np.savetxt写出5行5列，由numpy一次性读入int8数组)"""
         try:
-            with open(output_file, 'r') as f:
-                lines = f.readlines()
-            
-            board = []
-            for line in lines:
-                row = list(map(int, line.strip().split()))
-                if len(row) == 5:
-                    board.append(row)
-            
-            if len(board) == 5:
-                return np.array(board, dtype=int)
-            else:
-                return None
-                
+            board = np.loadtxt(output_file, dtype=np.int8, ndmin=2)
         except Exception as e:
             print(f"读取AI输出错误: {e}")
             return None
+        
+        if board.shape != (5, 5):
+            return None
+        return board
     
     def find_move_difference(self, old_board: np.ndarray, new_board: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
-        """找到棋盘变化对应的移动"""
-        diff = old_board - new_board
+        """
+        找到棋盘变化对应的移动
+        一次移动恰好改变两个格子: 起始格子变空，目标格子变为移动的棋子(可能吃掉了原来的棋子)
+        棋盘只有25格，转成Python列表直接比较比numpy逐元素运算的调用开销更小
         
-        disappeared = np.where(diff > 0)
-        appeared = np.where(diff < 0)
+        返回:
+            (from_row, from_col, to_row, to_col)，不是一次合法形式的移动时返回None
+        """
+        old_cells = old_board.ravel().tolist()
+        new_cells = new_board.ravel().tolist()
+        changed = [cell for cell in range(25) if old_cells[cell] != new_cells[cell]]
+        if len(changed) != 2:
+            return None
         
-        if len(disappeared[0]) == 1 and len(appeared[0]) == 1:
-            from_row, from_col = disappeared[0][0], disappeared[1][0]
-            to_row, to_col = appeared[0][0], appeared[1][0]
-            return (from_row, from_col, to_row, to_col)
+        from_cell, to_cell = changed
+        if new_cells[from_cell] != 0:  # 行优先顺序下目标格子在前
+            from_cell, to_cell = to_cell, from_cell
         
-        return None
+        piece = old_cells[from_cell]
+        if piece == 0 or new_cells[from_cell] != 0 or new_cells[to_cell] != piece:
+            return None
+        return divmod(from_cell, 5) + divmod(to_cell, 5)
     
     def add_move_to_history(self, move: Tuple[int, int, int, int], player: int, die: int):
-        """添加移动到历史记录"""
+        """添加移动到历史记录(移动已加入self.move_history，编号为当前步数)"""
+        self._append_history_lines([self._format_history_line(len(self.move_history), move, player, die)])
+    
+    def _format_history_line(self, number: int, move: Tuple[int, int, int, int], player: int, die: int) -> str:
+        """生成第number步移动的历史记录文本(含换行)"""
         from_row, from_col, to_row, to_col = move
         
         if player == 1:
@@ -854,13 +1097,30 @@ class DualModeEinsteinGUI:
             else:
                 player_type = "(人类)"
         
-        move_text = f"{len(self.move_history)}. {player_name}{player_type}(骰子{die}): ({from_row},{from_col})→({to_row},{to_col})\n"
+        return f"{number}. {player_name}{player_type}(骰子{die}): ({from_row},{from_col})→({to_row},{to_col})\n"
+    
+    def _append_history_lines(self, lines: List[str]):
+        """
+        把若干条历史记录加入队列，空闲时一次性写入文本框(见_flush_history)
+        重播棋谱、悔棋时整个列表一次加入，文本框只插入一次
+        """
         if not self.history_text:
             return
+        self._pending_history.extend(lines)
+        if not self._history_flush_scheduled:
+            self._history_flush_scheduled = True
+            self.root.after_idle(self._flush_history)
+    
+    def _flush_history(self):
+        """把排队的历史记录一次性写入文本框"""
+        self._history_flush_scheduled = False
+        if not self._pending_history or not self.history_text:
+            return
         self.history_text.config(state=tk.NORMAL)
-        self.history_text.insert(tk.END, move_text)
+        self.history_text.insert(tk.END, "".join(self._pending_history))
         self.history_text.see(tk.END)
         self.history_text.config(state=tk.DISABLED)
+        self._pending_history.clear()
     
     def update_game_display(self):
         """更新游戏显示"""
@@ -869,15 +1129,15 @@ class DualModeEinsteinGUI:
     
     def update_piece_count(self):
         """更新棋子统计"""
-        red_count = int(np.sum((self.board >= 1) & (self.board <= 6)))
-        blue_count = int(np.sum((self.board >= 7) & (self.board <= 12)))
+        red_count = self.state.red_count
+        blue_count = self.state.blue_count
         
         self.red_count_label.config(text=f"红方: {red_count}")
         self.blue_count_label.config(text=f"蓝方: {blue_count}")
     
     def handle_game_over(self):
         """处理游戏结束"""
-        winner = self.game.get_winner(self.board)
+        winner = self.state.get_winner()
         self.game_running = False
         
         # 更新游戏记录
@@ -926,6 +1186,13 @@ class DualModeEinsteinGUI:
         self.game_running = True
         self.game_status_label.config(text="游戏开始")
         
+        # 新的一局不复用上一局的AI决策
+        self._ai_cache.clear()
+        
+        # 提前启动常驻AI进程，AI的第一步不必等待解释器启动和模块导入
+        if Config.AI_PERSISTENT_PROCESS:
+            self.reset_ai_process()
+        
         # 初始化游戏记录
         mode_name = "人机对弈" if self.game_mode == "human_vs_ai" else "机人对弈"
         self.game_record = {
@@ -934,7 +1201,8 @@ class DualModeEinsteinGUI:
                 "difficulty": self.difficulty_level,
                 "mode": mode_name,
                 "human_player": "红方" if self.human_player == 1 else "蓝方",
-                "ai_player": "蓝方" if self.ai_player == -1 else "红方"
+                "ai_player": "蓝方" if self.ai_player == -1 else "红方",
+                "initial_board": self.initial_board.tolist()
             },
             "moves": []
         }
@@ -971,6 +1239,7 @@ class DualModeEinsteinGUI:
         # 清空历史
         if not self.history_text:
             return
+        self._pending_history.clear()
         self.history_text.config(state=tk.NORMAL)
         self.history_text.delete(1.0, tk.END)
         self.history_text.config(state=tk.DISABLED)
@@ -982,19 +1251,36 @@ class DualModeEinsteinGUI:
     
     def setup_initial_board(self):
         """设置初始棋盘布局"""
-        self.board = np.array([
-            [0, 0, 0, 11, 12],
-            [0, 10, 0, 0, 0],
-            [0, 0, 9, 8, 0],
-            [0, 7, 0, 0, 0],
-            [1, 2, 3, 4, 5]
-        ])
+        board = _INITIAL_BOARD_TEMPLATE.copy()
         
         # 随机放置第6个蓝方棋子
-        empty_positions = [(i, j) for i in range(5) for j in range(5) if self.board[i, j] == 0]
-        if empty_positions:
-            pos = random.choice(empty_positions)
-            self.board[pos[0], pos[1]] = 6
+        board[random.choice(_INITIAL_EMPTY_CELLS)] = 6
+        self.initial_board = board.copy()
+        self.set_board(board)
+    
+    def set_board(self, board: np.ndarray):
+        """
+        替换当前棋盘，并重新建立增量统计(self.state)
+        之后的移动通过self.state.make_move原地修改棋盘，胜负判断和棋子计数不再扫描棋盘
+        """
+        self.board = board
+        self.state = GameState.from_board(board)
+    
+    def board_after_moves(self, count: int) -> np.ndarray:
+        """
+        从起始局面重放前count步移动，得到当时的棋盘
+        移动记录只保存玩家、骰子和移动，需要历史局面时按需重放
+        
+        参数:
+            count: 重放的移动数
+            
+        返回:
+            新的棋盘数组
+        """
+        board = self.initial_board.copy()
+        for move_record in self.move_history[:count]:
+            self.game.make_move_inplace(board, move_record["move"])
+        return board
     
     def undo_move(self):
         """悔棋功能"""
@@ -1009,14 +1295,13 @@ class DualModeEinsteinGUI:
         last_move = self.move_history.pop()
         self.game_record["moves"].pop()
         
-        # 恢复棋盘状态
-        self.board = np.array(last_move["board_before"])
-        
         # 如果悔棋的是AI移动，再悔棋一步人类移动
         if last_move["player"] != self.human_player and self.move_history:
-            prev_move = self.move_history.pop()
+            self.move_history.pop()
             self.game_record["moves"].pop()
-            self.board = np.array(prev_move["board_before"])
+        
+        # 恢复棋盘状态
+        self.set_board(self.board_after_moves(len(self.move_history)))
         
         # 重置到人类回合
         self.switch_to_human_turn()
@@ -1025,14 +1310,13 @@ class DualModeEinsteinGUI:
         # 更新历史显示
         if not self.history_text:
             return
+        self._pending_history.clear()
         self.history_text.config(state=tk.NORMAL)
         self.history_text.delete(1.0, tk.END)
-        for i, move_record in enumerate(self.move_history):
-            move = move_record["move"]
-            player = move_record["player"]
-            die = move_record["die"]
-            self.add_move_to_history(move, player, die)
         self.history_text.config(state=tk.DISABLED)
+        self._append_history_lines([
+            self._format_history_line(i + 1, record["move"], record["player"], record["die"])
+            for i, record in enumerate(self.move_history)])
     
     def save_game_record(self):
         """保存棋谱"""
@@ -1048,8 +1332,14 @@ class DualModeEinsteinGUI:
         
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(self.game_record, f, indent=2, ensure_ascii=False)
+                # 安装了orjson时使用orjson，否则使用标准库json，都是生成完整内容后一次写入
+                if orjson is not None:
+                    data = orjson.dumps(self.game_record, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+                                        | orjson.OPT_APPEND_NEWLINE)
+                else:
+                    data = json.dumps(self.game_record, indent=2, ensure_ascii=False).encode('utf-8')
+                with open(filename, 'wb') as f:
+                    f.write(data)
                 messagebox.showinfo("保存成功", f"棋谱已保存到: {filename}")
                 if not self.status_label:
                     return
@@ -1070,15 +1360,16 @@ class DualModeEinsteinGUI:
         
         if filename:
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    loaded_record = json.load(f)
+                with open(filename, 'rb') as f:
+                    data = f.read()
+                loaded_record = orjson.loads(data) if orjson is not None else json.loads(data)
                 
                 # 重置游戏
                 self.reset_game()
                 
                 # 加载游戏记录
                 self.game_record = loaded_record
-                self.move_history = loaded_record["moves"]
+                self.move_history = list(loaded_record["moves"])
                 
                 # 恢复模式设置
                 if "mode" in loaded_record["game_info"]:
@@ -1101,23 +1392,34 @@ class DualModeEinsteinGUI:
     
     def replay_moves(self):
         """重播移动"""
-        self.setup_initial_board()
+        game_info = self.game_record.get("game_info", {})
+        if "initial_board" in game_info:
+            self.initial_board = np.array(game_info["initial_board"], dtype=np.int8)
+        elif self.move_history and "board_before" in self.move_history[0]:
+            # 旧版棋谱没有起始局面，但每步都带有棋盘快照
+            self.initial_board = np.array(self.move_history[0]["board_before"], dtype=np.int8)
+        else:
+            self.setup_initial_board()
+        self.set_board(self.initial_board.copy())
         
-        for move_record in self.move_history:
+        history_lines = []
+        for i, move_record in enumerate(self.move_history):
             move = move_record["move"]
             player = move_record["player"]
             die = move_record["die"]
             
-            # 执行移动
-            self.board = self.game.make_move(self.board, move)
+            # 执行移动(self.board是起始局面的副本，直接原地修改)
+            self.state.make_move(move)
             
-            # 添加到历史显示
-            self.add_move_to_history(move, player, die)
+            history_lines.append(self._format_history_line(i + 1, move, player, die))
+        
+        # 所有移动的历史记录一次加入
+        self._append_history_lines(history_lines)
         
         self.update_game_display()
         
         # 检查游戏状态
-        if self.game.is_game_over(self.board):
+        if self.state.is_game_over():
             self.handle_game_over()
         else:
             self.game_running = True
@@ -1138,8 +1440,7 @@ class DualModeEinsteinGUI:
         if filename:
             try:
                 with open(filename, 'w') as f:
-                    for row in self.board:
-                        f.write(' '.join(map(str, row)) + '\n')
+                    f.write(FileHandler.format_board_text(self.board))
                 messagebox.showinfo("导出成功", f"棋盘已导出到: {filename}")
             except Exception as e:
                 messagebox.showerror("导出失败", f"导出棋盘时出错: {str(e)}")
@@ -1153,17 +1454,16 @@ class DualModeEinsteinGUI:
         
         if filename:
             try:
-                with open(filename, 'r') as f:
-                    lines = f.readlines()
+                # 整个文件由numpy一次读入并解析
+                board = np.loadtxt(filename, dtype=np.int8, ndmin=2)
                 
-                board = []
-                for line in lines:
-                    row = list(map(int, line.strip().split()))
-                    if len(row) == 5:
-                        board.append(row)
-                
-                if len(board) == 5:
-                    self.board = np.array(board, dtype=int)
+                if board.shape == (5, 5):
+                    self.set_board(board)
+                    # 导入的棋盘作为新的起始局面，之前的移动不能再从这里重放
+                    self.initial_board = self.board.copy()
+                    self.move_history = []
+                    self.game_record["moves"] = []
+                    self.game_record["game_info"]["initial_board"] = self.initial_board.tolist()
                     self.update_game_display()
                     messagebox.showinfo("导入成功", f"棋盘已从 {filename} 导入")
                 else:
@@ -1254,12 +1554,17 @@ class DualModeEinsteinGUI:
             if not messagebox.askyesno("确认退出", "游戏正在进行，确定要退出吗？"):
                 return
         
+        self.stop_ai_process()
         self.root.quit()
         self.root.destroy()
     
     def run(self):
         """运行主程序"""
         self.root.mainloop()
+        
+        # 窗口关闭后结束AI进程，正在等待AI结果的线程随即返回，程序不必等到本步搜索结束
+        self.stop_ai_process()
+        self._ai_pool.shutdown(wait=False, cancel_futures=True)
 
 
 def main():
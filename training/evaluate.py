@@ -5,11 +5,16 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
 import torch
 import numpy as np
-from training.neural_network import EinsteinNet
+from training.neural_network import EinsteinNet, select_device
 from shared.game_engine import EinsteinGame
 from shared.mcts import MCTS
 import random
 
+# 评估对局的初始棋盘: 红方1-6在左上角，蓝方7-12在右下角，每局复制一份
+_INITIAL_BOARD = np.zeros((5, 5), dtype=np.int8)
+_INITIAL_BOARD[tuple(np.array([(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (2, 0)]).T)] = np.arange(1, 7)
+_INITIAL_BOARD[tuple(np.array([(2, 4), (3, 3), (3, 4), (4, 2), (4, 3), (4, 4)]).T)] = np.arange(7, 13)
+
 class AIEvaluator:
     def __init__(self, model_path=None):
         self.game = EinsteinGame()
@@ -17,12 +22,22 @@ class AIEvaluator:
         
         if model_path and os.path.exists(model_path):
             self.neural_net.load_state_dict(torch.load(model_path, map_location='cpu'))
-            self.neural_net.eval()
             print(f"Loaded model from {model_path}")
         else:
             print("Using random initialization")
         
+        # 评估时只做推理: 关闭Dropout和BN统计更新，并把每个BN层融合进前面的卷积层
+        self.neural_net.eval()
+        self.neural_net = torch.ao.quantization.fuse_modules(
+            self.neural_net, [['conv1', 'bn1'], ['conv2', 'bn2'], ['conv3', 'bn3']])
+        
+        # 有GPU(CUDA/MPS)时在GPU上推理，输入张量需传入同一设备(见state_to_tensor的device参数)
+        self.device = select_device()
+        self.neural_net.to(self.device)
+        print(f"Using device: {self.device}")
+        
         self.mcts = MCTS(self.game, self.neural_net, num_simulations=1000)
+        self.rng = np.random.default_rng()  # 掷骰子用，每局一次生成全部点数
     
     def play_vs_random(self, ai_player=1, num_games=50):
         """AI vs 随机玩家"""
@@ -34,27 +49,33 @@ class AIEvaluator:
             current_player = 1
             move_count = 0
             max_moves = 200
+            dice = self.rng.integers(1, 7, size=max_moves).tolist()
             
-            while not self.game.is_terminal(board) and move_count < max_moves:
-                die = random.randint(1, 6)
+            # 终局判断只在棋盘变化后重新计算一次，循环条件和最终结果共用
+            terminal = self.game.is_terminal(board)
+            while not terminal and move_count < max_moves:
+                die = dice[move_count]
                 
                 if current_player == ai_player:
                     # AI回合
-                    best_action = self.mcts.search(board, die, current_player)
+                    with torch.inference_mode():  # 搜索中不记录自动求导信息
+                        best_action = self.mcts.search(board, die, current_player)
                     if best_action is not None:
                         board = self.game.apply_action(board, best_action, die, current_player)
+                        terminal = self.game.is_terminal(board)
                 else:
                     # 随机玩家回合
                     legal_actions = self.game.get_legal_actions(board, die, current_player)
                     if legal_actions:
                         action = random.choice(legal_actions)
                         board = self.game.apply_action(board, action, die, current_player)
+                        terminal = self.game.is_terminal(board)
                 
                 current_player = -current_player
                 move_count += 1
             
             # 判断结果
-            if self.game.is_terminal(board):
+            if terminal:
                 reward = self.game.get_reward(board, ai_player)
                 if reward > 0:
                     wins += 1
@@ -72,19 +93,7 @@ class AIEvaluator:
     
     def _get_initial_board(self):
         """获取初始棋盘"""
-        board = np.zeros((5, 5), dtype=int)
-        
-        # 红方
-        red_positions = [(0,0), (0,1), (0,2), (1,0), (1,1), (2,0)]
-        for i, pos in enumerate(red_positions):
-            board[pos] = i + 1
-        
-        # 蓝方
-        blue_positions = [(2,4), (3,3), (3,4), (4,2), (4,3), (4,4)]
-        for i, pos in enumerate(blue_positions):
-            board[pos] = i + 7
-        
-        return board
+        return _INITIAL_BOARD.copy()
 
 def evaluate_model(model_path, num_games=100):
     """评估模型性能"""
@@ -1,4 +1,7 @@
 """神经网络模型"""
+import functools
+from typing import Optional
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -46,7 +49,7 @@ class EinsteinNet(nn.Module):
         x = F.relu(self.bn3(self.conv3(x)))
         
         # 展平
-        x = x.view(x.size(0), -1)
+        x = torch.flatten(x, 1)
         
         # 公共特征
         x = F.relu(self.fc_common(x))
@@ -57,15 +60,43 @@ class EinsteinNet(nn.Module):
         
         return policy, value
 
-def state_to_tensor(board: np.ndarray, die: int, player: int) -> torch.Tensor:
-    """将游戏状态转换为神经网络输入"""
-    # 创建4个通道
-    red_channel = ((board >= 1) & (board <= 6)).astype(np.float32)
-    blue_channel = ((board >= 7) & (board <= 12)).astype(np.float32)
-    die_channel = np.full((5, 5), die / 6.0, dtype=np.float32)
-    player_channel = np.full((5, 5), (player + 1) / 2.0, dtype=np.float32)
+# 棋子编号 -> (红方通道, 蓝方通道)的查找表，按棋盘一次取表即可得到两个通道
+_PIECE_CHANNELS = np.zeros((2, 13), dtype=np.float32)
+_PIECE_CHANNELS[0, 1:7] = 1.0
+_PIECE_CHANNELS[1, 7:13] = 1.0
+
+def select_device() -> torch.device:
+    """选择推理设备: 优先CUDA，其次Apple MPS，否则CPU"""
+    if torch.cuda.is_available():
+        return torch.device('cuda')
+    mps = getattr(torch.backends, 'mps', None)
+    if mps is not None and mps.is_available():
+        return torch.device('mps')
+    return torch.device('cpu')
+
+@functools.lru_cache(maxsize=100_000)
+def _cached_state_tensor(board_bytes: bytes, die: int, player: int) -> torch.Tensor:
+    """按(棋盘字节, 骰子, 玩家)缓存的输入张量，搜索中重复出现的局面只构造一次"""
+    board = np.frombuffer(board_bytes, dtype=np.int8).reshape(5, 5)
+    state_tensor = np.empty((1, 4, 5, 5), dtype=np.float32)
     
-    # 堆叠通道
-    state_tensor = np.stack([red_channel, blue_channel, die_channel, player_channel])
+    # 红方/蓝方通道由一次查表直接写入预先分配的数组，不生成中间的比较结果
+    np.take(_PIECE_CHANNELS, board, axis=1, out=state_tensor[0, :2])
+    state_tensor[0, 2] = die / 6.0
+    state_tensor[0, 3] = (player + 1) / 2.0
     
-    return torch.FloatTensor(state_tensor).unsqueeze(0)
\ No newline at end of file
+    # from_numpy与数组共享内存，不再复制
+    return torch.from_numpy(state_tensor)
+
+def state_to_tensor(board: np.ndarray, die: int, player: int,
+                    device: Optional[torch.device] = None) -> torch.Tensor:
+    """
+    将游戏状态转换为神经网络输入
+    结果会被缓存并在相同局面间共享，调用方不要原地修改返回的张量
+    给出device时返回该设备上的副本(缓存始终保存在CPU上)
+    """
+    board_bytes = np.ascontiguousarray(board, dtype=np.int8).tobytes()
+    tensor = _cached_state_tensor(board_bytes, int(die), int(player))
+    if device is not None:
+        tensor = tensor.to(device, non_blocking=True)
+    return tensor
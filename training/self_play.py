@@ -3,9 +3,11 @@
 通过AI自我对战生成训练数据
 """
 
+import multiprocessing
 import numpy as np
-import random
-from typing import List, Tuple
+import torch
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,37 +16,123 @@ from shared.game_engine import GameEngine
 from training.neural_network import NeuralNetwork
 from shared.mcts import MCTS
 from shared.config import Config
+from core.logger import log
+
+# 训练数据写入磁盘时每隔多少局刷新一次
+FLUSH_INTERVAL = 10
+
+# 一局自对弈最多记录的局面数，超过后按平局结束
+MAX_GAME_STATES = 201
+
+# 初始布局中红方(左上角)和蓝方(右下角)的格子，按(行数组, 列数组)存放，可直接用于花式索引
+_RED_POSITIONS = tuple(np.array([(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (2, 0)]).T)
+_BLUE_POSITIONS = tuple(np.array([(4, 4), (4, 3), (4, 2), (3, 4), (3, 3), (2, 4)]).T)
+
+
+def _data_paths(output_path: str) -> Tuple[str, str, str, str]:
+    """训练数据文件路径: (boards, players, rewards, 样本数)"""
+    return tuple(f"{output_path}.{name}.npy" for name in ("boards", "players", "rewards", "count"))
+
+
+def load_training_data(output_path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    以只读内存映射方式加载SelfPlay写入磁盘的训练数据，数据由操作系统按需从磁盘调入
+    
+    参数:
+        output_path: 与SelfPlay的output_path相同
+    
+    返回:
+        (boards, players, rewards)，只包含已写入的样本
+    """
+    boards_path, players_path, rewards_path, count_path = _data_paths(output_path)
+    count = int(np.load(count_path))
+    return tuple(np.load(path, mmap_mode='r')[:count]
+                 for path in (boards_path, players_path, rewards_path))
+
+
+# 工作进程内的自对弈实例(每个进程一个，跨对局复用MCTS)
+_worker_self_play: Optional["SelfPlay"] = None
+
+
+def _init_worker(model: NeuralNetwork) -> None:
+    """进程池初始化函数 - 每个子进程启动时执行一次，用收到的模型创建本进程的自对弈实例"""
+    global _worker_self_play
+    _worker_self_play = SelfPlay(model)
+
+
+def _init_shared_worker(model_cls: type, shared_weights: Dict[str, torch.Tensor]) -> None:
+    """
+    共享参数时的进程池初始化函数 - 在CPU上创建网络和自对弈实例
+    网络直接使用共享内存中的参数(assign=True不复制)，主进程原地更新后各进程立即可见
+    """
+    torch.set_num_threads(1)  # 每个进程单线程推理，避免多个进程争抢CPU核心
+    model = model_cls()
+    model.load_state_dict(shared_weights, assign=True)
+    model.eval()
+    _init_worker(model)
+
+
+def _play_one(_game_num: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """在工作进程中进行一局自对弈(参数只用于进程池分发)"""
+    return _worker_self_play.play_game()
+
 
 class SelfPlay:
     """自对弈训练类"""
     
-    def __init__(self, model: NeuralNetwork):
+    def __init__(self, model: NeuralNetwork, output_path: Optional[str] = None,
+                 max_samples: int = 200_000):
+        """
+        参数:
+            model: 神经网络模型
+            output_path: 训练数据文件前缀，给出时数据写入磁盘上的内存映射文件而不是保存在内存中
+            max_samples: 写入磁盘时最多保存的样本数
+        """
         self.model = model
         self.game_engine = GameEngine()
         self.mcts = MCTS(model, self.game_engine, Config.MCTS_SIMULATIONS)
+        self.rng = np.random.default_rng()  # 初始布局和掷骰子用
         
-    def play_game(self) -> List[Tuple[np.ndarray, int, float]]:
+        self.output_path = output_path
+        self._top = 0  # 已写入磁盘的样本数
+        if output_path:
+            boards_path, players_path, rewards_path, _ = _data_paths(output_path)
+            open_memmap = np.lib.format.open_memmap
+            self.boards = open_memmap(boards_path, mode='w+', dtype=np.int8, shape=(max_samples, 5, 5))
+            self.players = open_memmap(players_path, mode='w+', dtype=np.int8, shape=(max_samples,))
+            self.rewards = open_memmap(rewards_path, mode='w+', dtype=np.float32, shape=(max_samples,))
+        
+        # 跨generate_training_data调用保留的进程池和共享内存中的参数(见_get_executor)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._shared_weights: Optional[Dict[str, torch.Tensor]] = None
+        
+    def play_game(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
         进行一局自对弈
-        返回: [(board_state, player, result), ...]
+        返回: (boards, players, rewards)，第i项对应第i个局面 (见_assign_rewards)
         """
         # 初始化棋盘
         board = self._initialize_board()
-        game_history = []
+        # 历史局面和对应的走棋方分别存放，结束时一次性转换为数组
+        boards_list = []
+        players_list = []
         current_player = 0  # 0=红方先手
+        # 整局的骰子点数一次生成(每个记录的局面掷一次)
+        dice = self.rng.integers(1, 7, size=MAX_GAME_STATES).tolist()
         
         while True:
             # 检查游戏是否结束
             is_over, winner = self.game_engine.is_game_over(board)
             if is_over:
                 # 为历史记录分配奖励
-                return self._assign_rewards(game_history, winner)
+                return self._assign_rewards(boards_list, players_list, winner)
             
             # 记录当前状态
-            game_history.append((board.copy(), current_player, 0.0))
+            boards_list.append(board.copy())
+            players_list.append(current_player)
             
             # 投掷骰子
-            die = random.randint(1, 6)
+            die = dice[len(boards_list) - 1]
             
             # 获取当前玩家的棋子
             if current_player == 0:
@@ -61,65 +149,136 @@ class SelfPlay:
             current_player = 1 - current_player
             
             # 防止无限循环
-            if len(game_history) > 200:
+            if len(boards_list) >= MAX_GAME_STATES:
                 break
         
         # 如果游戏太长，返回平局
-        return self._assign_rewards(game_history, None)
+        return self._assign_rewards(boards_list, players_list, None)
     
     def _initialize_board(self) -> np.ndarray:
         """初始化棋盘（随机布局）"""
-        board = np.zeros((5, 5), dtype=int)
-        
-        # 红方棋子位置（左上角区域）
-        red_positions = [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (2, 0)]
-        red_pieces = list(range(1, 7))
-        random.shuffle(red_pieces)
+        board = np.zeros((5, 5), dtype=np.int8)
         
-        for i, pos in enumerate(red_positions):
-            board[pos[0]][pos[1]] = red_pieces[i]
+        # 红方棋子1-6（左上角区域）随机排列，一次花式索引赋值
+        board[_RED_POSITIONS] = self.rng.permutation(6) + 1
         
-        # 蓝方棋子位置（右下角区域）
-        blue_positions = [(4, 4), (4, 3), (4, 2), (3, 4), (3, 3), (2, 4)]
-        blue_pieces = list(range(7, 13))
-        random.shuffle(blue_pieces)
-        
-        for i, pos in enumerate(blue_positions):
-            board[pos[0]][pos[1]] = blue_pieces[i]
+        # 蓝方棋子7-12（右下角区域）
+        board[_BLUE_POSITIONS] = self.rng.permutation(6) + 7
         
         return board
     
-    def _assign_rewards(self, game_history: List[Tuple[np.ndarray, int, float]], 
-                       winner: int) -> List[Tuple[np.ndarray, int, float]]:
-        """为游戏历史分配奖励"""
-        if winner is None:
-            # 平局
-            return [(board, player, 0.0) for board, player, _ in game_history]
+    def _assign_rewards(self, boards_list: List[np.ndarray], players_list: List[int],
+                       winner: Optional[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        为游戏历史分配奖励：获胜方+1，失败方-1，平局(winner为None)全部为0
         
-        # 分配奖励：获胜方+1，失败方-1
-        result = []
-        for board, player, _ in game_history:
-            if player == winner:
-                reward = 1.0
+        返回:
+            (boards, players, rewards): (N, 5, 5)的int8棋盘、(N,)的int8走棋方、(N,)的float32奖励
+        """
+        boards = np.stack(boards_list) if boards_list else np.empty((0, 5, 5), dtype=np.int8)
+        players = np.asarray(players_list, dtype=np.int8)
+        if winner is None:
+            rewards = np.zeros(len(players), dtype=np.float32)
+        else:
+            rewards = np.where(players == winner, 1.0, -1.0).astype(np.float32)
+        return boards, players, rewards
+    
+    def _store(self, boards: np.ndarray, players: np.ndarray, rewards: np.ndarray):
+        """把一局的数据写入内存映射文件的末尾，超出max_samples的部分被丢弃"""
+        count = min(len(rewards), len(self.rewards) - self._top)
+        if count < len(rewards):
+            print(f"训练数据已达到上限 {len(self.rewards)} 条，丢弃 {len(rewards) - count} 条")
+        end = self._top + count
+        self.boards[self._top:end] = boards[:count]
+        self.players[self._top:end] = players[:count]
+        self.rewards[self._top:end] = rewards[:count]
+        self._top = end
+    
+    def flush(self):
+        """把内存映射文件刷新到磁盘并记录样本数(load_training_data据此读取)"""
+        for array in (self.boards, self.players, self.rewards):
+            array.flush()
+        np.save(_data_paths(self.output_path)[3], np.array(self._top, dtype=np.int64))
+    
+    def _get_executor(self, num_workers: int, share_weights: bool) -> ProcessPoolExecutor:
+        """
+        获取自对弈进程池，已有保留的进程池时直接复用
+        share_weights为True时模型参数的CPU副本放在共享内存中，进程启动时只传递一次句柄；
+        复用进程池时先把模型当前参数原地写入共享内存(此时各进程空闲)，不重新创建进程或传输参数
+        """
+        if self._executor is None:
+            if share_weights:
+                self._shared_weights = {name: value.detach().cpu().clone().share_memory_()
+                                        for name, value in self.model.state_dict().items()}
+                self._executor = ProcessPoolExecutor(max_workers=num_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=_init_shared_worker,
+                                                     initargs=(type(self.model), self._shared_weights))
             else:
-                reward = -1.0
-            result.append((board, player, reward))
-        
-        return result
+                self._executor = ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                                     initargs=(self.model,))
+        elif self._shared_weights is not None:
+            with torch.no_grad():
+                for name, value in self.model.state_dict().items():
+                    self._shared_weights[name].copy_(value)
+        return self._executor
+    
+    def close(self):
+        """结束保留的自对弈进程池(见generate_training_data的keep_pool)"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = self._shared_weights = None
     
-    def generate_training_data(self, num_games: int) -> List[Tuple[np.ndarray, int, float]]:
-        """生成训练数据"""
+    def generate_training_data(self, num_games: int, num_workers: int = 1, share_weights: bool = False,
+                               keep_pool: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        生成训练数据，返回所有对局拼接后的(boards, players, rewards)
+        给出output_path时返回的是内存映射文件中已写入部分的视图
+        
+        参数:
+            num_games: 自对弈局数
+            num_workers: 进程数，大于1时各局分发到进程池并行进行(模型在每个进程初始化时传入一次)，
+                         结果仍由本进程按完成顺序汇总和写入磁盘
+            share_weights: 是否通过共享内存向各进程提供模型参数(spawn启动，各进程在CPU上推理)，
+                           模型在两次调用之间被训练时，复用的进程池也能使用最新的参数
+            keep_pool: 结束后是否保留进程池供下次调用复用(不再重复启动进程)，用完后调用close；
+                       不共享参数时复用的进程仍使用创建进程池时的模型
+        """
         all_data = []
         
-        for game_num in range(num_games):
-            if game_num % 10 == 0:
-                print(f"正在进行第 {game_num + 1}/{num_games} 局自对弈...")
-            
-            game_data = self.play_game()
-            all_data.extend(game_data)
+        executor = None
+        if num_workers > 1:
+            executor = self._get_executor(num_workers, share_weights)
+            games = executor.map(_play_one, range(num_games))
+        else:
+            games = (self.play_game() for _ in range(num_games))
+        
+        try:
+            for game_num, game_data in enumerate(games):
+                if game_num % 10 == 0:
+                    log.debug(f"正在进行第 {game_num + 1}/{num_games} 局自对弈...")
+                
+                if self.output_path:
+                    self._store(*game_data)
+                    if (game_num + 1) % FLUSH_INTERVAL == 0:
+                        self.flush()
+                else:
+                    all_data.append(game_data)
+        finally:
+            if executor is not None and not keep_pool:
+                self.close()
         
-        print(f"自对弈完成，生成了 {len(all_data)} 条训练数据")
-        return all_data
+        if self.output_path:
+            self.flush()
+            boards, players, rewards = (self.boards[:self._top], self.players[:self._top],
+                                        self.rewards[:self._top])
+        elif all_data:
+            boards, players, rewards = (np.concatenate(column) for column in zip(*all_data))
+        else:
+            boards, players, rewards = (np.empty((0, 5, 5), dtype=np.int8), np.empty(0, dtype=np.int8),
+                                        np.empty(0, dtype=np.float32))
+        print(f"自对弈完成，生成了 {len(rewards)} 条训练数据")
+        return boards, players, rewards
 
 if __name__ == "__main__":
     # 创建模型
@@ -129,4 +288,4 @@ if __name__ == "__main__":
     self_play = SelfPlay(model)
     training_data = self_play.generate_training_data(10)
     
-    print(f"生成了 {len(training_data)} 条训练样本")
+    print(f"生成了 {len(training_data[2])} 条训练样本")
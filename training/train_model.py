@@ -3,58 +3,137 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
 import torch
-from training.neural_network import EinsteinNet
-from self_play import SelfPlayTrainer
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel as DDP
+from training.neural_network import EinsteinNet, select_device, state_to_tensor
+from self_play import SelfPlay
 from trainer import NetworkTrainer
 
-def train_model(num_iterations=50, games_per_iteration=100, training_epochs=10):
-    """训练神经网络模型"""
-    print("Starting Einstein Chess AI Training...")
+try:
+    from torch.utils.tensorboard import SummaryWriter  # 可选依赖：需要安装tensorboard
+except ImportError:
+    SummaryWriter = None
+
+def _init_distributed():
+    """
+    由torchrun启动时(环境变量中有RANK)初始化NCCL进程组，并把本进程绑定到LOCAL_RANK对应的GPU
+    
+    返回:
+        (rank, world_size, device)，不是分布式启动时为(0, 1, select_device())
+    """
+    if 'RANK' not in os.environ:
+        return 0, 1, select_device()
+    dist.init_process_group('nccl')
+    local_rank = int(os.environ['LOCAL_RANK'])
+    torch.cuda.set_device(local_rank)
+    return dist.get_rank(), dist.get_world_size(), torch.device('cuda', local_rank)
+
+def _to_examples(boards, players, rewards):
+    """
+    把SelfPlay生成的(boards, players, rewards)转换为NetworkTrainer的(state, action_probs, value)样本
+    SelfPlay不记录骰子和搜索的访问分布: 骰子通道按0填充，策略目标为空(该样本不产生策略损失)
+    """
+    return [(state_to_tensor(board, 0, 1 if player == 1 else -1), {}, float(reward))
+            for board, player, reward in zip(boards, players, rewards)]
+
+def train_model(num_iterations=50, games_per_iteration=100, training_epochs=10, self_play_workers=None,
+                log_dir=None):
+    """
+    训练神经网络模型
+    用torchrun启动多个进程时进行数据并行训练: 每个进程自对弈games_per_iteration/进程数局，
+    在自己的数据上训练，DDP在反向传播时分桶AllReduce梯度；只有rank 0输出日志和保存模型
     
-    # 创建模型和训练器
-    neural_net = EinsteinNet()
-    network_trainer = NetworkTrainer(neural_net)
-    self_play_trainer = SelfPlayTrainer(neural_net)
+    参数:
+        self_play_workers: 自对弈进程数，None表示CPU核心数(分布式训练时按进程数平分)，1表示在本进程中进行
+        log_dir: TensorBoard日志目录，给出且安装了tensorboard时每个epoch记录一次损失和学习率
+    """
+    rank, world_size, device = _init_distributed()
+    is_main = rank == 0
+    if is_main:
+        print("Starting Einstein Chess AI Training...")
+        print(f"Using device: {device}, processes: {world_size}")
+    
+    # 创建模型和训练器(有GPU时在GPU上训练)
+    neural_net = EinsteinNet().to(device)
+    if device.type == 'cuda':
+        # NHWC布局可以使用cuDNN的张量核心卷积内核(输入布局见NetworkTrainer)；必须在DDP包装之前转换
+        neural_net = neural_net.to(memory_format=torch.channels_last)
+        torch.backends.cudnn.benchmark = True  # batch大小固定，自动选择最快的卷积算法
+    train_net = neural_net
+    if world_size > 1:
+        train_net = DDP(neural_net, device_ids=[device.index], gradient_as_bucket_view=True,
+                        bucket_cap_mb=25)
+    network_trainer = NetworkTrainer(train_net, world_size=world_size)
+    self_play = SelfPlay(neural_net)
+    games_per_iteration = -(-games_per_iteration // world_size)  # 每个进程的局数(向上取整)
+    # 中间检查点在后台线程写入磁盘，训练不等待；提交前先复制一份CPU上的参数，之后的训练不影响它
+    save_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+    save_futures = []
+    # TensorBoard在后台线程写入事件文件，训练循环只是把数据放入队列
+    writer = SummaryWriter(log_dir) if is_main and log_dir and SummaryWriter is not None else None
+    
+    if self_play_workers is None:
+        self_play_workers = max(1, (os.cpu_count() or 1) // world_size)
     
     # 训练循环
     for iteration in range(num_iterations):
-        print(f"\n=== Training Iteration {iteration + 1}/{num_iterations} ===")
+        if is_main:
+            print(f"\n=== Training Iteration {iteration + 1}/{num_iterations} ===")
         
         # 自对弈生成数据
-        print(f"Generating {games_per_iteration} self-play games...")
-        training_data = []
+        if is_main:
+            print(f"Generating {games_per_iteration} self-play games...")
+        # 自对弈进程池在整个训练过程中复用；参数放在共享内存中，每次迭代开始时原地更新
+        boards, players, rewards = self_play.generate_training_data(games_per_iteration,
+                                                                   num_workers=self_play_workers,
+                                                                   share_weights=True, keep_pool=True)
+        training_data = _to_examples(boards, players, rewards)
         
-        for game_num in range(games_per_iteration):
-            if (game_num + 1) % 10 == 0:
-                print(f"  Game {game_num + 1}/{games_per_iteration}")
-            
-            examples = self_play_trainer.play_game()
-            training_data.extend(examples)
-        
-        print(f"Generated {len(training_data)} training examples")
+        if is_main:
+            print(f"Generated {len(training_data)} training examples")
         
         # 训练网络
-        print("Training neural network...")
+        if is_main:
+            print("Training neural network...")
         for epoch in range(training_epochs):
             metrics = network_trainer.train_on_examples(training_data, batch_size=32)
+            if writer is not None:
+                step = iteration * training_epochs + epoch
+                for name, value in metrics.items():
+                    writer.add_scalar(f"train/{name}", value, step)
             
-            if epoch % 3 == 0:
+            if is_main and epoch % 3 == 0:
                 print(f"  Epoch {epoch + 1}/{training_epochs}: "
                       f"Loss={metrics['total_loss']:.4f}, "
                       f"Policy={metrics['policy_loss']:.4f}, "
                       f"Value={metrics['value_loss']:.4f}")
         
-        # 保存模型
-        if (iteration + 1) % 10 == 0:
+        # 保存模型(DDP下各进程参数一致，只由rank 0保存未包装网络的参数)
+        if is_main and (iteration + 1) % 10 == 0:
             model_path = f"../models/model_iter_{iteration + 1}.pth"
-            torch.save(neural_net.state_dict(), model_path)
-            print(f"Model saved to {model_path}")
+            state_dict = {name: value.detach().cpu().clone() for name, value in neural_net.state_dict().items()}
+            save_futures.append(save_pool.submit(torch.save, state_dict, model_path))
+            print(f"Saving model to {model_path}")
+    
+    save_pool.shutdown(wait=True)  # 等待所有检查点写完
+    self_play.close()
+    if writer is not None:
+        writer.close()
+    if world_size > 1:
+        dist.destroy_process_group()
+    for future in save_futures:
+        future.result()  # 检查点写入失败时在这里抛出异常(与直接保存时相同)
+    if not is_main:
+        return
     
-    # 保存最终模型
+    # 保存最终模型: 只序列化一次，另外两个文件直接复制
     torch.save(neural_net.state_dict(), "../models/shared_model.pth")
-    torch.save(neural_net.state_dict(), "../models/blue_model.pth")
-    torch.save(neural_net.state_dict(), "../models/red_model.pth")
+    shutil.copyfile("../models/shared_model.pth", "../models/blue_model.pth")
+    shutil.copyfile("../models/shared_model.pth", "../models/red_model.pth")
     
     print("\nTraining completed!")
     print("Models saved:")
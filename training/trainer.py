@@ -1,16 +1,46 @@
 """神经网络训练器"""
+import sys
+
 import torch
+import torch.distributed as dist
 import torch.nn as nn
 import numpy as np
 from typing import List, Tuple
 
 class NetworkTrainer:
-    def __init__(self, neural_net, learning_rate=0.001, weight_decay=1e-4):
-        self.neural_net = neural_net
+    def __init__(self, neural_net, learning_rate=0.001, weight_decay=1e-4, mixed_precision=True,
+                 world_size=1, compile_model=True):
+        """
+        参数:
+            neural_net: 神经网络(分布式训练时为DistributedDataParallel包装后的网络)
+            world_size: 分布式训练的进程数，大于1时各进程在自己的样本上训练，每轮的batch数保持一致
+            compile_model: 是否用torch.compile编译网络(只在CUDA且非Windows、PyTorch支持时生效)
+        """
+        self.world_size = world_size
+        self.device = next(neural_net.parameters()).device  # 训练数据送到网络所在的设备
+        # CUDA上输入使用NHWC(channels_last)布局，与train_model中转换后的网络参数一致
+        self.memory_format = torch.channels_last if self.device.type == 'cuda' else torch.contiguous_format
+        
+        # 编译为融合后的内核；输入形状固定(不足一个batch的样本被跳过)，不需要动态形状
+        self.compiled = (compile_model and self.device.type == 'cuda' and sys.platform != 'win32'
+                         and hasattr(torch, 'compile'))
+        self.neural_net = (torch.compile(neural_net, mode='reduce-overhead', dynamic=False)
+                           if self.compiled else neural_net)
+        
+        # 混合精度(只在CUDA上启用): 支持BF16时用BF16，否则用FP16并配合梯度缩放防止下溢
+        self.use_amp = mixed_precision and self.device.type == 'cuda'
+        self.amp_dtype = (torch.bfloat16 if self.use_amp and torch.cuda.is_bf16_supported()
+                          else torch.float16)
+        self.scaler = torch.amp.GradScaler('cuda',
+                                           enabled=self.use_amp and self.amp_dtype == torch.float16)
+        # 所有参数的更新合并为少量内核: CUDA上用融合实现，CPU上用foreach实现(两者不能同时开启)
+        use_fused = self.device.type == 'cuda'
         self.optimizer = torch.optim.Adam(
             neural_net.parameters(), 
             lr=learning_rate, 
-            weight_decay=weight_decay
+            weight_decay=weight_decay,
+            fused=use_fused,
+            foreach=not use_fused
         )
         self.scheduler = torch.optim.lr_scheduler.StepLR(
             self.optimizer, 
@@ -18,64 +48,77 @@ class NetworkTrainer:
             gamma=0.9
         )
         
-        self.policy_loss_fn = nn.KLDivLoss(reduction='batchmean')
         self.value_loss_fn = nn.MSELoss()
         
     def train_on_examples(self, examples: List[Tuple], batch_size=32, epochs=1):
         """在训练样本上训练网络"""
         self.neural_net.train()
         
-        total_policy_loss = 0.0
-        total_value_loss = 0.0
-        total_loss = 0.0
+        # (策略损失, 价值损失, 总损失)之和保存在设备上，结束时才读回一次，训练中不强制同步
+        loss_sums = torch.zeros(3, device=self.device)
         num_batches = 0
         
+        # 分布式训练时各进程的样本(各自自对弈生成)数量不同，按最少的进程截断，
+        # 保证所有进程执行相同次数的反向传播(梯度AllReduce)，否则会互相等待
+        num_examples = len(examples)
+        if self.world_size > 1:
+            count = torch.tensor([num_examples], device=self.device)
+            dist.all_reduce(count, op=dist.ReduceOp.MIN)
+            num_examples = int(count.item())
+        
+        # 预先去掉末尾不训练的样本(不足2个，编译后为不足batch_size个)，循环中不再逐个batch检查
+        tail = num_examples % batch_size
+        if self.compiled or tail < 2:
+            num_examples -= tail
+        
+        # 所有样本一次转换为三个连续张量并送到设备，各batch直接按下标取
+        if num_examples:
+            all_states, all_policies, all_values = self._materialize(examples)
+        
         for epoch in range(epochs):
             # 随机打乱样本
-            indices = np.random.permutation(len(examples))
+            indices = torch.randperm(len(examples), device=self.device)[:num_examples]
             
-            for i in range(0, len(examples), batch_size):
+            for i in range(0, num_examples, batch_size):
                 batch_indices = indices[i:i + batch_size]
-                batch = [examples[idx] for idx in batch_indices]
-                
-                if len(batch) < 2:  # 跳过太小的batch
-                    continue
                 
                 # 准备batch数据
-                states = torch.cat([ex[0] for ex in batch])
-                target_policies = self._prepare_policy_targets(batch)
-                target_values = torch.tensor([ex[2] for ex in batch], dtype=torch.float32)
+                states = all_states[batch_indices].contiguous(memory_format=self.memory_format)
+                target_policies = all_policies[batch_indices]
+                target_values = all_values[batch_indices]
                 
-                # 前向传播
-                log_probs, values = self.neural_net(states)
+                # 前向传播(混合精度)
+                with torch.autocast(device_type=self.device.type, dtype=self.amp_dtype,
+                                    enabled=self.use_amp):
+                    log_probs, values = self.neural_net(states)
                 
-                # 计算损失
-                policy_loss = self.policy_loss_fn(log_probs, target_policies)
-                value_loss = self.value_loss_fn(values.squeeze(), target_values)
+                # 计算损失(转回FP32计算)
+                # 策略损失用交叉熵: 与KL散度只差与参数无关的常数项target*log(target)，梯度相同
+                policy_loss = -(target_policies * log_probs.float()).sum(dim=1).mean()
+                # 价值头输出(B, 1)，展平为(B,)与目标对齐(B=1时squeeze会得到标量并触发广播)
+                value_loss = self.value_loss_fn(values.float().flatten(), target_values)
                 loss = policy_loss + value_loss
                 
-                # 反向传播
-                self.optimizer.zero_grad()
-                loss.backward()
+                # 反向传播(未启用梯度缩放时scaler直接透传)
+                self.optimizer.zero_grad(set_to_none=True)  # 释放梯度而不是逐个清零
+                self.scaler.scale(loss).backward()
                 
-                # 梯度裁剪
+                # 梯度裁剪(先还原被缩放的梯度)
+                self.scaler.unscale_(self.optimizer)
                 torch.nn.utils.clip_grad_norm_(self.neural_net.parameters(), max_norm=1.0)
                 
-                self.optimizer.step()
+                self.scaler.step(self.optimizer)
+                self.scaler.update()
                 
                 # 统计
-                total_policy_loss += policy_loss.item()
-                total_value_loss += value_loss.item()
-                total_loss += loss.item()
+                loss_sums += torch.stack([policy_loss.detach(), value_loss.detach(), loss.detach()])
                 num_batches += 1
         
         # 更新学习率
         self.scheduler.step()
         
         if num_batches > 0:
-            avg_policy_loss = total_policy_loss / num_batches
-            avg_value_loss = total_value_loss / num_batches
-            avg_total_loss = total_loss / num_batches
+            avg_policy_loss, avg_value_loss, avg_total_loss = (loss_sums / num_batches).tolist()
             
             return {
                 'policy_loss': avg_policy_loss,
@@ -86,19 +129,45 @@ class NetworkTrainer:
         else:
             return {'policy_loss': 0, 'value_loss': 0, 'total_loss': 0, 'learning_rate': 0}
     
+    def _materialize(self, examples: List[Tuple]) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        把(state, action_probs, value)样本列表转换为按字段存放的连续张量，并送到网络所在设备
+        
+        返回:
+            (states, policies, values): (N, 4, 5, 5)的输入、(N, 75)的策略目标、(N,)的价值目标
+        """
+        states = torch.cat([ex[0] for ex in examples])
+        policies = self._prepare_policy_targets(examples)
+        values = torch.from_numpy(np.fromiter((ex[2] for ex in examples), dtype=np.float32,
+                                              count=len(examples)))
+        states = self._to_device(states).contiguous(memory_format=self.memory_format)
+        return states, self._to_device(policies), self._to_device(values)
+    
+    def _to_device(self, tensor: torch.Tensor) -> torch.Tensor:
+        """把CPU上构造的张量送到网络所在设备；CUDA下先放入锁页内存，使拷贝可以异步进行"""
+        if self.device.type == 'cpu':
+            return tensor
+        if self.device.type == 'cuda':
+            tensor = tensor.contiguous().pin_memory()
+        return tensor.to(self.device, non_blocking=True)
+    
     def _prepare_policy_targets(self, batch: List[Tuple]) -> torch.Tensor:
         """准备策略目标"""
         batch_size = len(batch)
         policy_targets = torch.zeros(batch_size, 75)  # 最大动作空间
         
+        # 先收集所有(样本, 动作, 概率)，再一次性写入张量
+        rows, cols, vals = [], [], []
         for i, (_, action_probs, _) in enumerate(batch):
             for action, prob in action_probs.items():
                 if action < 75:
-                    policy_targets[i, action] = prob
-        
-        # 确保每行和为1
-        row_sums = policy_targets.sum(dim=1, keepdim=True)
-        row_sums[row_sums == 0] = 1  # 避免除零
-        policy_targets = policy_targets / row_sums
+                    rows.append(i)
+                    cols.append(action)
+                    vals.append(prob)
+        if rows:
+            policy_targets.index_put_((torch.as_tensor(rows, dtype=torch.long),
+                                       torch.as_tensor(cols, dtype=torch.long)),
+                                      torch.as_tensor(vals, dtype=torch.float32), accumulate=True)
         
-        return policy_targets
\ No newline at end of file
+        # 确保每行和为1(全为0的行保持为0，避免除零)
+        return policy_targets.div_(policy_targets.sum(dim=1, keepdim=True).clamp_(min=1e-12))
\ No newline at end of file